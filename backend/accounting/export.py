@@ -0,0 +1,46 @@
+# python
+# File: `accounting/export.py`
+"""
+NDJSON export of HistofInvc_current.
+
+Rows are read in `uid` order through a server-side cursor in `fetchmany`
+batches and written one JSON object per line, so memory stays at one batch
+however many rows are exported.  An interrupted export resumes with
+`after_uid` set to the `uid` of the last line received.
+"""
+from itertools import islice
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+
+from base.settings import STREAM_CHUNK_SIZE
+
+
+def invoice_history_queryset(after_uid=None, week_from=None, week_to=None):
+    """Rows after the `uid` watermark with `week_of` in [week_from, week_to], in `uid` order."""
+    Model = apps.get_model('accounting', 'HistOfInvcCurrent')
+    qs = Model.objects.all()
+    if after_uid is not None:
+        qs = qs.filter(uid__gt=after_uid)
+    if week_from is not None:
+        qs = qs.filter(week_of__gte=week_from)
+    if week_to is not None:
+        qs = qs.filter(week_of__lte=week_to)
+    return qs.order_by('uid')
+
+
+def ndjson_lines(qs, batch_size=STREAM_CHUNK_SIZE):
+    """
+    Yield the rows of `qs` as NDJSON, one bytes chunk per batch.  `iterator()`
+    runs the SELECT on a chunked (server-side where the backend has one)
+    cursor and pulls it with `fetchmany(batch_size)`, bypassing the queryset
+    result cache; backend converters still apply to each value.
+    """
+    names = [f.attname for f in qs.model._meta.concrete_fields]
+    rows = qs.values_list(*names).iterator(chunk_size=batch_size)
+    encode = DjangoJSONEncoder().encode
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        yield ''.join(encode(dict(zip(names, row))) + '\n' for row in batch).encode('utf-8')
@@ -0,0 +1,194 @@
+# python
+# File: `accounting/fulltext.py`
+"""
+SQLite FTS5 sidecar for text search over invoice history and monthly invoices.
+
+Each source table has an FTS5 table with the columns its endpoint searches,
+keyed by `uid` and tokenized into trigrams, so a `MATCH` on a quoted query
+returns exactly the rows an `icontains` on any of those columns would.
+`manage.py sync_invoice_fts` appends rows above each source's `uid`
+high-water mark and re-indexes the rows queued in `pending`: ORM saves and
+deletes queue their uid there (accounting.signals).  Queryset bulk writes
+queue nothing, so `--full`, which rebuilds from scratch, should also run on
+a schedule (nightly), with the incremental sync every few minutes.
+
+`search(source, q)` returns matching uids best first (bm25), then the uids
+still queued in `pending`, whose indexed text may be out of date, as
+candidates: the endpoints re-apply their lookups to every row returned, so
+an edited row is found by its new text and dropped for its old one between
+syncs.  It returns None when the sidecar cannot answer: no file yet, queries
+under three characters or all digits, or more than MAX_HITS matches or
+MAX_PENDING queued rows; the endpoints then search in SQL as before.
+"""
+import os
+import sqlite3
+import threading
+from itertools import islice
+
+from django.apps import apps
+
+from base.settings import INVOICE_FTS_PATH, STREAM_CHUNK_SIZE
+
+# source -> (model, indexed columns); the columns are the endpoint's Search.text fields
+SOURCES = {
+    'invoice_history': (('accounting', 'HistOfInvcCurrent'),
+                        ('company', 'description', 'cust_id', 'done_by', 'invoice_number', 'work_order')),
+    'monthly_invoice': (('accounting', 'MonthlyInvoice'),
+                        ('company', 'description', 'cust_id', 'invoice_number')),
+}
+
+# More hits than this are left to SQL, which can apply filters and limits itself.
+MAX_HITS = 10000
+# More queued rows than this (a long-overdue sync) are left to SQL too.
+MAX_PENDING = 2000
+
+_local = threading.local()
+
+
+def _connect(readonly=True):
+    if readonly:
+        return sqlite3.connect(f'file:{INVOICE_FTS_PATH}?mode=ro', uri=True, check_same_thread=False)
+    os.makedirs(os.path.dirname(str(INVOICE_FTS_PATH)), exist_ok=True)
+    conn = sqlite3.connect(str(INVOICE_FTS_PATH), timeout=60)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE IF NOT EXISTS sync_state (source TEXT PRIMARY KEY, high_water INTEGER NOT NULL)')
+    conn.execute('CREATE TABLE IF NOT EXISTS pending (seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                 'source TEXT NOT NULL, uid INTEGER NOT NULL)')
+    return conn
+
+
+def _model(source):
+    (app_label, model_name), _ = SOURCES[source]
+    return apps.get_model(app_label, model_name)
+
+
+def _reader():
+    """Per-thread read-only connection, reopened after a fork; None while the sidecar does not exist."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid():
+        return conn
+    if not os.path.exists(INVOICE_FTS_PATH):
+        return None
+    _local.conn, _local.pid = _connect(), os.getpid()
+    return _local.conn
+
+
+def search(source, q):
+    """uids of `source` rows containing `q` in an indexed column, best first; None to search in SQL."""
+    q = str(q or '').strip()
+    if len(q) < 3 or q.isdigit():
+        return None
+    try:
+        conn = _reader()
+        if conn is None:
+            return None
+        queued = [uid for uid, in conn.execute('SELECT DISTINCT uid FROM pending WHERE source = ? ORDER BY uid'
+                                               ' LIMIT ?', (source, MAX_PENDING + 1))]
+        if len(queued) > MAX_PENDING:
+            return None
+        phrase = '"' + q.replace('"', '""') + '"'
+        rows = conn.execute(f'SELECT rowid FROM {source}_fts WHERE {source}_fts MATCH ? ORDER BY rank LIMIT ?',
+                            (phrase, MAX_HITS + 1)).fetchall()
+    except sqlite3.Error:
+        return None
+    if len(rows) > MAX_HITS:
+        return None
+    stale = set(queued)
+    return [uid for uid, in rows if uid not in stale] + queued
+
+
+def searcher(source):
+    """`search` bound to `source`, for Search(index=...)."""
+    return lambda q: search(source, q)
+
+
+def _set_high_water(conn, source, uid):
+    conn.execute('INSERT INTO sync_state (source, high_water) VALUES (?, ?)'
+                 ' ON CONFLICT (source) DO UPDATE SET high_water = excluded.high_water', (source, uid))
+
+
+def mark(source, uid):
+    """Queue `uid` of `source` for re-indexing by the next sync (after an ORM save or delete)."""
+    if uid is None or not os.path.exists(INVOICE_FTS_PATH):
+        return
+    try:
+        conn = _connect(readonly=False)
+        try:
+            with conn:
+                conn.execute('INSERT INTO pending (source, uid) VALUES (?, ?)', (source, uid))
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        # the row is re-indexed by the nightly full sync at the latest
+        pass
+
+
+def _row(r):
+    return (r[0],) + tuple('' if v is None else str(v) for v in r[1:])
+
+
+def sync(source, full=False, batch_size=STREAM_CHUNK_SIZE):
+    """
+    Index the rows of `source` above its high-water mark and re-index its
+    pending rows; returns rows indexed.  An incremental sync commits the mark
+    with each batch, so an interrupted run resumes where it stopped.  A `full`
+    sync builds a new table and swaps it in at the end, so searches keep
+    using the old one meanwhile.
+    """
+    _, columns = SOURCES[source]
+    Model = _model(source)
+    table = f'{source}_fts'
+    target = f'{table}_new' if full else table
+    conn = _connect(readonly=False)
+    try:
+        with conn:
+            if full:
+                conn.execute(f'DROP TABLE IF EXISTS {target}')
+            conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {target} USING fts5({', '.join(columns)}, "
+                         f"tokenize='trigram')")
+        row = conn.execute('SELECT high_water FROM sync_state WHERE source = ?', (source,)).fetchone()
+        high_water = row[0] if row and not full else None
+        row = conn.execute('SELECT MAX(seq) FROM pending WHERE source = ?', (source,)).fetchone()
+        last_seq = row[0] or 0
+        insert = f'INSERT INTO {target} (rowid, {", ".join(columns)}) VALUES ({", ".join("?" * (len(columns) + 1))})'
+        indexed = 0
+
+        if high_water is not None and last_seq:
+            # rows above the mark are picked up below with the new ones
+            uids = [uid for uid, in conn.execute('SELECT DISTINCT uid FROM pending WHERE source = ? AND seq <= ?'
+                                                 ' AND uid <= ?', (source, last_seq, high_water))]
+            for start in range(0, len(uids), batch_size):
+                batch = uids[start:start + batch_size]
+                rows = list(Model.objects.filter(uid__in=batch).values_list('uid', *columns))
+                with conn:
+                    conn.executemany(f'DELETE FROM {target} WHERE rowid = ?', [(uid,) for uid in batch])
+                    conn.executemany(insert, [_row(r) for r in rows])
+                indexed += len(rows)
+
+        qs = Model.objects.order_by('uid')
+        if high_water is not None:
+            qs = qs.filter(uid__gt=high_water)
+        rows = qs.values_list('uid', *columns).iterator(chunk_size=batch_size)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            with conn:
+                conn.executemany(insert, [_row(r) for r in batch])
+                if not full:
+                    _set_high_water(conn, source, batch[-1][0])
+            high_water = batch[-1][0]
+            indexed += len(batch)
+
+        with conn:
+            if full:
+                conn.execute(f"INSERT INTO {target} ({target}) VALUES ('optimize')")
+                conn.execute(f'DROP TABLE IF EXISTS {table}')
+                conn.execute(f'ALTER TABLE {target} RENAME TO {table}')
+                conn.execute('DELETE FROM sync_state WHERE source = ?', (source,))
+            if high_water is not None:
+                _set_high_water(conn, source, high_water)
+            conn.execute('DELETE FROM pending WHERE source = ? AND seq <= ?', (source, last_seq))
+        return indexed
+    finally:
+        conn.close()
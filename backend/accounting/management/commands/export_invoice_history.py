@@ -0,0 +1,75 @@
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.export import invoice_history_queryset, ndjson_lines
+from base.settings import STREAM_CHUNK_SIZE
+from utils.dt import parse_date_val
+
+
+class Command(BaseCommand):
+    help = 'Export HistofInvc_current as NDJSON (one task per line, in uid order)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help='file to write; stdout when omitted')
+        parser.add_argument('--after-uid', type=int, help='only rows with uid greater than this watermark')
+        parser.add_argument('--resume', action='store_true',
+                            help='append to --output, continuing after the uid of its last line')
+        parser.add_argument('--week-from', help='first week_of to include (mm/dd/yyyy or yyyy-mm-dd)')
+        parser.add_argument('--week-to', help='last week_of to include (mm/dd/yyyy or yyyy-mm-dd)')
+        parser.add_argument('--batch-size', type=int, default=STREAM_CHUNK_SIZE, help='rows per fetchmany')
+
+    def _last_uid(self, path):
+        """
+        uid of the last complete line of an earlier export, or None.  A partial
+        line left by an interrupted run is cut off so appending stays valid NDJSON.
+        """
+        try:
+            f = open(path, 'r+b')
+        except FileNotFoundError:
+            return None
+        with f:
+            end = f.seek(0, os.SEEK_END)
+            start = f.seek(max(0, end - 65536))
+            tail = f.read()
+            cut = tail.rfind(b'\n') + 1
+            if cut < len(tail):
+                f.truncate(start + cut)
+                tail = tail[:cut]
+        for line in reversed(tail.splitlines()):
+            try:
+                return int(json.loads(line)['uid'])
+            except (ValueError, KeyError, TypeError):
+                continue
+        return None
+
+    def handle(self, *args, **options):
+        week_from = parse_date_val(options['week_from'])
+        week_to = parse_date_val(options['week_to'])
+        if (options['week_from'] and week_from is None) or (options['week_to'] and week_to is None):
+            raise CommandError('invalid --week-from/--week-to')
+
+        after_uid = options['after_uid']
+        path = options['output']
+        if options['resume']:
+            if not path:
+                raise CommandError('--resume needs --output')
+            last = self._last_uid(path)
+            if last is not None:
+                after_uid = max(after_uid or last, last)
+                self.stderr.write(f'resuming after uid {after_uid}')
+
+        qs = invoice_history_queryset(after_uid=after_uid, week_from=week_from, week_to=week_to)
+        out = open(path, 'ab' if options['resume'] else 'wb') if path else sys.stdout.buffer
+        lines = 0
+        try:
+            for chunk in ndjson_lines(qs, max(options['batch_size'], 1)):
+                out.write(chunk)
+                lines += chunk.count(b'\n')
+            out.flush()
+        finally:
+            if path:
+                out.close()
+        self.stderr.write(self.style.SUCCESS(f'exported {lines} rows'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from accounting import fulltext
+from base.settings import STREAM_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = ('Bring the invoice full-text sidecar up to date: new rows above each source\'s uid high-water mark '
+            'and rows queued by ORM saves and deletes.  Run it every few minutes and --full nightly.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=sorted(fulltext.SOURCES), action='append',
+                            help='source to sync (repeatable); all when omitted')
+        parser.add_argument('--full', action='store_true',
+                            help='rebuild from scratch, picking up bulk edits and deletes that queue nothing')
+        parser.add_argument('--batch-size', type=int, default=STREAM_CHUNK_SIZE, help='rows per fetchmany')
+
+    def handle(self, *args, **options):
+        for source in options['source'] or fulltext.SOURCES:
+            indexed = fulltext.sync(source, full=options['full'], batch_size=max(options['batch_size'], 1))
+            self.stdout.write(self.style.SUCCESS(f'{source}: {indexed} rows indexed'))
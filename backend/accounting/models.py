@@ -2,6 +2,7 @@ from decimal import Decimal
 from django.db import models
 from django.core.validators import MinLengthValidator
 from django.conf import settings
+from utils.versions import VersionedManager
 
 def _managed_for(app_label: str):
     return settings.MODELS_MANAGED_OVERRIDES.get(app_label, settings.MODELS_MANAGED_DEFAULT)
@@ -14,6 +15,8 @@ class Deposit(models.Model):
     deposit_date = models.DateTimeField(null=True, blank=True, db_column='DepositDate')
     description = models.CharField(max_length=50, null=True, blank=True, db_column='Description', validators=[MinLengthValidator(1)])
 
+    objects = VersionedManager()
+
     class Meta:
         db_table = 'Deposit'
         verbose_name = 'Deposit'
@@ -63,6 +66,8 @@ class HistOfInvcCurrent(models.Model):
     work_order = models.CharField(max_length=15, null=True, blank=True, db_column='WorkOrder')
     invoice_number = models.CharField(max_length=20, null=True, blank=True, db_column='Invoice_Number')
 
+    objects = VersionedManager()
+
     class Meta:
         db_table = 'HistofInvc_current'
         verbose_name = 'HistOfInvoiceCurrent'
@@ -114,7 +119,9 @@ class MonthlyInvoice(models.Model):
     work_order = models.CharField(max_length=15, null=True, blank=True, db_column='WorkOrder')
     temp_deposit_date = models.DateTimeField(null=True, blank=True, db_column='TempDepositDate')
     selected = models.BooleanField(null=True, blank=True, db_column='Selected')
-    
+
+    objects = VersionedManager()
+
     class Meta:
         db_table = 'MonthlyInvoice'
         verbose_name = 'Monthly Invoice'
@@ -0,0 +1,24 @@
+# python
+# File: `accounting/signals.py`
+"""Queue saved and deleted invoice rows for the full-text sidecar's next sync (accounting.fulltext)."""
+from django.db.models.signals import post_delete, post_save
+
+from accounting import fulltext
+
+# model label -> fulltext source
+SOURCES = {
+    'accounting.HistOfInvcCurrent': 'invoice_history',
+    'accounting.MonthlyInvoice': 'monthly_invoice',
+}
+
+
+def _queue(source):
+    def handler(sender, instance, **kwargs):
+        fulltext.mark(source, instance.uid)
+    return handler
+
+
+for _label, _source in SOURCES.items():
+    post_save.connect(_queue(_source), sender=_label, weak=False, dispatch_uid=f'accounting.fulltext.saved.{_source}')
+    post_delete.connect(_queue(_source), sender=_label, weak=False,
+                        dispatch_uid=f'accounting.fulltext.deleted.{_source}')
@@ -130,7 +130,7 @@ def payroll_task_selection_api_v1(request):
         if model is None:
             data = []
         else:
-            qs = model.objects.filter(cust_id=cust_id) if cust_id else model.objects.all()[MAX_RECORDS]
+            qs = model.objects.cached().filter(cust_id=cust_id) if cust_id else model.objects.cached()[MAX_RECORDS]
 
             if q:
                 if q.isdigit():
@@ -8,5 +8,6 @@ urlpatterns = [
     path('monthly_invoice_tasks', views.monthly_invoice_tasks, name='monthly_invoice_tasks'),
     path('edit_monthly_invoice_task', views.edit_monthly_invoice_task, name='edit_monthly_invoice_task'),
     path('invoice_history_tasks', views.invoice_history_tasks, name='invoice_history_tasks'),
+    path('invoice_history_export', views.invoice_history_export, name='invoice_history_export'),
     path('debug_accounting_model', views.debug_accounting_model, name='debug_accounting_model'),
 ]
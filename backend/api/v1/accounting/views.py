@@ -1,344 +1,155 @@
 # python file api/accounting/views.py
 from django.conf import settings
 import importlib, sys, traceback, os, json
-from django.db.models import Q
-from django.http import JsonResponse
-from django.views.decorators.http import require_GET, require_POST
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET, require_POST, require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from django.core.cache import cache
 from django.apps import apps
-from base.settings import CACHE_TTL, MAX_RECORDS
+from accounting import fulltext
+from accounting.export import invoice_history_queryset, ndjson_lines
+from api.v1.engine import Endpoint, Field, Search, dec, stripped, text
+from utils.dt import parse_date_val
 from utils.types import validate_bool
 from datetime import datetime
 
-# python
-@csrf_exempt
-@require_POST
-def deposit_list(request):
-    try:
-        payload = json.loads(request.body.decode('utf-8') or '{}')
-    except Exception:
-        return JsonResponse({'error': 'invalid json'}, status=400)
-
-    q = str(payload.get('q', '')).strip()
-    emp_id = payload.get('emp_id', '')
-    deposit_id = payload.get('deposit_id', '')
-    description = payload.get('description', '').strip()
-    refresh = payload.get('refresh') in (True, '1', 'true', 'True')
-    cc = request.META.get('HTTP_CACHE_CONTROL', '')
-    count_only = validate_bool(payload.get('count_only'))
-    limit = int(payload.get('limit', MAX_RECORDS))
-
-    # build filters
-    filters = {}
-    try:
-        if emp_id not in ('', None):
-            filters['emp_id'] = int(emp_id)
-        elif deposit_id not in ('', None):
-            filters['deposit_id'] = int(deposit_id)
-        elif description not in ('', None):
-            filters['description__icontains'] = description
-    except (ValueError, TypeError):
-        return JsonResponse({'count': 0, 'deposits': []})
-
-    if 'no-cache' in cc or 'max-age=0' in cc:
-        refresh = True
-
-    cache_key = f'accounting_deposits_v1_emp_{emp_id}' if emp_id else 'accounting_deposits_v1_all'
-    data = None if refresh else cache.get(cache_key)
-
-    if data is not None:
-        if q:
-            ql = q.lower()
-            data = [
-                d for d in data
-                if ql in str(d.get('deposit_id', '')).lower()
-                   or ql in str(d.get('deposit_num', '')).lower()
-                   or ql in (d.get('description') or '').lower()
-                   or ql in str(d.get('emp_id', '')).lower()
-            ]
-        if limit and len(data) > limit:
-            data = data[:limit]
-    else:
-        try:
-            try:
-                Model = apps.get_model('accounting', 'Deposit')
-            except LookupError:
-                Model = None
-
-            if Model is None:
-                return JsonResponse({'count': 0, 'deposits': []})
-
-            qs = Model.objects.filter(**filters) if filters else Model.objects.all()
-
-            if q:
-                if q.isdigit():
-                    qi = int(q)
-                    qs = qs.filter(
-                        Q(deposit_id=qi) |
-                        Q(deposit_num=qi) |
-                        Q(emp_id=qi)
-                    )
-                else:
-                    qs = qs.filter(
-                        Q(deposit_num__icontains=q) |
-                        Q(description__icontains=q)
-                    )
-
-            qs = qs[:limit]
-
-            data = [{
-                'deposit_id': getattr(d, 'deposit_id', None),
-                'deposit': getattr(d, 'deposit', None),
-                'deposit_num': getattr(d, 'deposit_num', None),
-                'emp_id': getattr(d, 'emp_id', None),
-                'deposit_date': getattr(d, 'deposit_date', None),
-                'description': getattr(d, 'description', '') or '',
-            } for d in qs]
-
-        except Exception:
-            data = []
 
-        if not q and not refresh and not filters:
-            cache.set(cache_key, data, CACHE_TTL)
+deposit_list = Endpoint(
+    'accounting', 'Deposit',
+    result_key='deposits',
+    fields=(
+        Field('deposit_id'), Field('deposit'), Field('deposit_num'), Field('emp_id'),
+        Field('deposit_date'), Field('description', fmt=text),
+    ),
+    filters={
+        'emp_id': ('emp_id', 'exact', int),
+        'deposit_id': ('deposit_id', 'exact', int),
+        'description': ('description', 'icontains', stripped),
+    },
+    search=Search(
+        text=('deposit_num__icontains', 'description__icontains'),
+        digits=('deposit_id', 'deposit_num', 'emp_id'),
+        cached=('deposit_id', 'deposit_num', 'description', 'emp_id'),
+    ),
+    # one filter applies, in this order of precedence, as before the port
+    exclusive=('emp_id', 'deposit_id', 'description'),
+    cache_prefix='accounting_deposits_v1',
+).as_view()
+
+
+invoice_history_tasks = Endpoint(
+    'accounting', 'HistOfInvcCurrent',
+    result_key='tasks',
+    fields=(
+        Field('uid'), Field('task_id'), Field('cust_id'), Field('week_of'), Field('company', fmt=text),
+        Field('charge'), Field('done_by', fmt=text), Field('emp_id'), Field('cash_paid'),
+        Field('commission'), Field('tax'), Field('route', fmt=text), Field('cod'), Field('voucher'),
+        Field('price'), Field('description', fmt=text), Field('taxable'), Field('comm'),
+        Field('master_id'), Field('other_bill'), Field('task_type', fmt=text), Field('comment', fmt=text),
+        Field('adjust_amount'), Field('mailto'), Field('task_order'), Field('adv_date'),
+        Field('adv_bill'), Field('order'), Field('adv_freq'), Field('adv_credit'), Field('spec_note'),
+        Field('frequency'), Field('spec_equip'), Field('week_done'), Field('emp_paid'),
+        Field('work_order', fmt=text), Field('invoice_number', fmt=text),
+    ),
+    filters={
+        'uid': ('uid', 'exact', int),
+        'task_id': ('task_id', 'exact', int),
+        'invoice_number': ('invoice_number', 'exact', stripped),
+        'emp_id': ('emp_id', 'exact', int),
+        'cust_id': ('cust_id', 'exact', stripped),
+        'master_id': ('master_id', 'exact', stripped),
+        'company': ('company', 'icontains', stripped),
+        'week_of': ('week_of', 'exact', stripped),
+        'week_done': ('week_done', 'exact', stripped),
+        'route': ('route', 'iexact', stripped),
+        'done_by': ('done_by', 'icontains', stripped),
+        'work_order': ('work_order', 'icontains', stripped),
+    },
+    search=Search(
+        text=('company__icontains', 'description__icontains', 'cust_id__icontains',
+              'done_by__icontains', 'invoice_number__icontains', 'work_order__icontains'),
+        digits=('uid', 'task_id', 'emp_id'),
+        index=fulltext.searcher('invoice_history'),
+        recheck=True,
+    ),
+    cache_prefix='accounting_invoice_history_v1',
+    streamable=True,
+).as_view()
 
-    if count_only:
-        return JsonResponse({'count': len(data)})
 
-    return JsonResponse({'count': len(data), 'deposits': data})
-
-
-# python
 @csrf_exempt
-@require_POST
-def invoice_history_tasks(request):
-    try:
-        payload = json.loads(request.body.decode('utf-8') or '{}')
-    except Exception:
-        return JsonResponse({'error': 'invalid json'}, status=400)
-
-    q = str(payload.get('q', '')).strip()
-    refresh = payload.get('refresh') in (True, '1', 'true', 'True')
-    cc = request.META.get('HTTP_CACHE_CONTROL', '')
-    count_only = validate_bool(payload.get('count_only'))
-    limit = int(payload.get('limit', MAX_RECORDS))
-
-    # --- Filter Extraction ---
-    uid = payload.get('uid')
-    task_id = payload.get('task_id')
-    invoice_number = payload.get('invoice_number')
-    emp_id = payload.get('emp_id')
-    cust_id = payload.get('cust_id')
-    master_id = payload.get('master_id')
-    company = payload.get('company')
-    week_of = payload.get('week_of')
-    week_done = payload.get('week_done')
-    route = payload.get('route')
-    done_by = payload.get('done_by')
-    work_order = payload.get('work_order')
-
-    # --- DB Filtering Logic ---
-    filters = {}
-    if uid: filters['uid'] = int(uid)
-    if task_id: filters['task_id'] = int(task_id)
-    if invoice_number: filters['invoice_number'] = invoice_number
-    if emp_id: filters['emp_id'] = int(emp_id)
-    if cust_id: filters['cust_id'] = cust_id
-    if master_id: filters['master_id'] = master_id
-    if company: filters['company__icontains'] = company
-    if week_of: filters['week_of'] = week_of
-    if week_done: filters['week_done'] = week_done
-    if route: filters['route__iexact'] = route
-    if done_by: filters['done_by__icontains'] = done_by
-    if work_order: filters['work_order__icontains'] = work_order
-
-    # --- Caching Strategy ---
-    # Only cache simple, common lookups. Bypass cache for complex filter combinations.
-    cache_key = None
-    if not filters and not q:
-        cache_key = 'accounting_invoice_history_v1_all'
-    elif len(filters) == 1 and 'uid' in filters:
-        cache_key = f'accounting_invoice_history_v1_uid_{uid}'
-
-    if 'no-cache' in cc or 'max-age=0' in cc:
-        refresh = True
-
-    data = None
-    if not refresh and cache_key:
-        data = cache.get(cache_key)
-
-    if data is None:
+@require_http_methods(['GET', 'POST'])
+def invoice_history_export(request):
+    """
+    Stream all of HistofInvc_current as NDJSON (one task per line, in uid order).
+    Params (query string or JSON body): after_uid (resume watermark),
+    week_from / week_to (inclusive week_of range), batch_size.
+    """
+    if request.method == 'GET':
+        data = request.GET
+    else:
         try:
-            Model = apps.get_model('accounting', 'HistOfInvcCurrent')
-            qs = Model.objects.filter(**filters)
-
-            if q:
-                if q.isdigit():
-                    qs = qs.filter(Q(uid=q) | Q(task_id=q) | Q(emp_id=q))
-                else:
-                    qs = qs.filter(
-                        Q(company__icontains=q) | Q(description__icontains=q) |
-                        Q(cust_id__icontains=q) | Q(done_by__icontains=q) |
-                        Q(invoice_number__icontains=q) | Q(work_order__icontains=q)
-                    )
-
-            qs = qs[:limit]
-
-            def _fmt(h):
-                return {
-                    'uid': getattr(h, 'uid', None), 'task_id': getattr(h, 'task_id', None),
-                    'cust_id': getattr(h, 'cust_id', None), 'week_of': getattr(h, 'week_of', None),
-                    'company': getattr(h, 'company', '') or '', 'charge': getattr(h, 'charge', None),
-                    'done_by': getattr(h, 'done_by', '') or '', 'emp_id': getattr(h, 'emp_id', None),
-                    'cash_paid': getattr(h, 'cash_paid', None), 'commission': getattr(h, 'commission', None),
-                    'tax': getattr(h, 'tax', None), 'route': getattr(h, 'route', '') or '',
-                    'cod': getattr(h, 'cod', None), 'voucher': getattr(h, 'voucher', None),
-                    'price': getattr(h, 'price', None), 'description': getattr(h, 'description', '') or '',
-                    'taxable': getattr(h, 'taxable', None), 'comm': getattr(h, 'comm', None),
-                    'master_id': getattr(h, 'master_id', None), 'other_bill': getattr(h, 'other_bill', None),
-                    'task_type': getattr(h, 'task_type', '') or '', 'comment': getattr(h, 'comment', '') or '',
-                    'adjust_amount': getattr(h, 'adjust_amount', None), 'mailto': getattr(h, 'mailto', None),
-                    'task_order': getattr(h, 'task_order', None), 'adv_date': getattr(h, 'adv_date', None),
-                    'adv_bill': getattr(h, 'adv_bill', None), 'order': getattr(h, 'order', None),
-                    'adv_freq': getattr(h, 'adv_freq', None), 'adv_credit': getattr(h, 'adv_credit', None),
-                    'spec_note': getattr(h, 'spec_note', None), 'frequency': getattr(h, 'frequency', None),
-                    'spec_equip': getattr(h, 'spec_equip', None), 'week_done': getattr(h, 'week_done', None),
-                    'emp_paid': getattr(h, 'emp_paid', None), 'work_order': getattr(h, 'work_order', '') or '',
-                    'invoice_number': getattr(h, 'invoice_number', '') or '',
-                }
-
-            data = [_fmt(h) for h in qs]
-
-            if cache_key:
-                cache.set(cache_key, data, CACHE_TTL)
+            data = json.loads(request.body.decode('utf-8') or '{}')
         except Exception:
-            data = []
+            return JsonResponse({'error': 'invalid json'}, status=400)
 
-    if count_only:
-        return JsonResponse({'count': len(data)})
-    return JsonResponse({'count': len(data), 'tasks': data})
+    try:
+        after_uid = int(data['after_uid']) if data.get('after_uid') not in ('', None) else None
+        batch_size = int(data.get('batch_size') or 0) or None
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'after_uid and batch_size must be integers'}, status=400)
 
+    week_from = parse_date_val(data.get('week_from'))
+    week_to = parse_date_val(data.get('week_to'))
+    if (data.get('week_from') and week_from is None) or (data.get('week_to') and week_to is None):
+        return JsonResponse({'error': 'invalid week_from/week_to'}, status=400)
 
-# /invoice_tasks
-@csrf_exempt
-@require_POST
-def monthly_invoice_tasks(request):
-    try:
-        payload = json.loads(request.body.decode('utf-8') or '{}')
-    except Exception:
-        return JsonResponse({'error': 'invalid json'}, status=400)
+    qs = invoice_history_queryset(after_uid=after_uid, week_from=week_from, week_to=week_to)
+    lines = ndjson_lines(qs, max(batch_size, 1)) if batch_size else ndjson_lines(qs)
+    response = StreamingHttpResponse(lines, content_type='application/x-ndjson')
+    response['Content-Disposition'] = 'attachment; filename="invoice_history.ndjson"'
+    return response
 
-    q = str(payload.get('q', '')).strip()
-    refresh = payload.get('refresh') in (True, '1', 'true', 'True')
-    cc = request.META.get('HTTP_CACHE_CONTROL', '')
-    count_only = validate_bool(payload.get('count_only'))
-    limit = int(payload.get('limit', MAX_RECORDS))
-
-    # --- Filter Extraction ---
-    uid = payload.get('uid')
-    task_id = payload.get('task_id')
-    master_id = payload.get('master_id')
-    cust_id = payload.get('cust_id')
-    company = payload.get('company')
-    invoice_number = payload.get('invoice_number')
-    week_of = payload.get('week_of')
-    week_done = payload.get('week_done')
-    emp_id = payload.get('emp_id')
-    route = payload.get('route')
-    done_by = payload.get('done_by')
-    work_order = payload.get('work_order')
-
-    # --- DB Filtering Logic ---
-    filters = {}
-    if uid: filters['uid'] = int(uid)
-    if task_id: filters['task_id'] = int(task_id)
-    if master_id: filters['master_id'] = master_id
-    if cust_id: filters['cust_id'] = cust_id
-    if invoice_number: filters['invoice_number'] = invoice_number
-    if emp_id: filters['emp_id'] = int(emp_id)
-    if company: filters['company__icontains'] = company
-    if week_of: filters['week_of'] = week_of
-    if week_done: filters['week_done'] = week_done
-    if route: filters['route__iexact'] = route
-    if done_by: filters['done_by__icontains'] = done_by
-    if work_order: filters['work_order__icontains'] = work_order
-
-    # --- Caching Strategy ---
-    # Only cache simple lookups. Bypass cache for any complex filter combinations.
-    cache_key = None
-    if not filters and not q:
-        cache_key = 'accounting_invoice_tasks_v1_all'
-    elif len(filters) == 1 and 'uid' in filters:
-        cache_key = f'accounting_invoice_tasks_v1_uid_{uid}'
-    elif len(filters) == 1 and 'task_id' in filters:
-        cache_key = f'accounting_invoice_tasks_v1_task_{task_id}'
-
-    if 'no-cache' in cc or 'max-age=0' in cc:
-        refresh = True
-
-    data = None
-    if not refresh and cache_key:
-        data = cache.get(cache_key)
-
-    if data is None:
-        try:
-            Model = apps.get_model('accounting', 'MonthlyInvoice')
-            qs = Model.objects.filter(**filters)
-
-            if q:
-                if q.isdigit():
-                    qs = qs.filter(
-                        Q(uid=q) | Q(task_id=q) | Q(emp_id=q) |
-                        Q(invoice_number__icontains=q)
-                    )
-                else:
-                    qs = qs.filter(
-                        Q(company__icontains=q) | Q(description__icontains=q) |
-                        Q(cust_id__icontains=q) | Q(invoice_number__icontains=q)
-                    )
-
-            qs = qs[:limit]
-
-            def _dec(v):
-                return str(v) if v is not None else None
-
-            def _fmt(t):
-                return {
-                    'uid': getattr(t, 'uid', None), 'task_id': getattr(t, 'task_id', None),
-                    'cust_id': getattr(t, 'cust_id', None), 'week_of': getattr(t, 'week_of', None),
-                    'company': getattr(t, 'company', '') or '', 'charge': _dec(getattr(t, 'charge', None)),
-                    'invoice_number': getattr(t, 'invoice_number', '') or '',
-                    'done_by': getattr(t, 'done_by', '') or '',
-                    'emp_id': getattr(t, 'emp_id', None), 'cash_paid': _dec(getattr(t, 'cash_paid', None)),
-                    'commission': getattr(t, 'commission', None), 'tax': getattr(t, 'tax', None),
-                    'route': getattr(t, 'route', None), 'cod': getattr(t, 'cod', None),
-                    'voucher': getattr(t, 'voucher', None), 'price': _dec(getattr(t, 'price', None)),
-                    'description': getattr(t, 'description', '') or '', 'taxable': getattr(t, 'taxable', None),
-                    'comm': _dec(getattr(t, 'comm', None)), 'master_id': getattr(t, 'master_id', None),
-                    'other_bill': getattr(t, 'other_bill', None), 'type': getattr(t, 'type', '') or '',
-                    'comment': getattr(t, 'comment', '') or '',
-                    'adjust_amount': _dec(getattr(t, 'adjust_amount', None)),
-                    'mailto': getattr(t, 'mailto', None), 'task_order': getattr(t, 'task_order', None),
-                    'adv_date': getattr(t, 'adv_date', None), 'adv_bill': getattr(t, 'adv_bill', None),
-                    'order': getattr(t, 'order', None), 'adv_freq': getattr(t, 'adv_freq', None),
-                    'adv_credit': getattr(t, 'adv_credit', None), 'spec_note': getattr(t, 'spec_note', None),
-                    'frequency': getattr(t, 'frequency', None), 'spec_equip': getattr(t, 'spec_equip', None),
-                    'week_done': getattr(t, 'week_done', None), 'emp_paid': getattr(t, 'emp_paid', None),
-                    'work_order': getattr(t, 'work_order', '') or '', 'status': getattr(t, 'status', None),
-                    'temp_deposit_date': getattr(t, 'temp_deposit_date', None),
-                    'selected': getattr(t, 'selected', None),
-                }
-
-            data = [_fmt(t) for t in qs]
-
-            if cache_key:
-                cache.set(cache_key, data, CACHE_TTL)
-        except Exception:
-            data = []
 
-    if count_only:
-        return JsonResponse({'count': len(data)})
-    return JsonResponse({'count': len(data), 'tasks': data})
+# /invoice_tasks
+monthly_invoice_tasks = Endpoint(
+    'accounting', 'MonthlyInvoice',
+    result_key='tasks',
+    fields=(
+        Field('uid'), Field('task_id'), Field('cust_id'), Field('week_of'), Field('company', fmt=text),
+        Field('charge', fmt=dec), Field('invoice_number', fmt=text), Field('done_by', fmt=text),
+        Field('emp_id'), Field('cash_paid', fmt=dec), Field('commission'), Field('tax'), Field('route'),
+        Field('cod'), Field('voucher'), Field('price', fmt=dec), Field('description', fmt=text),
+        Field('taxable'), Field('comm', fmt=dec), Field('master_id'), Field('other_bill'),
+        Field('type', fmt=text), Field('comment', fmt=text), Field('adjust_amount', fmt=dec),
+        Field('mailto'), Field('task_order'), Field('adv_date'), Field('adv_bill'), Field('order'),
+        Field('adv_freq'), Field('adv_credit'), Field('spec_note'), Field('frequency'),
+        Field('spec_equip'), Field('week_done'), Field('emp_paid'), Field('work_order', fmt=text),
+        Field('status'), Field('temp_deposit_date'), Field('selected'),
+    ),
+    filters={
+        'uid': ('uid', 'exact', int),
+        'task_id': ('task_id', 'exact', int),
+        'master_id': ('master_id', 'exact', stripped),
+        'cust_id': ('cust_id', 'exact', stripped),
+        'invoice_number': ('invoice_number', 'exact', stripped),
+        'emp_id': ('emp_id', 'exact', int),
+        'company': ('company', 'icontains', stripped),
+        'week_of': ('week_of', 'exact', stripped),
+        'week_done': ('week_done', 'exact', stripped),
+        'route': ('route', 'iexact', stripped),
+        'done_by': ('done_by', 'icontains', stripped),
+        'work_order': ('work_order', 'icontains', stripped),
+    },
+    search=Search(
+        text=('company__icontains', 'description__icontains', 'cust_id__icontains',
+              'invoice_number__icontains'),
+        digits=('uid', 'task_id', 'emp_id', 'invoice_number__icontains'),
+        index=fulltext.searcher('monthly_invoice'),
+        recheck=True,
+    ),
+    cache_prefix='accounting_invoice_tasks_v1',
+    streamable=True,
+).as_view()
 
 
 @csrf_exempt
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'api.v1.cache'
+
+urlpatterns = [
+    path('stats', views.stats, name='stats'),
+    path('stats/reset', views.reset_stats, name='reset_stats'),
+]
@@ -0,0 +1,35 @@
+# python file api/cache/views.py
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from utils import cachestats
+
+
+@require_GET
+# /stats
+def stats(request):
+    """
+    Cache telemetry of all workers per key family: hits, misses, stale serves,
+    fills (count, total µs, bytes), waits on another worker's fill, rendered
+    response hits/misses and evictions; plus the backend's size when it reports one.
+    """
+    cachestats.flush(force=True)
+    data = {'families': cachestats.snapshot()}
+    backend_stats = getattr(cache, 'stats', None)
+    if callable(backend_stats):
+        try:
+            data['backend'] = backend_stats()
+        except Exception:
+            data['backend'] = None
+    return JsonResponse(data)
+
+
+@csrf_exempt
+@require_POST
+# /stats/reset
+def reset_stats(request):
+    cachestats.flush(force=True)
+    cachestats.reset()
+    return JsonResponse({'success': True})
@@ -0,0 +1,889 @@
+# python
+# File: `api/v1/engine.py`
+"""
+Declarative list-endpoint engine shared by the api/v1 views.
+
+A list endpoint is declared once: model, allowed filters, `q` search, output
+fields and cache policy.  The declaration is compiled when the urlconf imports
+the views module; the compiled endpoint fetches rows with `values_list` tuples
+and formats them into compact tuples without per-row `getattr` calls.  Those
+tuples are what the cache stores; they are shaped into the requested response
+format ("rows", "columns" or "tuples") only when the response is rendered.
+
+Row sets are cached under a hash of the effective filters (plus `q` where it
+is applied in SQL), so every filter combination is cacheable and no two
+distinct queries share a key.
+
+    sites = Endpoint(
+        'customers', 'Site',
+        result_key='sites',
+        fields=(Field('cust_id'), Field('company', fmt=text), ...),
+        filters={'cust_id': ('cust_id', 'icontains', stripped), ...},
+        search=Search(text=('company__icontains',), digits=('cust_id__icontains',)),
+        presets={'list': ('cust_id', 'company', 'city')},
+        cache_prefix='customers_sites_v1',
+    ).as_view()
+
+Callers may narrow the output with `fields` (list or comma separated) or a
+named `preset`; only declared output keys are accepted and the projection is
+pushed into the SELECT.
+
+Passing `page_size` and/or `after` switches to keyset pagination.  Rows are
+ordered by the endpoint's `ordering` plus the primary key as a tie-breaker;
+the response carries an opaque `next` cursor and the following page is served
+with a `WHERE (key) > (cursor)` predicate instead of an OFFSET.
+
+Responses for cacheable requests are also kept fully rendered: the UTF-8 JSON
+body (and its br/gzip variants once it is large enough) is stored under a hash
+of the canonical request, so a hit is written out without touching the row
+cache, the JSON encoder or the compressor.
+
+Every cache key embeds the endpoint's generation, derived from the table
+generations (`utils.versions`) of its table and any `depends_on` tables, with
+SQL views resolved to their base tables, so an ORM write to any of them or
+`Endpoint.invalidate()` retires all of its keys at once.
+
+Cached row sets are stored packed by `utils.codec` (columnar, compressed) and
+decoded only for the rows a response reads; the cached `q` filter scans just
+the searched columns.
+
+An endpoint may also take a `snapshot` lookup: a callable returning the full
+row set for a query from an immutable store (or None), consulted before the
+cache and the database; see payroll.snapshots.
+
+Cached row sets are fresh for `cache_ttl` and may be served stale up to
+`hard_ttl` while a single worker refreshes them in the background
+(`utils.swr`); concurrent misses on a key wait for one query.
+
+A failed database read is logged and answered as an empty list, or, for a
+`strict` endpoint, as a 500 `{"error": ...}`.  Filters named in `exclusive`
+are alternatives: only the first one supplied, in the order listed, applies.
+
+Endpoints answer GET with the same parameters as a query string
+(`?cust_id=12&fields=cust_id,company`).  GET responses carry a strong ETag
+built from the generation and the canonical request; a matching
+`If-None-Match` is answered 304 from cache alone.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, date
+from itertools import islice
+from operator import itemgetter
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from base.settings import CACHE_HARD_TTL, CACHE_TTL, MAX_RECORDS, RECORD_PER_PAGE, STREAM_CHUNK_SIZE
+from utils import cachestats, codec, swr, versions
+from utils.compression import ENCODINGS, describe, negotiate, precompress
+from utils.types import validate_bool
+
+logger = logging.getLogger(__name__)
+
+
+class BadRequest(ValueError):
+    """Raised while parsing a payload; rendered as a 400 response."""
+
+
+# --- Output formatters (applied to a single column value) ---
+
+def text(v):
+    return v or ''
+
+
+def flag(v):
+    return bool(v)
+
+
+def dec(v):
+    return str(v) if v is not None else None
+
+
+def mmddyyyy(v):
+    if not v:
+        return None
+    if isinstance(v, str):
+        try:
+            v = datetime.fromisoformat(v)
+        except ValueError:
+            return v
+    if isinstance(v, (datetime, date)):
+        return v.strftime('%m/%d/%Y')
+    return None
+
+
+# --- Filter converters (applied to a payload value) ---
+
+def stripped(v):
+    return str(v).strip() or None
+
+
+class Field:
+    """One output key, read from `source` (defaults to `key`) and passed through `fmt`."""
+    __slots__ = ('key', 'source', 'fmt')
+
+    def __init__(self, key, source=None, fmt=None):
+        self.key = key
+        self.source = source or key
+        self.fmt = fmt
+
+
+class Search:
+    """
+    How the free-text `q` parameter is answered.
+
+    `text` / `digits` are ORed Django lookups used against the database for
+    non-numeric / numeric `q`.  `cached` lists output keys that are substring
+    matched in Python when the rows come from cache; leave it empty to bypass
+    the cache whenever `q` is present.  `index` is an optional in-process
+    index: a callable returning the primary keys matching `q`, best first, or
+    None when it is unavailable.  Rows it finds are read by primary key and
+    returned in its rank order instead of scanning with the lookups; with
+    `recheck` (an index that may lag writes) the lookups are still applied to
+    those rows.
+    """
+
+    def __init__(self, text=(), digits=None, cached=(), index=None, recheck=False):
+        self.text = tuple(text)
+        self.digits = tuple(self.text if digits is None else digits)
+        self.cached = tuple(cached)
+        self.index = index
+        self.recheck = recheck
+
+    def condition(self, q):
+        cond = Q()
+        for lookup in (self.digits if q.isdigit() else self.text):
+            cond |= Q(**{lookup: q})
+        return cond
+
+    def match(self, rows, q, positions):
+        if isinstance(rows, codec.PackedRows):
+            return rows.match(q, positions)
+        ql = q.lower()
+        return [r for r in rows if any(ql in str(r[i] if r[i] is not None else '').lower() for i in positions)]
+
+
+class ListQuery:
+    """Parsed request parameters for one call to an endpoint."""
+    __slots__ = ('params', 'filters', 'q', 'limit', 'count_only', 'with_total', 'refresh', 'stream', 'format',
+                 'projection', 'page_size', 'after', 'generation', 'hits')
+
+    def __init__(self, params, filters, q, limit, count_only, refresh, with_total=False, stream=False,
+                 format='rows', projection=None, page_size=None, after=None):
+        self.params = params
+        self.filters = filters
+        self.q = q
+        self.limit = limit
+        self.count_only = count_only
+        self.with_total = with_total
+        self.refresh = refresh
+        self.stream = stream
+        self.format = format
+        self.projection = projection
+        # keyset pagination: page_size is None unless paginating; after is the decoded cursor
+        self.page_size = page_size
+        self.after = after
+        # data generation of the endpoint, read once per request (see Endpoint.generation)
+        self.generation = None
+        # search index answer for `q`, read once per request (see Endpoint.indexed)
+        self.hits = UNREAD
+
+
+# ListQuery.hits before the search index has been asked.
+UNREAD = object()
+
+
+# Response shapes accepted in the `format` parameter:
+#   rows    -> {"count": n, "<result_key>": [{field: value, ...}, ...]}
+#   columns -> {"count": n, "fields": [...], "<result_key>": [[column 0 values], [column 1 values], ...]}
+#   tuples  -> {"count": n, "fields": [...], "<result_key>": [[row 0 values], [row 1 values], ...]}
+FORMATS = ('rows', 'columns', 'tuples')
+
+# Compiled projections kept per endpoint; further combinations are compiled per request.
+MAX_PLANS = 64
+
+# Primary keys per `pk__in` read of search index hits (SQL Server allows 2100 parameters).
+MAX_IN_KEYS = 2000
+
+
+def _picker(positions):
+    if len(positions) == 1:
+        i = positions[0]
+        return lambda r: (r[i],)
+    return itemgetter(*positions)
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(DjangoJSONEncoder().encode(list(values)).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token):
+    """Return the cursor's key as canonical JSON text (compared verbatim on cache hits)."""
+    try:
+        raw = base64.urlsafe_b64decode(str(token).encode('ascii')).decode('utf-8')
+        values = json.loads(raw)
+    except (ValueError, UnicodeError, binascii.Error):
+        raise BadRequest('invalid cursor')
+    if not isinstance(values, list):
+        raise BadRequest('invalid cursor')
+    return raw, values
+
+
+def _after(keyset, values):
+    """
+    Predicate selecting rows strictly after `values` in keyset order, expanded
+    as (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...  NULLs sort first ascending
+    and last descending, as on SQL Server.
+    """
+    terms = []
+    same = Q()
+    for (field, desc), v in zip(keyset, values):
+        if v is None:
+            if not desc:
+                terms.append(same & Q(**{f'{field}__isnull': False}))
+            same &= Q(**{f'{field}__isnull': True})
+        else:
+            step = Q(**{f'{field}__lt' if desc else f'{field}__gt': v})
+            if desc:
+                step |= Q(**{f'{field}__isnull': True})
+            terms.append(same & step)
+            same &= Q(**{field: v})
+    if not terms:
+        return Q(pk__in=[])
+    cond = terms[0]
+    for t in terms[1:]:
+        cond |= t
+    return cond
+
+
+class _Plan:
+    """
+    The compiled column set for one projection of an endpoint: which columns
+    to SELECT, the output keys, and a serializer from `values_list` tuples to
+    formatted output tuples.  `picks` selects this projection out of a row of
+    the endpoint's full plan (used when rows come from cache).  `extra` source
+    columns are selected but not output; `key` reads them back from a raw row.
+    """
+
+    def __init__(self, fields, full_keys=None, extra=()):
+        self.keys = tuple(f.key for f in fields)
+        # values_list columns, de-duplicated; fields may share a source column
+        self.columns = tuple(dict.fromkeys([f.source for f in fields] + list(extra)))
+        self.key = _picker([self.columns.index(c) for c in extra]) if extra else None
+        positions = tuple(self.columns.index(f.source) for f in fields)
+        self.converters = tuple((i, f.fmt) for i, f in enumerate(fields) if f.fmt is not None)
+        self.pick = None if positions == tuple(range(len(self.columns))) else _picker(positions)
+        self.picks = None if full_keys in (None, self.keys) else _picker([full_keys.index(k) for k in self.keys])
+
+    def serialize(self, rows):
+        pick, converters = self.pick, self.converters
+        if pick is None and not converters:
+            return list(rows)
+        out = []
+        append = out.append
+        for r in rows:
+            if pick is not None:
+                r = pick(r)
+            if converters:
+                r = list(r)
+                for i, fmt in converters:
+                    r[i] = fmt(r[i])
+                r = tuple(r)
+            append(r)
+        return out
+
+    def project(self, rows):
+        """Narrow rows of the full plan to this projection."""
+        if self.picks is None:
+            return rows if isinstance(rows, list) else list(rows)
+        picks = self.picks
+        return [picks(r) for r in rows]
+
+
+class Endpoint:
+    """A compiled api/v1 list endpoint.  See the module docstring."""
+
+    def __init__(self, app_label, model_name, result_key, fields, filters=None, search=None,
+                 ordering=None, presets=None, cache_prefix=None, cache_ttl=CACHE_TTL,
+                 hard_ttl=CACHE_HARD_TTL, streamable=False, depends_on=(), snapshot=None, strict=False,
+                 exclusive=()):
+        self.app_label = app_label
+        self.model_name = model_name
+        self.result_key = result_key
+        self.fields = tuple(fields)
+        self.filters = dict(filters or {})
+        self.search = search
+        self.ordering = tuple(ordering or ())
+        self.presets = {name: tuple(keys) for name, keys in (presets or {}).items()}
+        self.cache_prefix = cache_prefix
+        self.cache_ttl = cache_ttl
+        self.hard_ttl = hard_ttl
+        self.streamable = streamable
+        self.depends_on = tuple(depends_on)
+        self.snapshot = snapshot
+        self.strict = strict
+        self.exclusive = tuple(exclusive)
+        self.compile()
+
+    # --- compilation ---
+
+    def compile(self):
+        self.keys = tuple(f.key for f in self.fields)
+        self.by_key = {f.key: f for f in self.fields}
+        for name, keys in self.presets.items():
+            unknown = [k for k in keys if k not in self.by_key]
+            if unknown:
+                raise ImproperlyConfigured(f'preset {name!r} names undeclared fields: {", ".join(unknown)}')
+
+        self.full = _Plan(self.fields)
+        self.plans = {(self.keys, False): self.full}
+        self.search_positions = tuple(self.keys.index(k) for k in self.search.cached) if self.search else ()
+        self.tables = versions.expand(self.depends_on)
+
+        try:
+            self.model = apps.get_model(self.app_label, self.model_name)
+        except LookupError:
+            # model not registered: serve consistent empty responses
+            self.model = None
+            return
+        # views resolve to the base tables they select from (utils.versions.VIEW_SOURCES)
+        self.tables = versions.expand((self.model._meta.db_table,) + self.depends_on)
+
+        opts = self.model._meta
+        for f in self.fields:
+            try:
+                opts.get_field(f.source)
+            except FieldDoesNotExist:
+                raise ImproperlyConfigured(
+                    f'{self.app_label}.{self.model_name} has no field {f.source!r} (output key {f.key!r})')
+
+        # Stable sort key: the declared ordering plus the primary key as tie-breaker.
+        keyset = [(o.lstrip('-'), o.startswith('-')) for o in self.ordering]
+        pk = opts.pk.name
+        if pk not in [field for field, _ in keyset]:
+            keyset.append((pk, False))
+        self.keyset = tuple(keyset)
+        self.order_by = tuple(('-' if desc else '') + field for field, desc in self.keyset)
+        self.key_sources = tuple(field for field, _ in self.keyset)
+        # Positions of the key columns in a cached (full plan) row, when all are output unformatted.
+        raw = {f.source: i for i, f in enumerate(self.fields) if f.fmt is None}
+        self.cached_key = (_picker([raw[c] for c in self.key_sources])
+                           if all(c in raw for c in self.key_sources) else None)
+
+    def plan(self, projection, paged=False):
+        if projection is None and not paged:
+            return self.full
+        keys = projection or self.keys
+        plan = self.plans.get((keys, paged))
+        if plan is None:
+            plan = _Plan([self.by_key[k] for k in keys], self.keys, self.key_sources if paged else ())
+            if len(self.plans) < MAX_PLANS:
+                self.plans[(keys, paged)] = plan
+        return plan
+
+    # --- request handling ---
+
+    def parse_projection(self, payload):
+        fields, preset = payload.get('fields'), payload.get('preset')
+        if fields:
+            if isinstance(fields, str):
+                fields = fields.split(',')
+            if not isinstance(fields, (list, tuple)):
+                raise BadRequest('fields must be a list or comma separated string')
+            keys = tuple(dict.fromkeys(str(k).strip() for k in fields if str(k).strip()))
+            unknown = [k for k in keys if k not in self.by_key]
+            if unknown:
+                raise BadRequest(f'unknown fields: {", ".join(unknown)}')
+        elif preset:
+            keys = self.presets.get(preset)
+            if keys is None:
+                raise BadRequest(f'unknown preset: {preset}')
+        else:
+            return None
+        return keys if keys and keys != self.keys else None
+
+    def parse(self, payload):
+        params, filters = {}, {}
+        chosen = next((p for p in self.exclusive if payload.get(p) not in ('', None)), None)
+        for param, (field, lookup, convert) in self.filters.items():
+            raw = payload.get(param)
+            if raw in ('', None) or (param in self.exclusive and param != chosen):
+                continue
+            try:
+                value = convert(raw)
+            except (ValueError, TypeError, ArithmeticError):
+                raise BadRequest(f'invalid value for {param}')
+            if value is None:
+                continue
+            params[param] = value
+            filters[field if lookup == 'exact' else f'{field}__{lookup}'] = value
+
+        try:
+            limit = int(payload.get('limit', MAX_RECORDS))
+        except (ValueError, TypeError):
+            raise BadRequest('invalid limit')
+
+        fmt = payload.get('format') or 'rows'
+        if fmt not in FORMATS:
+            raise BadRequest(f'invalid format; expected one of {", ".join(FORMATS)}')
+        page_size, after = payload.get('page_size'), payload.get('after')
+        if page_size not in ('', None) or after not in ('', None):
+            try:
+                page_size = int(page_size) if page_size not in ('', None) else RECORD_PER_PAGE
+            except (ValueError, TypeError):
+                raise BadRequest('invalid page_size')
+            page_size = max(1, min(page_size, MAX_RECORDS))
+            if after not in ('', None):
+                after = decode_cursor(after)
+                if len(after[1]) != len(getattr(self, 'keyset', ())):
+                    raise BadRequest('invalid cursor')
+            else:
+                after = None
+        else:
+            page_size = after = None
+
+        # paginated requests are served a page at a time, never streamed
+        stream = self.streamable and page_size is None and bool(validate_bool(payload.get('stream')))
+        if stream and fmt == 'columns':
+            raise BadRequest('format "columns" cannot be streamed; use "tuples"')
+
+        return ListQuery(
+            params=params,
+            filters=filters,
+            q=str(payload.get('q', '') or '').strip(),
+            limit=limit,
+            count_only=bool(validate_bool(payload.get('count_only'))),
+            with_total=bool(validate_bool(payload.get('with_total'))),
+            refresh=payload.get('refresh') in (True, '1', 'true', 'True'),
+            stream=stream,
+            format=fmt,
+            projection=self.parse_projection(payload),
+            page_size=page_size,
+            after=after,
+        )
+
+    def generation(self, query):
+        """Short digest of the generations of this endpoint's tables, read once per query."""
+        if query.generation is None:
+            tokens = ','.join(str(v) for v in versions.current(self.tables))
+            query.generation = hashlib.sha1(tokens.encode('ascii')).hexdigest()[:12]
+        return query.generation
+
+    def invalidate(self):
+        """Retire every cached row set and rendered response of this endpoint after a write."""
+        versions.bump(*self.tables)
+
+    def warm(self, payload=None):
+        """Fill the cached row set for `payload` unless it is resident; returns its row count."""
+        query = self.parse(payload or {})
+        if self.cache_key(query) is None:
+            return 0
+        return len(self.rows(query))
+
+    def failed(self, what):
+        """Log the read error being handled; a `strict` endpoint re-raises it to be answered 500."""
+        logger.exception('%s.%s: %s failed', self.app_label, self.model_name, what)
+        if self.strict:
+            raise
+
+    def snapshot_rows(self, query):
+        """The complete, unsearched row set for `query` from the snapshot store, or None."""
+        if self.snapshot is None or query.refresh or (query.q and not self.search_cached(query)):
+            return None
+        return self.snapshot(query)
+
+    def search_cached(self, query):
+        """True when `q` is applied to a cached unsearched set rather than in SQL."""
+        return bool(query.q and self.search and self.search.cached)
+
+    @staticmethod
+    def fill_size(query):
+        """Rows held by the cached set for `query`; a set this long may be truncated."""
+        return max(query.limit, MAX_RECORDS)
+
+    @staticmethod
+    def canonical_filters(query):
+        """
+        Effective filters, sorted by lookup, with case-insensitive lookups
+        case-folded: aliases and spellings that select the same rows agree.
+        """
+        return sorted(
+            (lookup, str(value).casefold() if lookup.rpartition('__')[2].startswith('i') else value)
+            for lookup, value in query.filters.items()
+        )
+
+    def search_path(self, query):
+        """
+        How a `q` applied in SQL is answered: 'index' (rank order) or 'sql'
+        (endpoint order); '' when there is no such `q`.  Keys include it so a
+        set or response ordered one way is never served for the other.
+        """
+        if not (query.q and self.search and not self.search.cached):
+            return ''
+        return 'sql' if self.indexed(query) is None else 'index'
+
+    def cache_key(self, query):
+        """
+        Key of the cached row set for `query`: a hash of its effective filters,
+        its `q` when that is applied in SQL and how it was answered, the
+        ordering and the fill size.  Projection, format and pages are cut from
+        the set and so share it.
+        """
+        if not self.cache_prefix:
+            return None
+        q = query.q.casefold() if query.q and self.search and not self.search.cached else ''
+        canonical = DjangoJSONEncoder().encode([
+            self.canonical_filters(query), q, self.search_path(query), getattr(self, 'order_by', ()),
+            self.fill_size(query),
+        ])
+        digest = hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+        return f'{self.cache_prefix}_{self.generation(query)}_{digest}'
+
+    def digest(self, query):
+        """Hash of the canonical request: the same rows in the same shape hash alike."""
+        canonical = DjangoJSONEncoder().encode([
+            self.canonical_filters(query), query.q.casefold(), self.search_path(query), query.limit, query.format,
+            query.projection, query.with_total, query.count_only, query.stream, query.page_size,
+            query.after[0] if query.after else None,
+        ])
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+    def render_key(self, query):
+        """Key of the rendered response for `query`, or None when it is not cached."""
+        if query.stream or query.count_only or self.cache_key(query) is None:
+            return None
+        return f'{self.cache_prefix}_{self.generation(query)}_r_{self.digest(query)}'
+
+    def etag(self, query):
+        """
+        Strong validator for a GET response.  The generation changes with any
+        ORM write to the endpoint's tables; the TTL bucket bounds how long a
+        tag may outlive writes made outside this application.
+        """
+        bucket = int(time.time() // self.cache_ttl) if self.cache_ttl else 0
+        return f'{self.generation(query)}-{bucket:x}-{self.digest(query)[:16]}'
+
+    def indexed(self, query):
+        """Primary keys matching `q` from the search index, best first, or None to search in SQL."""
+        if not (query.q and self.search and self.search.index):
+            return None
+        if query.hits is UNREAD:
+            try:
+                query.hits = self.search.index(query.q)
+            except Exception:
+                query.hits = None
+        return query.hits
+
+    def queryset(self, query, plan, with_search=True, hits=None):
+        qs = self.model.objects.filter(**query.filters)
+        if with_search and query.q and self.search:
+            hits = self.indexed(query) if hits is None else hits
+            if hits is not None and len(hits) <= MAX_IN_KEYS:
+                qs = qs.filter(pk__in=hits)
+                if self.search.recheck:
+                    qs = qs.filter(self.search.condition(query.q))
+            else:
+                qs = qs.filter(self.search.condition(query.q))
+        return qs.order_by(*self.order_by).values_list(*plan.columns)
+
+    def fetch(self, query, plan, limit, with_search=True):
+        if self.model is None:
+            return []
+        hits = self.indexed(query) if with_search else None
+        if hits is not None:
+            return self.fetch_ranked(query, plan, hits, limit)
+        return plan.serialize(self.queryset(query, plan, with_search)[:limit])
+
+    def fetch_ranked(self, query, plan, hits, limit):
+        """Rows for search index hits in rank order, reading only as many keys as `limit` needs."""
+        found = {}
+        step = min(MAX_IN_KEYS, limit) if limit else MAX_IN_KEYS
+        for start in range(0, len(hits), step):
+            qs = self.model.objects.filter(**query.filters).filter(pk__in=hits[start:start + step])
+            if self.search.recheck:
+                qs = qs.filter(self.search.condition(query.q))
+            found.update((r[0], r[1:]) for r in qs.values_list('pk', *plan.columns))
+            if limit and len(found) >= limit:
+                break
+        rows = [found[pk] for pk in hits if pk in found]
+        return plan.serialize(rows[:limit] if limit else rows)
+
+    def count(self, query):
+        """
+        Uncapped number of rows matching `query`.  A cached set shorter than its
+        fill size was never truncated, so it answers exactly without a query;
+        otherwise this is a single COUNT(*) with the same filters and search.
+        """
+        if self.model is None:
+            return 0
+        data = self.snapshot_rows(query)
+        if data is not None:
+            return len(self.search.match(data, query.q, self.search_positions) if query.q else data)
+        key = self.cache_key(query)
+        if key is not None and not query.refresh:
+            data = codec.unpack(swr.peek(key))
+            if data is not None and len(data) < self.fill_size(query):
+                if self.search_cached(query):
+                    return len(self.search.match(data, query.q, self.search_positions))
+                return len(data)
+        try:
+            hits = self.indexed(query)
+            if hits is not None and not query.filters and not self.search.recheck:
+                return len(hits)
+            return self.queryset(query, self.full, hits=hits).count()
+        except Exception:
+            self.failed('count')
+            return 0
+
+    def stream(self, query):
+        """
+        Write the JSON array incrementally from a chunked iterator so peak memory
+        stays at one chunk regardless of `limit`.  `count` trails the rows since it
+        is only known once the cursor is drained.
+        """
+        plan = self.plan(query.projection)
+        qs = self.queryset(query, plan)
+        if query.limit:
+            qs = qs[:query.limit]
+        rows = qs.iterator(chunk_size=STREAM_CHUNK_SIZE)
+        encode = DjangoJSONEncoder().encode
+        keys = plan.keys
+        as_dicts = query.format == 'rows'
+        total = f', "total": {self.count(query)}' if query.with_total else ''
+
+        def chunks():
+            count = 0
+            if as_dicts:
+                yield f'{{"{self.result_key}": ['
+            else:
+                yield f'{{"fields": {encode(keys)}, "{self.result_key}": ['
+            while True:
+                batch = plan.serialize(islice(rows, STREAM_CHUNK_SIZE))
+                if not batch:
+                    break
+                if as_dicts:
+                    body = ', '.join(encode(dict(zip(keys, r))) for r in batch)
+                else:
+                    body = ', '.join(encode(r) for r in batch)
+                yield body if count == 0 else ', ' + body
+                count += len(batch)
+            yield f'], "count": {count}{total}}}'
+
+        return StreamingHttpResponse(chunks(), content_type='application/json')
+
+    def rows(self, query):
+        plan = self.plan(query.projection)
+        key = self.cache_key(query)
+        data = self.snapshot_rows(query)
+        if data is None and key is not None and plan is self.full:
+            # Fill the shared key with the full unsearched set, never a caller's smaller page.
+            try:
+                data = codec.unpack(swr.get_or_fill(
+                    key, lambda: codec.pack(self.fetch(query, self.full, self.fill_size(query),
+                                                       with_search=not self.search_cached(query))),
+                    self.cache_ttl, self.hard_ttl, refresh=query.refresh))
+            except Exception:
+                self.failed('rows')
+                return []
+        elif data is None and key is not None and not query.refresh:
+            data = codec.unpack(swr.peek(key))
+
+        if data is None:
+            # Nothing cached for a projection: SELECT only the requested columns.
+            try:
+                return self.fetch(query, plan, query.limit)
+            except Exception:
+                self.failed('rows')
+                return []
+
+        if self.search_cached(query):
+            data = self.search.match(data, query.q, self.search_positions)
+        if query.limit and len(data) > query.limit:
+            data = data[:query.limit]
+        return plan.project(data)
+
+    def page(self, query):
+        """
+        One keyset page: returns (rows, next cursor or None).  A cached set is
+        in the same keyset order, so the cursor row is found there by exact key
+        match; otherwise the page is read with the `_after` predicate.
+        """
+        plan = self.plan(query.projection)
+        size = query.page_size
+        key = self.cache_key(query)
+        data = complete = None
+        if self.cached_key is not None:
+            data = complete = self.snapshot_rows(query)
+            if data is None and key is not None and not query.refresh:
+                data = codec.unpack(swr.peek(key))
+        if data is not None:
+            if self.search_cached(query):
+                data = self.search.match(data, query.q, self.search_positions)
+            start = 0
+            if query.after is not None:
+                encode = DjangoJSONEncoder().encode
+                token = query.after[0]
+                start = next((i + 1 for i, r in enumerate(data) if encode(list(self.cached_key(r))) == token), None)
+            truncated = complete is None and len(data) >= self.fill_size(query)
+            if start is not None and (start + size <= len(data) or not truncated):
+                rows = data[start:start + size]
+                more = start + size < len(data) or truncated
+                cursor = encode_cursor(self.cached_key(rows[-1])) if rows and more else None
+                return plan.project(rows), cursor
+            # cursor row no longer cached, or the page runs past a truncated set: read from the database
+
+        if self.model is None:
+            return [], None
+        paged = self.plan(query.projection, paged=True)
+        qs = self.queryset(query, paged)
+        if query.after is not None:
+            qs = qs.filter(_after(self.keyset, query.after[1]))
+        try:
+            raw = list(qs[:size + 1])
+        except Exception:
+            self.failed('page')
+            return [], None
+        cursor = encode_cursor(paged.key(raw[size - 1])) if len(raw) > size else None
+        return paged.serialize(raw[:size]), cursor
+
+    def shape(self, data, fmt, keys):
+        if fmt == 'rows':
+            return {self.result_key: [dict(zip(keys, r)) for r in data]}
+        if fmt == 'tuples':
+            return {'fields': keys, self.result_key: data}
+        columns = list(zip(*data)) if data else [() for _ in keys]
+        return {'fields': keys, self.result_key: columns}
+
+    @staticmethod
+    def rendered(request, entry):
+        """HttpResponse for a rendered (body, {encoding: (data, ms)}) entry."""
+        body, variants = entry
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), tuple(variants))
+        if encoding is not None:
+            data, ms = variants[encoding]
+            response = HttpResponse(data, content_type='application/json')
+            response['Content-Encoding'] = encoding
+            response['X-Compression'] = describe(encoding, len(body), len(data), ms, cached=True)
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        if variants:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    @staticmethod
+    def not_modified(request, tag):
+        """
+        The variant of `tag` that If-None-Match names: its encoding ('' for the
+        identity response), or None when the header does not name `tag`.
+        """
+        header = request.META.get('HTTP_IF_NONE_MATCH', '')
+        if not header:
+            return None
+        if header.strip() == '*':
+            return negotiate(request.META.get('HTTP_ACCEPT_ENCODING', '')) or ''
+        for candidate in header.split(','):
+            candidate = candidate.strip()
+            if candidate.startswith('W/'):
+                candidate = candidate[2:]
+            candidate = candidate.strip('"')
+            # compressed responses suffix the tag with their encoding
+            for encoding in ENCODINGS:
+                if candidate == f'{tag}-{encoding}':
+                    return encoding
+            if candidate == tag:
+                return ''
+        return None
+
+    def respond(self, request):
+        if request.method == 'GET':
+            payload = {k: v[0] if len(v) == 1 else v for k, v in request.GET.lists()}
+        else:
+            try:
+                payload = json.loads(request.body.decode('utf-8') or '{}')
+            except Exception:
+                return JsonResponse({'error': 'invalid json'}, status=400)
+
+        try:
+            query = self.parse(payload)
+        except BadRequest as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        cc = request.META.get('HTTP_CACHE_CONTROL', '')
+        if 'no-cache' in cc or 'max-age=0' in cc:
+            query.refresh = True
+
+        if request.method != 'GET':
+            return self.answer(request, query)
+
+        tag = self.etag(query)
+        held = None if query.refresh else self.not_modified(request, tag)
+        if held is not None:
+            response = HttpResponseNotModified()
+            patch_vary_headers(response, ('Accept-Encoding',))
+            # the validator of the variant the client holds, as its 200 carried it
+            encoding = held
+        else:
+            response = self.answer(request, query)
+            if response.status_code != 200:
+                return response
+            encoding = response.get('Content-Encoding')
+        response['ETag'] = f'"{tag}-{encoding}"' if encoding else f'"{tag}"'
+        patch_cache_control(response, max_age=0, must_revalidate=True)
+        return response
+
+    def answer(self, request, query):
+
+        if query.stream and not query.count_only and self.model is not None:
+            return self.stream(query)
+
+        if query.count_only:
+            return JsonResponse({'count': self.count(query)})
+
+        render_key = self.render_key(query)
+        if render_key is not None and not query.refresh:
+            entry = cache.get(render_key)
+            cachestats.record(render_key, 'render_miss' if entry is None else 'render_hit')
+            if entry is not None:
+                return self.rendered(request, entry)
+
+        head = {}
+        if query.page_size is not None:
+            data, head['next'] = self.page(query)
+        else:
+            data = self.rows(query)
+        if query.with_total:
+            head['total'] = self.count(query)
+        keys = query.projection or self.keys
+        payload = {'count': len(data), **head, **self.shape(data, query.format, keys)}
+        if render_key is None:
+            return JsonResponse(payload)
+
+        body = json.dumps(payload, cls=DjangoJSONEncoder).encode('utf-8')
+        entry = (body, precompress(body))
+        cache.set(render_key, entry, self.cache_ttl)
+        return self.rendered(request, entry)
+
+    def as_view(self):
+        @csrf_exempt
+        @require_http_methods(['GET', 'POST'])
+        def view(request):
+            try:
+                return self.respond(request)
+            except Exception as e:
+                if not self.strict:
+                    raise
+                return JsonResponse({'error': str(e)}, status=500)
+
+        view.endpoint = self
+        return view
@@ -7,215 +7,63 @@ import traceback
 
 from django.apps import apps
 from django.contrib.admin.checks import refer_to_missing_field
-from django.core.cache import cache
-from django.db.models import Q
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET, require_POST, require_http_methods
 
+from api.v1.engine import Endpoint, Field, Search, stripped, text
 from base import settings
-from base.settings import CACHE_TTL, MAX_RECORDS
+from hr import search
 from utils.types import validate_bool
 
 
-@csrf_exempt
-@require_POST
-def employees(request):
-    """
-    POST /employees
-    Supports: q, id|emp_id, name, company, city, state, employed, refresh, cache-control, count_only
-    """
-    try:
-        payload = json.loads(request.body.decode('utf-8') or '{}')
-    except Exception:
-        return JsonResponse({'error': 'invalid json'}, status=400)
-
-    q = str(payload.get('q', '')).strip()
-    filters = {}
-    refresh = payload.get('refresh') in (True, '1', 'true', 'True')
-    cc = request.META.get('HTTP_CACHE_CONTROL', '')
-    count_only = validate_bool(payload.get('count_only'))
-    limit = int(payload.get('limit', MAX_RECORDS))
-
-    emp_id = payload.get('id', '') or payload.get('emp_id', '')
-    name = payload.get('name', '')
-    company = payload.get('company', '')
-    
-    # Use explicit get without default to allow None
-    employed = validate_bool(payload.get('employed'))
-    
-    status = payload.get('status', '')
-    hourly = payload.get('hourly', '')
-    address1 = payload.get('address1', '')
-    address2 = payload.get('address2', '')
-    city = payload.get('city', '')
-    state = payload.get('state', '')
-    zip_code = payload.get('zip', '')
-    cell = payload.get('cell', '')
-    phone = payload.get('phone', '')
-    start_date = payload.get('start_date', '')
-    end_date = payload.get('end_date', '')
-    driver = validate_bool(payload.get('driver'))
-    subcontractor = validate_bool(payload.get('subcontractor'))
-    is_1099 = validate_bool(payload.get('is_1099'))
-    email = payload.get('email', '')
-    cache_key = None
-
-    if emp_id:
-        filters['id'] = emp_id
-    if name:
-        filters['name__icontains'] = name
-    if company:
-        filters['company__icontains'] = company
-    if employed is not None:
-        filters['employed'] = employed
-    if status:
-        filters['status__iexact'] = status
-    if hourly:
-        filters['hourly'] = float(hourly)
-    if address1:
-        filters['address1__icontains'] = address1
-    if address2:
-        filters['address2__icontains'] = address2
-    if city:
-        filters['city__icontains'] = city
-    if state:
-        filters['state__iexact'] = state
-    if zip_code:
-        filters['zip__icontains'] = zip_code
-    if cell:
-        filters['cell__icontains'] = cell
-    if phone:
-        filters['phone__icontains'] = phone
-    if start_date:
-        filters['start_date__date'] = start_date
-    if end_date:
-        filters['end_date__date'] = end_date
-    if driver is not None:
-        filters['driver'] = driver
-    if subcontractor is not None:
-        filters['subcontractor'] = subcontractor
-    if is_1099 is not None:
-        filters['is_1099'] = is_1099
-    if email:
-        filters['email__icontains'] = email
-
-    if 'no-cache' in cc or 'max-age=0' in cc:
-        refresh = True
-        cache_key = 'hr_employees_v1_all'
-
-    # Logic fix: If refresh is True, we usually want to fetch from DB, not cache.
-    # But if we are using a shared cache key 'hr_employees_v1_all', maybe we want to use it?
-    # The original logic was: if refresh and cache has data, use it. This is weird.
-    # I will change it to: if NOT refresh, try cache.
-    
-    data = None
-    if not refresh and cache_key:
-        data = cache.get(cache_key)
-
-    if data is not None:
-        # Filter cached data in Python
-        if employed is not None:
-             data = [e for e in data if e.get('employed') == employed]
-             
-        if q:
-            ql = q.lower()
-            data = [
-                e for e in data
-                if ql in str(e.get('id', '')).lower()
-                   or ql in (e.get('name') or '').lower()
-                   or ql in (e.get('company') or '').lower()
-                   or ql in (e.get('email') or '').lower()
-            ]
-        # Apply limit to cached data
-        if limit and len(data) > limit:
-            data = data[:limit]
-    else:
-        try:
-            try:
-                Model = apps.get_model('hr', 'Employee')
-            except LookupError:
-                Model = None
-
-            if Model is None:
-                data = []
-            else:
-                qs = Model.objects.filter(**filters) if filters else Model.objects.all()
-
-                if q:
-                    if q.isdigit():
-                        qs = qs.filter(
-                            Q(id__exact=q) |
-                            Q(name__icontains=q) |
-                            Q(company__icontains=q)
-                        )
-                    else:
-                        qs = qs.filter(
-                            Q(name__icontains=q) |
-                            Q(company__icontains=q) |
-                            Q(email__icontains=q) |
-                            Q(city__icontains=q)
-                        )
-                
-                # Apply limit
-                qs = qs[:limit]
-
-                def _fmt_employee(e):
-                    return {
-                        'id': getattr(e, 'id', None),
-                        'name': getattr(e, 'name', '') or '',
-                        'company': getattr(e, 'company', '') or '',
-                        'ssn': getattr(e, 'ssn', '') or '',
-                        'employed': getattr(e, 'employed', None),
-                        'status': getattr(e, 'status', '') or '',
-                        'allowances': getattr(e, 'allowances', None),
-                        'hourly': getattr(e, 'hourly', None),
-                        'address1': getattr(e, 'address1', '') or '',
-                        'address2': getattr(e, 'address2', '') or '',
-                        'city': getattr(e, 'city', '') or '',
-                        'state': getattr(e, 'state', '') or '',
-                        'zip': getattr(e, 'zip', '') or '',
-                        'cell': getattr(e, 'cell', '') or '',
-                        'phone': getattr(e, 'phone', '') or '',
-                        'phone2': getattr(e, 'phone2', '') or '',
-                        'start_date': getattr(e, 'start_date', None),
-                        'end_date': getattr(e, 'end_date', None),
-                        'comm_rate': getattr(e, 'comm_rate', None),
-                        'efficiency': getattr(e, 'efficiency', None),
-                        'map_link': getattr(e, 'map_link', '') or '',
-                        'photo': getattr(e, 'photo', '') or '',
-                        'sales_commission_rate': getattr(e, 'sales_commission_rate', None),
-                        'pwd': getattr(e, 'pwd', '') or '',
-                        'driver': getattr(e, 'driver', None),
-                        'mass_mailer': getattr(e, 'mass_mailer', None),
-                        'has_personal_prospects': getattr(e, 'has_personal_prospects', None),
-                        'sales': getattr(e, 'sales', None),
-                        'subcontractor': getattr(e, 'subcontractor', None),
-                        'is_1099': getattr(e, 'is_1099', None),
-                        'fed_tax_number': getattr(e, 'fed_tax_number', '') or '',
-                        'entity': getattr(e, 'entity', '') or '',
-                        'email': getattr(e, 'email', '') or '',
-                    }
-
-                data = [_fmt_employee(emp) for emp in qs]
-
-        except Exception:
-            data = []
-
-        if (refresh or cache_key is not None) and cache_key:
-            # Only cache if we have a key (which implies we are caching 'all' or a specific set)
-            # But here we only set cache_key if headers are present.
-            # And if we filtered by 'employed' in DB, we shouldn't cache it as 'all'.
-            # So we should only cache if filters is empty (except maybe q? no, q filters too).
-            
-            # If we have filters, we shouldn't update the 'all' cache with filtered data.
-            if not filters and not q:
-                 cache.set(cache_key, data, CACHE_TTL)
-
-    if count_only:
-        return JsonResponse({'count': len(data)})
-
-    return JsonResponse({'count': len(data), 'employees': data})
+# /employees
+# Supports: q, id|emp_id, name, company, city, state, employed, refresh, cache-control, count_only
+employees = Endpoint(
+    'hr', 'Employee',
+    result_key='employees',
+    fields=(
+        Field('id'), Field('name', fmt=text), Field('company', fmt=text), Field('ssn', fmt=text),
+        Field('employed'), Field('status', fmt=text), Field('allowances'), Field('hourly'),
+        Field('address1', fmt=text), Field('address2', fmt=text), Field('city', fmt=text),
+        Field('state', fmt=text), Field('zip', fmt=text), Field('cell', fmt=text), Field('phone', fmt=text),
+        Field('phone2', fmt=text), Field('start_date'), Field('end_date'), Field('comm_rate'),
+        Field('efficiency'), Field('map_link', fmt=text), Field('photo', fmt=text),
+        Field('sales_commission_rate'), Field('pwd', fmt=text), Field('driver'), Field('mass_mailer'),
+        Field('has_personal_prospects'), Field('sales'), Field('subcontractor'), Field('is_1099'),
+        Field('fed_tax_number', fmt=text), Field('entity', fmt=text), Field('email', fmt=text),
+    ),
+    filters={
+        'id': ('id', 'exact', int),
+        'emp_id': ('id', 'exact', int),
+        'name': ('name', 'icontains', stripped),
+        'company': ('company', 'icontains', stripped),
+        'employed': ('employed', 'exact', validate_bool),
+        'status': ('status', 'iexact', stripped),
+        'hourly': ('hourly', 'exact', float),
+        'address1': ('address1', 'icontains', stripped),
+        'address2': ('address2', 'icontains', stripped),
+        'city': ('city', 'icontains', stripped),
+        'state': ('state', 'iexact', stripped),
+        'zip': ('zip', 'icontains', stripped),
+        'cell': ('cell', 'icontains', stripped),
+        'phone': ('phone', 'icontains', stripped),
+        'start_date': ('start_date', 'date', stripped),
+        'end_date': ('end_date', 'date', stripped),
+        'driver': ('driver', 'exact', validate_bool),
+        'subcontractor': ('subcontractor', 'exact', validate_bool),
+        'is_1099': ('is_1099', 'exact', validate_bool),
+        'email': ('email', 'icontains', stripped),
+    },
+    search=Search(
+        text=('name__icontains', 'company__icontains', 'email__icontains', 'city__icontains'),
+        digits=('id', 'name__icontains', 'company__icontains'),
+        index=search.employee_ids,
+    ),
+    presets={'picker': ('id', 'name')},
+    # rows carry ssn and pwd: never written to the shared on-disk cache
+    cache_prefix=None,
+).as_view()
 
 
 @csrf_exempt
@@ -305,7 +153,8 @@ def create_employee(request):
         )
 
         # Clear cache
-        cache.delete('hr_employees_v1_all')
+        employees.endpoint.invalidate()
+        search.invalidate()
 
         return JsonResponse({
             'success': True,
@@ -413,7 +262,8 @@ def update_employee(request, emp_id):
         employee.save()
 
         # Clear cache
-        cache.delete('hr_employees_v1_all')
+        employees.endpoint.invalidate()
+        search.invalidate()
 
         return JsonResponse({
             'success': True,
@@ -459,7 +309,8 @@ def delete_employee(request, emp_id):
         employee.delete()
 
         # Clear cache
-        cache.delete('hr_employees_v1_all')
+        employees.endpoint.invalidate()
+        search.invalidate()
 
         return JsonResponse({
             'success': True,
@@ -12,5 +12,7 @@ urlpatterns = [
     path('pselect_edit', views.pselect_edit, name='pselect_edit'),
     path('payroll_weeks', views.payroll_weeks, name='payroll_weeks'),
     path('payroll_aggregate', views.payroll_aggregate, name='payroll_aggregate'),
+    path('typeahead/sites', views.typeahead_sites, name='typeahead_sites'),
+    path('typeahead/tasks', views.typeahead_tasks, name='typeahead_tasks'),
     path('debug_payroll_model', views.debug_payroll_model, name='debug_payroll_model'),
 ]
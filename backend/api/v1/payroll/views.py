@@ -9,311 +9,91 @@ from datetime import datetime
 from django.http import JsonResponse
 from django.views.decorators.http import require_GET, require_POST
 from django.views.decorators.csrf import csrf_exempt
-from django.core.cache import cache
 from django.apps import apps
 
+from api.v1.engine import Endpoint, Field, Search, flag, mmddyyyy, stripped, text
 from base import settings
-from base.settings import CACHE_TTL, MAX_RECORDS
+from base.settings import MAX_RECORDS
+from payroll import snapshots, typeahead
 from utils.types import validate_bool
 
 
-@csrf_exempt
-@require_POST
-def comments(request):
-    try:
-        payload = json.loads(request.body.decode('utf-8') or '{}')
-    except Exception:
-        return JsonResponse({'error': 'invalid json'}, status=400)
-
-    filters = {}
-    q = str(payload.get('q', '')).strip()
-    comment = str(payload.get('comment', '')).strip()
-    refresh = payload.get('refresh') in (True, '1', 'true', 'True')
-    cc = request.META.get('HTTP_CACHE_CONTROL', '')
-    count_only = validate_bool(payload.get('count_only'))
-    limit = int(payload.get('limit', MAX_RECORDS))
+def _percent(v):
+    return f"{v:.2f}%" if v is not None else "0.00%"
 
-    if comment not in ('', None):
-        filters['comment__icontains'] = comment
 
-    if 'no-cache' in cc or 'max-age=0' in cc:
-        refresh = True
-
-    if comment:
-        cache_key = f'payroll_comments_v1_comment_{comment}'
-    else:
-        cache_key = f'payroll_comments_v1_all'
-
-    data = None if refresh else cache.get(cache_key)
-
-    if data is None:
-        try:
-            try:
-                Model = apps.get_model('payroll', 'PayrollComments')
-            except LookupError:
-                return JsonResponse({'count': 0, 'comments': []})
-            if Model is None:
-                return JsonResponse({'count': len(data)})
-
-            qs = Model.objects.filter(**filters) if filters else Model.objects.all()
-            
-            # Apply limit
-            qs = qs[:limit]
+def _only_true(v):
+    """Flag filter that applies only when set: ?taxable=false means "any", as the legacy view did."""
+    return validate_bool(v) or None
 
-            def _fmt_comment(c):
-                return {
-                    'comment': getattr(c, 'comment', None),
-                }
 
-            data = [_fmt_comment(c) for c in qs]
+comments = Endpoint(
+    'payroll', 'PayrollComments',
+    result_key='comments',
+    fields=(Field('comment'),),
+    filters={'comment': ('comment', 'icontains', stripped)},
+    cache_prefix='payroll_comments_v1',
+).as_view()
 
-        except Exception:
-            data = []
 
-        if not q and not refresh:
-            cache.set(cache_key, data, CACHE_TTL)
-
-    if count_only:
-        return JsonResponse({'count': len(data)})
-
-    return JsonResponse({'count': len(data), 'comments': data})
-
-
-@csrf_exempt
-@require_POST
 # /sites
-def sites(request):
-    try:
-        payload = json.loads(request.body.decode('utf-8') or '{}')
-    except Exception:
-        return JsonResponse({'error': 'invalid json'}, status=400)
-
-    q = str(payload.get('q', '')).strip()
-    filters = {}
-    refresh = payload.get('refresh') in (True, '1', 'true', 'True')
-    cc = request.META.get('HTTP_CACHE_CONTROL', '')
-    cust_id = payload.get('cust_id', '')
-    company = payload.get('company', '')
-    taxable = validate_bool(payload.get('taxable', ''))
-    in_monthly = validate_bool(payload.get('in_monthly', ''))
-    
-    show_all_val = payload.get('show_all', False)
-    if isinstance(show_all_val, str):
-        show_all = validate_bool(show_all_val.lower() in ('1', 'true'))
-    else:
-        show_all = validate_bool(show_all_val)
-
-    count_only_val = payload.get('count_only', False)
-    if isinstance(count_only_val, str):
-        count_only = validate_bool(count_only_val.lower() in ('1', 'true'))
-    else:
-        count_only = validate_bool(count_only_val)
-        
-    limit = int(payload.get('limit', MAX_RECORDS))
-
-    if cust_id not in ('', None):
-        filters['cust_id'] = cust_id
-    if company not in ('', None):
-        filters['company__icontains'] = company
-
-    if in_monthly:
-        filters['in_monthly'] = in_monthly
-
-    if taxable:
-        filters['taxable'] = taxable
-
-    # Caching
-    if 'no-cache' in cc or 'max-age=0' in cc:
-        refresh = True
-
-    if cust_id:
-        cache_key = f'payroll_sites_v1_cust_{cust_id}'
-    else:
-        cache_key = f'payroll_sites_v1_show_all_{show_all}'
-
-    data = None if refresh else cache.get(cache_key)
-    if data is not None:
-        if q:
-            ql = q.lower()
-            data = [d for d in data if
-                    ql in (d.get('company', '') or '').lower() or ql in str(d.get('cust_id', '')).lower()]
-        # Apply limit to cached data if needed (though cache usually stores full set, slicing list is cheap)
-        if limit and len(data) > limit:
-            data = data[:limit]
-    else:
-        try:
-            # Try likely model names and app labels to avoid LookupError
-            def _get_model(app_labels, names):
-                for app_label in app_labels:
-                    for name in names:
-                        try:
-                            return apps.get_model(app_label, name)
-                        except LookupError:
-                            continue
-                return None
-
-            model = _get_model(
-                app_labels=['payroll', 'api.payroll'],
-                names=['PayrollSites', 'PayrollSite', 'Sites', 'Site']
-            )
-            if model is None:
-                # model is not registered; return empty consistent response
-                data = []
-            else:
-                qs = model.objects.filter(**filters) if filters else model.objects.all()
-                if q:
-                    qs = qs.filter(company__icontains=q) | qs.filter(cust_id__icontains=q)
-                
-                # Apply limit
-                qs = qs[:limit]
-
-                data = [{
-                    'cust_id': site.cust_id,
-                    'company': site.company,
-                    'cod': bool(getattr(site, 'cod', False)),
-                    'mailto': bool(getattr(site, 'mailto', False)),
-                    'taxable': bool(getattr(site, 'taxable', False)),
-                    'voucher': bool(getattr(site, 'voucher', False)),
-                    'other_bill': bool(getattr(site, 'other_bill', False)),
-                    'adv_bill': bool(getattr(site, 'adv_bill', False)),
-                    'in_monthly': bool(getattr(site, 'in_monthly', False)),
-                } for site in qs]
-
-        except Exception:
-            data = []
-
-        if not q and not refresh:
-            cache.set(cache_key, data, CACHE_TTL)
-
-    if count_only:
-        return JsonResponse({'count': len(data)})
-
-    return JsonResponse({'count': len(data), 'sites': data})
+sites = Endpoint(
+    'payroll', 'PayrollSites',
+    result_key='sites',
+    fields=(
+        Field('cust_id'), Field('company'),
+        Field('cod', fmt=flag), Field('mailto', fmt=flag), Field('taxable', fmt=flag),
+        Field('voucher', fmt=flag), Field('other_bill', fmt=flag), Field('adv_bill', fmt=flag),
+        Field('in_monthly', fmt=flag),
+    ),
+    filters={
+        'cust_id': ('cust_id', 'exact', stripped),
+        'company': ('company', 'icontains', stripped),
+        'taxable': ('taxable', 'exact', _only_true),
+        'in_monthly': ('in_monthly', 'exact', _only_true),
+    },
+    search=Search(text=('company__icontains', 'cust_id__icontains'), cached=('company', 'cust_id')),
+    presets={'combo': ('cust_id', 'company')},
+    cache_prefix='payroll_sites_v1',
+).as_view()
 
 
 # Used in the Insert Entry popup
-@csrf_exempt
-@require_POST
-def insert_entry_task_selection(request):
-    try:
-        payload = json.loads(request.body.decode('utf-8') or '{}')
-    except Exception:
-        return JsonResponse({'error': 'invalid json'}, status=400)
-
-    filters = {}
-    count_only = validate_bool(payload.get('count_only'))
-    q = str(payload.get('q', '')).strip()
-    cust_id = str(payload.get('cust_id', '')).strip()
-    limit = int(payload.get('limit', MAX_RECORDS))
-
-    if cust_id not in ('', None):
-        filters['cust_id__iexact'] = cust_id
-
-    if q not in ('', None):
-        filters['description__icontains'] = q
-
-    try:
-        try:
-            Tasks = apps.get_model('routing', 'Tasks')
-        except LookupError:
-            return JsonResponse({'count': 0, 'tasks': []})
-
-    except Exception:
-        return JsonResponse({'count': 0, 'tasks': []})
-
-    qs = Tasks.objects.filter(**filters) if filters else Tasks.objects.all()
-    
-    # Apply limit
-    qs = qs[:limit]
+insert_entry_task_selection = Endpoint(
+    'routing', 'Tasks',
+    result_key='tasks',
+    fields=(
+        Field('id'), Field('cust_id', fmt=text), Field('description', fmt=text),
+        Field('grand_total'), Field('task_order'),
+    ),
+    filters={'cust_id': ('cust_id', 'iexact', stripped)},
+    search=Search(text=('description__icontains',)),
+    cache_prefix='payroll_task_selection_v1',
+).as_view()
 
-    def _fmt_task(t):
-        return {
-            'id': getattr(t, 'id', None) or getattr(t, 'pk', None),
-            'cust_id': getattr(t, 'cust_id', '') or '',
-            'description': getattr(t, 'description', '') or getattr(t, 'desc', '') or '',
-            'grand_total': getattr(t, 'grand_total', None) or getattr(t, 'grandtotal', None),
-            'task_order': getattr(t, 'task_order', None),
-        }
 
-    if count_only:
-        return JsonResponse({'count': len(qs)})
-
-    data = [_fmt_task(t) for t in qs]
-    return JsonResponse({'count': len(data), 'tasks': data})
-
-
-@csrf_exempt
-@require_POST
 # /task_list
-def task_list(request):
-    try:
-        payload = json.loads(request.body.decode('utf-8') or '{}')
-    except Exception:
-        return JsonResponse({'error': 'invalid json'}, status=400)
-
-    filters = {}
-    cust_id = str(payload.get('cust_id', '')).strip()
-    route = str(payload.get('route', '')).strip()
-    week_of = str(payload.get('week_of', '')).strip()
-    count_only = validate_bool(payload.get('count_only'))
-    limit = int(payload.get('limit', MAX_RECORDS))
-
-    # Builtin filters
-    if cust_id not in ('', None):
-        filters['cust_id__iexact'] = cust_id
-    if route not in ('', None):
-        filters['route__iexact'] = route
-    if week_of not in ('', None):
-        filters['week_of'] = week_of
-
-    try:
-        Tasks = apps.get_model('payroll', 'PayrollTasks')
-        if Tasks is None:
-            return JsonResponse({'count': 0, 'tasks': []})
-
-        base_qs = Tasks.objects.filter(**filters) if filters else Tasks.objects.all()
-        base_qs = base_qs.order_by('route', 'order', 'company', 'week_of', 'cust_id', 'type', 'task_order')
-        qs = base_qs[:limit]
-
-        def _fmt_task(t):
-            return {
-                'uid': getattr(t, 'uid', None),
-                'id': getattr(t, 'id', None),
-                'cust_id': getattr(t, 'cust_id', '') or '',
-                'week_of': getattr(t, 'week_of', None),
-                'company': getattr(t, 'company', '') or '',
-                'charge': str(getattr(t, 'charge', '')),
-                'done_by': getattr(t, 'done_by', '') or '',
-                'emp_id': getattr(t, 'emp_id', None),
-                'cash_paid': str(getattr(t, 'cash_paid', None)),
-                'commission': getattr(t, 'commission', None),
-                'route': getattr(t, 'route', '') or '',
-                'cod': bool(getattr(t, 'cod', False)),
-                'price': str(getattr(t, 'price', '')),
-                'description': getattr(t, 'description', '') or '',
-                'comm': str(getattr(t, 'comm', '')),
-                'other_bill': bool(getattr(t, 'other_bill', False)),
-                'type': getattr(t, 'type', '') or '',
-                'comment': getattr(t, 'comment', '') or '',
-                'order': getattr(t, 'order', None),
-                'task_order': getattr(t, 'task_order', None),
-                'spec_equip': bool(getattr(t, 'spec_equip', False)),
-                'week_done': getattr(t, 'week_done', None),
-                'work_order': getattr(t, 'work_order', '') or '',
-                'temp_deposit_date': getattr(t, 'temp_deposit_date', None),
-                'site_comm': getattr(t, 'site_comm', None),
-
-            }
-
-        data = [_fmt_task(t) for t in qs]
-
-    except Exception:
-        data = []
-
-    if count_only:
-        return JsonResponse({'count': len(data)})
-
-    return JsonResponse({'count': len(data), 'tasks': data})
+task_list = Endpoint(
+    'payroll', 'PayrollTasks',
+    result_key='tasks',
+    fields=(
+        Field('uid'), Field('id'), Field('cust_id', fmt=text), Field('week_of'),
+        Field('company', fmt=text), Field('charge', fmt=str), Field('done_by', fmt=text),
+        Field('emp_id'), Field('cash_paid', fmt=str), Field('commission'), Field('route', fmt=text),
+        Field('cod', fmt=flag), Field('price', fmt=str), Field('description', fmt=text),
+        Field('comm', fmt=str), Field('other_bill', fmt=flag), Field('type', fmt=text),
+        Field('comment', fmt=text), Field('order'), Field('task_order'), Field('spec_equip', fmt=flag),
+        Field('week_done'), Field('work_order', fmt=text), Field('temp_deposit_date'), Field('site_comm'),
+    ),
+    filters={
+        'cust_id': ('cust_id', 'iexact', stripped),
+        'route': ('route', 'iexact', stripped),
+        'week_of': ('week_of', 'exact', stripped),
+    },
+    ordering=('route', 'order', 'company', 'week_of', 'cust_id', 'type', 'task_order'),
+    cache_prefix='payroll_tasks_v1',
+    snapshot=snapshots.source('tasks'),
+).as_view()
 
 
 @csrf_exempt
@@ -381,62 +161,13 @@ def pselect(request):
     return JsonResponse({'count': len(data), 'pselect': data})
 
 
-# python
-@csrf_exempt
-@require_POST
-def payroll_weeks(request):
-    try:
-        payload = json.loads(request.body.decode('utf-8') or '{}')
-    except Exception:
-        return JsonResponse({'error': 'invalid json'}, status=400)
-
-    limit = int(payload.get('limit', MAX_RECORDS))
-
-    try:
-        PayrollWeeks = apps.get_model('payroll', 'PayrollWeeks')
-        if PayrollWeeks is None:
-            return JsonResponse({'count': 0, 'weeks': []})
-
-        base_qs = PayrollWeeks.objects.all()
-        # use Django ordering syntax for descending
-        base_qs = base_qs.order_by('-payroll_week')
-        qs = base_qs[:limit]
-
-        def _format_date_mmddyyyy(val):
-            if not val:
-                return None
-            try:
-                # datetime or date
-                from datetime import datetime, date
-                if hasattr(val, 'date'):
-                    d = val.date() if isinstance(val, datetime) else val
-                    return d.strftime('%m/%d/%Y')
-                # string -> try ISO parse then fallback to raw string
-                if isinstance(val, str):
-                    try:
-                        dt = datetime.fromisoformat(val)
-                        return dt.date().strftime('%m/%d/%Y')
-                    except Exception:
-                        # last resort: return original string (or None)
-                        return val
-            except Exception:
-                return None
-            return None
-
-        def _fmt_week(w):
-            pw = getattr(w, 'payroll_week', None)
-            return {
-                'row_id': getattr(w, 'row_id', None),
-                'payroll_week': _format_date_mmddyyyy(pw),
-                'task_count': getattr(w, 'task_count', '') or '',
-            }
-
-        data = [_fmt_week(w) for w in qs]
-
-    except Exception:
-        data = []
-
-    return JsonResponse({'count': len(data), 'weeks': data})
+payroll_weeks = Endpoint(
+    'payroll', 'PayrollWeeks',
+    result_key='weeks',
+    fields=(Field('row_id'), Field('payroll_week', fmt=mmddyyyy), Field('task_count', fmt=text)),
+    ordering=('-payroll_week',),
+    cache_prefix='payroll_weeks_v1',
+).as_view()
 
 
 @csrf_exempt
@@ -553,43 +284,63 @@ def pselect_edit(request):
     except Exception as e:
         return JsonResponse({'error': f'update failed: {str(e)}'}, status=500)
 
-@csrf_exempt
-@require_POST
-def payroll_aggregate(request):
+payroll_aggregate = Endpoint(
+    'payroll', 'PayrollAggregate',
+    result_key='data',
+    fields=(
+        Field('week_of'), Field('route'), Field('task_count'), Field('completed_count'),
+        Field('percent_complete', fmt=_percent),
+    ),
+    filters={
+        'week_of': ('week_of', 'exact', stripped),
+        'route': ('route', 'iexact', stripped),
+    },
+    snapshot=snapshots.source('aggregate'),
+    strict=True,
+).as_view()
+
+
+# Items returned per typeahead request, by default and at most
+TYPEAHEAD_K = 10
+TYPEAHEAD_MAX_K = 50
+
+
+def _typeahead(request, scope, index):
+    """Top-k {id, label} pairs for `q` on `index`, narrowed from the client's previous keystroke."""
+    q = request.GET.get('q', '')
     try:
-        payload = json.loads(request.body.decode('utf-8') or '{}')
-    except Exception:
-        return JsonResponse({'error': 'invalid json'}, status=400)
-
-    filters = {}
-    week_of = payload.get('week_of')
-    route = payload.get('route')
-    limit = int(payload.get('limit', MAX_RECORDS))
+        k = max(1, min(int(request.GET.get('k', TYPEAHEAD_K)), TYPEAHEAD_MAX_K))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'invalid k'}, status=400)
+    session = getattr(request, 'session', None)
+    who = (session.session_key if session is not None else None) or request.META.get('REMOTE_ADDR', '')
+    client = (who, request.GET.get('client', ''), scope)
+    matches = typeahead.narrowing.lookup(index, client, q)
+    return JsonResponse({'count': len(matches), 'items': index.items(matches, k)})
 
-    if week_of:
-        filters['week_of'] = week_of
-    if route:
-        filters['route__iexact'] = route
 
+# /typeahead/sites
+@require_GET
+def typeahead_sites(request):
     try:
-        Model = apps.get_model('payroll', 'PayrollAggregate')
-        qs = Model.objects.filter(**filters) if filters else Model.objects.all()
-        qs = qs[:limit]
+        index = typeahead.sites()
+    except Exception:
+        return JsonResponse({'count': 0, 'items': []})
+    return _typeahead(request, 'sites', index)
 
-        def _fmt(agg):
-            return {
-                'week_of': agg.week_of,
-                'route': agg.route,
-                'task_count': agg.task_count,
-                'completed_count': agg.completed_count,
-                'percent_complete': f"{agg.percent_complete:.2f}%" if agg.percent_complete is not None else "0.00%"
-            }
-        
-        data = [_fmt(agg) for agg in qs]
-        return JsonResponse({'count': len(data), 'data': data})
 
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
+# /typeahead/tasks
+@require_GET
+def typeahead_tasks(request):
+    cust_id = request.GET.get('cust_id', '').strip()
+    if not cust_id:
+        return JsonResponse({'count': 0, 'items': []})
+    try:
+        index = typeahead.tasks(cust_id)
+    except Exception:
+        return JsonResponse({'count': 0, 'items': []})
+    return _typeahead(request, f'tasks:{cust_id}', index)
+
 
 @require_GET
 def debug_payroll_model(request):
@@ -3,235 +3,70 @@ import importlib
 import os
 import sys
 import traceback
-import json
 
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_GET, require_POST
 from django.views.decorators.csrf import csrf_exempt
-from django.core.cache import cache
 from django.apps import apps
-from django.db.models import Q
 from rest_framework.response import Response
 
+from api.v1.engine import Endpoint, Field, Search, flag, stripped, text
 from base import settings
-from base.settings import CACHE_TTL, MAX_RECORDS
 from utils.types import validate_bool
 
 
-@csrf_exempt
-@require_POST
 #/task_list
-def task_list(request):
-    try:
-        payload = json.loads(request.body.decode('utf-8') or '{}')
-    except Exception:
-        return JsonResponse({'error': 'invalid json'}, status=400)
-
-    q = str(payload.get('q', '')).strip()
-    task_id = payload.get('id', '')
-    cust_id = payload.get('cust_id', '')
-    master_id = payload.get('master_id', '')
-    selected = validate_bool(payload.get('selected'))
-    spec_equip = validate_bool(payload.get('spec_equip'))
-    description = payload.get('description', '').strip()
-    task_type = payload.get('type', '').strip()
-    service_date = payload.get('service_date', '').strip()
-    next_due = payload.get('next_due', '').strip()
-    end_date = payload.get('end_date', '').strip()
-    frequency = payload.get('frequency', '')
-    refresh = payload.get('refresh') in (True, '1', 'true', 'True')
-    cc = request.META.get('HTTP_CACHE_CONTROL', '')
-    show_all = validate_bool(payload.get('show_all'))
-    count_only = validate_bool(payload.get('count_only'))
-    limit = int(payload.get('limit', MAX_RECORDS))
-
-    # Build filters only for provided params
-    filters = {}
-    if task_id:
-        filters['id'] = int(task_id)
-    if cust_id:
-        filters['cust_id'] = cust_id
-    if master_id:
-        filters['master_id'] = master_id
-    if selected is not None:
-        filters['selected'] = selected
-    if spec_equip is not None:
-        filters['spec_equipment'] = spec_equip
-    if description:
-        filters['description__icontains'] = description
-    if task_type:
-        filters['type__icontains'] = task_type
-    if service_date:
-        filters['service_date'] = service_date
-    if next_due:
-        filters['next_due'] = next_due
-    if end_date:
-        filters['end_date'] = end_date
-    if frequency:
-        filters['frequency'] = int(frequency)
-
-    if 'no-cache' in cc or 'max-age=0' in cc:
-        refresh = True
-
-    # Cache key strategy consistent with payroll_sites_api_v1
-    if task_id:
-        cache_key = f'routing_tasks_v1_task_id_{task_id}'
-    elif cust_id:
-        cache_key = f'routing_tasks_v1_cust_{cust_id}'
-    else:
-        cache_key = f'routing_tasks_v1_show_all_{show_all}'
-
-    data = None
-    if not refresh:
-        data = cache.get(cache_key)
-        
-    if data is not None:
-        if q:
-            ql = q.lower()
-            data = [
-                d for d in data
-                if ql in (d.get('description', '') or '').lower()
-                or ql in (d.get('cust_id', '') or '').lower()
-                or ql in str(d.get('task_id', ''))
-            ]
-        # Apply limit to cached data
-        if limit and len(data) > limit:
-            data = data[:limit]
-    else:
-        try:
-            # runtime model resolution with fallbacks
-            def _get_model(app_labels, names):
-                for app_label in app_labels:
-                    for name in names:
-                        try:
-                            return apps.get_model(app_label, name)
-                        except LookupError:
-                            continue
-                return None
-
-            Tasks = _get_model(app_labels=['routing', 'api.routing'], names=['Tasks', 'Task'])
-            if Tasks is None:
-                data = []
-            else:
-                qs = Tasks.objects.filter(**filters) if filters else Tasks.objects.all()
-
-                if q:
-                    if q.isdigit():
-                        qs = qs.filter(
-                            Q(description__icontains=q) |
-                            Q(cust_id__icontains=q) |
-                            Q(master_id__icontains=q) |
-                            Q(task_id=int(q))
-                        )
-                    else:
-                        qs = qs.filter(
-                            Q(description__icontains=q) |
-                            Q(cust_id__icontains=q) |
-                            Q(master_id__icontains=q) |
-                            Q(task_type__icontains=q)
-                        )
-
-                qs = qs.order_by('task_order')
-                
-                # Apply limit
-                qs = qs[:limit]
-
-                data = [{
-                    'id': getattr(t, 'id', 0),
-                    'type': getattr(t, 'type', None),
-                    'cust_id': getattr(t, 'cust_id', None),
-                    'service_date': getattr(t, 'service_date', None),
-                    'commission': getattr(t, 'commission', None),
-                    'description': getattr(t, 'description', None),
-                    'unit_price': getattr(t, 'unit_price', None),
-                    'sale_tax': getattr(t, 'sale_tax', None),
-                    'grand_total': getattr(t, 'grand_total', None),
-                    'next_due': getattr(t, 'next_due', None),
-                    'adv_date': getattr(t, 'adv_date', None),
-                    'end_date': getattr(t, 'end_date', None),
-                    'master_id': getattr(t, 'master_id', None),
-                    'quantity': getattr(t, 'quantity', None),
-                    'frequency': getattr(t, 'frequency', None),
-                    'task_order': getattr(t, 'task_order', None),
-                    'adv_freq': getattr(t, 'adv_freq', None),
-                    'spec_note': bool(getattr(t, 'spec_note', False)),
-                    'spec_equip': bool(getattr(t, 'spec_equip', False)),
-                    'obros_id': getattr(t, 'obros_id', None),
-                    'selected': bool(getattr(t, 'selected', False)),
-                } for t in qs]
-
-        except Exception:
-            data = []
-
-        if not q and not refresh:
-            cache.set(cache_key, data, CACHE_TTL)
-
-    if count_only:
-        return JsonResponse({'count': len(data)})
-
-    return JsonResponse({'count': len(data), 'tasks': data})
+task_list = Endpoint(
+    'routing', 'Tasks',
+    result_key='tasks',
+    fields=(
+        Field('id'), Field('type'), Field('cust_id'), Field('service_date'), Field('commission'),
+        Field('description'), Field('unit_price'), Field('sale_tax'), Field('grand_total'),
+        Field('next_due'), Field('adv_date'), Field('end_date'), Field('master_id'), Field('quantity'),
+        Field('frequency'), Field('task_order'), Field('adv_freq'), Field('spec_note', fmt=flag),
+        Field('spec_equip', 'spec_equipment', fmt=flag), Field('obros_id'), Field('selected', fmt=flag),
+    ),
+    filters={
+        'id': ('id', 'exact', int),
+        'cust_id': ('cust_id', 'exact', stripped),
+        'master_id': ('master_id', 'exact', stripped),
+        'selected': ('selected', 'exact', validate_bool),
+        'spec_equip': ('spec_equipment', 'exact', validate_bool),
+        'description': ('description', 'icontains', stripped),
+        'type': ('type', 'icontains', stripped),
+        'service_date': ('service_date', 'exact', stripped),
+        'next_due': ('next_due', 'exact', stripped),
+        'end_date': ('end_date', 'exact', stripped),
+        'frequency': ('frequency', 'exact', int),
+    },
+    search=Search(
+        text=('description__icontains', 'cust_id__icontains', 'master_id__icontains', 'type__icontains'),
+        digits=('description__icontains', 'cust_id__icontains', 'master_id__icontains', 'id'),
+        cached=('description', 'cust_id', 'id'),
+    ),
+    ordering=('task_order',),
+    cache_prefix='routing_tasks_v1',
+).as_view()
 
 
 #/route_list
-@csrf_exempt
-@require_POST
-def route_list(request):
-    try:
-        payload = json.loads(request.body.decode('utf-8') or '{}')
-    except Exception:
-        return JsonResponse({'error': 'invalid json'}, status=400)
-
-    filters = {}
-    route_id = payload.get('id', '')
-    route = payload.get('route', '')
-    active = validate_bool(payload.get('active'))
-    description = payload.get('description', '').strip()
-    count_only = validate_bool(payload.get('count_only'))
-    limit = int(payload.get('limit', MAX_RECORDS))
-
-    if route_id not in ('', None):
-        filters['id'] = route_id
-    elif route not in ('', None):
-        filters['route'] = route
-    elif description not in ('', None):
-        filters['description__icontains'] = description
-
-    if active is not None:
-        filters['active'] = active
-
-    try:
-        try:
-            Routes = apps.get_model('routing', 'Routes')
-        except LookupError:
-            return JsonResponse({'count': 0, 'routes': []})
-
-        qs = Routes.objects.filter(**filters) if filters else Routes.objects.all()
-
-        qs = qs.order_by('sortOrder', 'route')
-        
-        # Apply limit
-        qs = qs[:limit]
-        
-        data = [{
-            'id': getattr(r, 'id', None),
-            'route': getattr(r, 'route', '') or '',
-            'description': getattr(r, 'description', '') or '',
-            'active': bool(getattr(r, 'active', False)),
-            'numberIcon': getattr(r, 'numberIcon', None),
-            'driver': getattr(r, 'driver', None),
-            'icon': getattr(r, 'icon', None),
-            'sortOrder': getattr(r, 'sortOrder', None),
-            'latitude': getattr(r, 'latitude', None),
-            'longitude': getattr(r, 'longitude', None),
-        } for r in qs]
-
-    except Exception:
-        return JsonResponse({'count': 0, 'routes': []})
-
-    if count_only:
-        return JsonResponse({'count': len(data)})
-
-    return JsonResponse({'count': len(data), 'routes': data})
+route_list = Endpoint(
+    'routing', 'Routes',
+    result_key='routes',
+    fields=(
+        Field('id'), Field('route', fmt=text), Field('description', fmt=text), Field('active', fmt=flag),
+        Field('numberIcon'), Field('driver'), Field('icon'), Field('sortOrder'), Field('latitude'),
+        Field('longitude'),
+    ),
+    filters={
+        'id': ('id', 'exact', int),
+        'route': ('route', 'exact', stripped),
+        'description': ('description', 'icontains', stripped),
+        'active': ('active', 'exact', validate_bool),
+    },
+    ordering=('sortOrder', 'route'),
+    cache_prefix='routing_routes_v1',
+).as_view()
 
 
 @csrf_exempt
@@ -0,0 +1,208 @@
+# python
+# File: `api/v1/tests.py`
+"""
+Contract of the api/v1 list-endpoint engine (api.v1.engine), exercised
+through a small endpoint over accounting.Deposit.
+
+    python manage.py test api.v1 --settings=base.settings_test
+"""
+import gzip
+import json
+
+from django.apps import apps
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from api.v1.engine import Endpoint, Field, text
+
+deposits = Endpoint(
+    'accounting', 'Deposit',
+    result_key='deposits',
+    fields=(Field('deposit_id'), Field('deposit_num'), Field('emp_id'), Field('description', fmt=text)),
+    filters={'emp_id': ('emp_id', 'exact', int)},
+    ordering=('-deposit_num',),
+    presets={'short': ('deposit_id', 'description')},
+    cache_prefix='test_deposits_v1',
+).as_view()
+
+
+class EndpointTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Deposit = apps.get_model('accounting', 'Deposit')
+        # deposit_num repeats, so pages must break ties on the primary key
+        Deposit.objects.bulk_create([
+            Deposit(deposit_id=i, deposit_num=i // 3, emp_id=1 if i % 2 else 2,
+                    description=None if i == 1 else f'deposit number {i:03d}')
+            for i in range(1, 61)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def post(self, **payload):
+        response = deposits(self.factory.post('/deposits', json.dumps(payload), content_type='application/json'))
+        return response.status_code, json.loads(response.content)
+
+    def get(self, params=None, **headers):
+        return deposits(self.factory.get('/deposits', params or {}, **headers))
+
+    @staticmethod
+    def expected_order(rows):
+        return sorted(rows, key=lambda r: (-r['deposit_num'], r['deposit_id']))
+
+
+class ProjectionTests(EndpointTestCase):
+
+    def test_rows_carry_every_field_formatted(self):
+        status, body = self.post(emp_id=1)
+        self.assertEqual(status, 200)
+        self.assertEqual(body['count'], 30)
+        self.assertEqual(list(body['deposits'][0]), ['deposit_id', 'deposit_num', 'emp_id', 'description'])
+        first = next(r for r in body['deposits'] if r['deposit_id'] == 1)
+        self.assertEqual(first['description'], '')
+
+    def test_fields_narrow_the_output(self):
+        _, body = self.post(fields='description,deposit_id')
+        self.assertEqual(list(body['deposits'][0]), ['description', 'deposit_id'])
+        _, body = self.post(fields=['deposit_id'])
+        self.assertEqual(list(body['deposits'][0]), ['deposit_id'])
+
+    def test_preset(self):
+        _, body = self.post(preset='short')
+        self.assertEqual(list(body['deposits'][0]), ['deposit_id', 'description'])
+
+    def test_projection_from_cache_matches_database(self):
+        _, fresh = self.post(fields='deposit_id,emp_id')
+        self.post()                                   # fills the cached full row set
+        _, cached = self.post(fields='deposit_id,emp_id')
+        self.assertEqual(fresh, cached)
+
+    def test_unknown_field_or_preset_is_rejected(self):
+        self.assertEqual(self.post(fields='deposit_id,ssn')[0], 400)
+        self.assertEqual(self.post(preset='nope')[0], 400)
+
+    def test_tuples_and_columns(self):
+        _, rows = self.post(emp_id=2, fields='deposit_id,description')
+        _, tuples = self.post(emp_id=2, fields='deposit_id,description', format='tuples')
+        _, columns = self.post(emp_id=2, fields='deposit_id,description', format='columns')
+        expected = [[r['deposit_id'], r['description']] for r in rows['deposits']]
+        self.assertEqual(tuples['fields'], ['deposit_id', 'description'])
+        self.assertEqual(tuples['deposits'], expected)
+        self.assertEqual(columns['fields'], ['deposit_id', 'description'])
+        self.assertEqual(columns['deposits'], [list(c) for c in zip(*expected)])
+        self.assertEqual(tuples['count'], columns['count'], rows['count'])
+
+    def test_invalid_format_is_rejected(self):
+        self.assertEqual(self.post(format='xml')[0], 400)
+
+
+class CountTests(EndpointTestCase):
+
+    def test_count_only(self):
+        status, body = self.post(emp_id=2, count_only=True)
+        self.assertEqual(status, 200)
+        self.assertEqual(body, {'count': 30})
+
+    def test_count_only_from_a_cached_set(self):
+        self.post(emp_id=2)
+        self.assertEqual(self.post(emp_id=2, count_only=True)[1], {'count': 30})
+
+    def test_with_total_is_uncapped(self):
+        _, body = self.post(limit=5, with_total=True)
+        self.assertEqual(body['count'], 5)
+        self.assertEqual(len(body['deposits']), 5)
+        self.assertEqual(body['total'], 60)
+
+    def test_total_is_omitted_unless_asked(self):
+        self.assertNotIn('total', self.post(limit=5)[1])
+
+
+class KeysetTests(EndpointTestCase):
+
+    def pages(self, **payload):
+        seen, after = [], None
+        while True:
+            status, body = self.post(page_size=7, after=after, **payload)
+            self.assertEqual(status, 200)
+            seen.extend(body['deposits'])
+            after = body['next']
+            if after is None:
+                return seen
+            self.assertEqual(body['count'], 7)
+
+    def check(self, rows, emp_id=None):
+        _, everything = self.post(emp_id=emp_id) if emp_id else self.post()
+        self.assertEqual([r['deposit_id'] for r in rows],
+                         [r['deposit_id'] for r in self.expected_order(everything['deposits'])])
+
+    def test_pages_from_the_database(self):
+        rows = self.pages()
+        self.assertEqual(len(rows), 60)
+        cache.clear()
+        self.check(rows)
+
+    def test_pages_from_a_cached_set(self):
+        self.post()                                   # fills the cached full row set
+        rows = self.pages()
+        self.check(rows)
+
+    def test_pages_with_a_filter(self):
+        rows = self.pages(emp_id=1)
+        self.assertTrue(all(r['emp_id'] == 1 for r in rows))
+        self.check(rows, emp_id=1)
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertEqual(self.post(page_size=5, after='not a cursor')[0], 400)
+
+
+class ConditionalGetTests(EndpointTestCase):
+
+    def test_etag_and_not_modified(self):
+        response = self.get({'emp_id': 1})
+        self.assertEqual(response.status_code, 200)
+        tag = response['ETag']
+        self.assertIn('must-revalidate', response['Cache-Control'])
+
+        held = self.get({'emp_id': 1}, HTTP_IF_NONE_MATCH=tag)
+        self.assertEqual(held.status_code, 304)
+        self.assertEqual(held['ETag'], tag)
+        self.assertEqual(held.content, b'')
+
+    def test_tag_depends_on_the_request(self):
+        tag = self.get({'emp_id': 1})['ETag']
+        self.assertEqual(self.get({'emp_id': 2}, HTTP_IF_NONE_MATCH=tag).status_code, 200)
+        self.assertEqual(self.get({'emp_id': 1, 'fields': 'deposit_id'}, HTTP_IF_NONE_MATCH=tag).status_code, 200)
+
+    def test_write_retires_the_tag(self):
+        tag = self.get()['ETag']
+        Deposit = apps.get_model('accounting', 'Deposit')
+        with self.captureOnCommitCallbacks(execute=True):
+            Deposit.objects.create(deposit_id=100, deposit_num=99, emp_id=1, description='late')
+        response = self.get(HTTP_IF_NONE_MATCH=tag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], tag)
+        self.assertEqual(json.loads(response.content)['deposits'][0]['deposit_id'], 100)
+
+    def test_no_cache_ignores_if_none_match(self):
+        tag = self.get()['ETag']
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=tag, HTTP_CACHE_CONTROL='no-cache').status_code, 200)
+
+    def test_compressed_variant_has_its_own_tag(self):
+        plain = self.get()
+        packed = self.get(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(packed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(packed.content), plain.content)
+        self.assertEqual(packed['ETag'], plain['ETag'][:-1] + '-gzip"')
+        self.assertIn('Accept-Encoding', packed['Vary'])
+
+        held = self.get(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=packed['ETag'])
+        self.assertEqual(held.status_code, 304)
+        self.assertEqual(held['ETag'], packed['ETag'])
+
+    def test_post_carries_no_etag(self):
+        response = deposits(self.factory.post('/deposits', '{}', content_type='application/json'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
@@ -3,3 +3,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'base.settings')
 application = get_asgi_application()
+
+# Preload reference data, build search indexes and warm the hot cache keys (base.startup).
+from base import startup
+
+startup.warm()
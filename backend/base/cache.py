@@ -0,0 +1,265 @@
+# python
+# File: `base/cache.py`
+"""
+Shared on-disk cache backend for all worker processes on a host.
+
+Entries live in one SQLite database in WAL mode, so readers in every gunicorn
+worker see each other's writes without blocking, and the host holds one copy
+of each cached list instead of one per worker.  The total pickled size is
+kept under MAX_BYTES by evicting least recently used entries; the running
+total is maintained by triggers so enforcing the budget never scans the table.
+
+Entries outlive restarts, so the database is created readable by its owner
+only (SQLite gives the -wal and -shm files the same mode).  Endpoints whose
+rows carry secrets still opt out of caching rather than rely on that.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'base.cache.SQLiteCache',
+            'LOCATION': BASE_DIR / 'var' / 'cache.sqlite3',
+            'OPTIONS': {'MAX_BYTES': 256 * 1024 * 1024},
+        },
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from utils import cachestats
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache_entry ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, size INTEGER NOT NULL, accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_entry_accessed ON cache_entry (accessed)',
+    'CREATE TABLE IF NOT EXISTS cache_stats (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)',
+    'INSERT OR IGNORE INTO cache_stats (id, bytes) VALUES (0, 0)',
+    'CREATE TRIGGER IF NOT EXISTS cache_entry_ins AFTER INSERT ON cache_entry'
+    ' BEGIN UPDATE cache_stats SET bytes = bytes + NEW.size WHERE id = 0; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_entry_del AFTER DELETE ON cache_entry'
+    ' BEGIN UPDATE cache_stats SET bytes = bytes - OLD.size WHERE id = 0; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_entry_upd AFTER UPDATE OF size ON cache_entry'
+    ' BEGIN UPDATE cache_stats SET bytes = bytes + NEW.size - OLD.size WHERE id = 0; END',
+)
+
+UPSERT = (
+    'INSERT INTO cache_entry (key, value, expires, size, accessed) VALUES (?, ?, ?, ?, ?)'
+    ' ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires,'
+    ' size = excluded.size, accessed = excluded.accessed'
+)
+
+# Reads refresh an entry's LRU position at most this often (seconds), to keep gets read-only.
+TOUCH_INTERVAL = 1.0
+# Eviction frees down to this fraction of MAX_BYTES so a full cache does not evict on every set.
+CULL_TARGET = 0.9
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = str(location)
+        self._max_bytes = int(options.get('MAX_BYTES', 256 * 1024 * 1024))
+        self._local = threading.local()
+
+    # --- connection handling ---
+
+    def _db(self):
+        """Per-thread connection, reopened after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            os.fchmod(fd, 0o600)
+        finally:
+            os.close(fd)
+        conn = sqlite3.connect(self._path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        with self._write(conn):
+            for statement in SCHEMA:
+                conn.execute(statement)
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @staticmethod
+    @contextmanager
+    def _write(conn):
+        """Serialize a read-modify-write across processes (BEGIN IMMEDIATE takes the write lock)."""
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def close(self, **kwargs):
+        # Connections are per thread and reused across requests.
+        pass
+
+    # --- helpers ---
+
+    def _store(self, conn, key, value, timeout):
+        """Write one entry inside an open write transaction; False when it can never fit."""
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) > self._max_bytes:
+            conn.execute('DELETE FROM cache_entry WHERE key = ?', (key,))
+            return False
+        conn.execute(UPSERT, (key, data, self.get_backend_timeout(timeout), len(data), time.time()))
+        self._cull(conn)
+        return True
+
+    def _cull(self, conn):
+        (used,) = conn.execute('SELECT bytes FROM cache_stats WHERE id = 0').fetchone()
+        if used <= self._max_bytes:
+            return
+        conn.execute('DELETE FROM cache_entry WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        (used,) = conn.execute('SELECT bytes FROM cache_stats WHERE id = 0').fetchone()
+        need = used - self._max_bytes * CULL_TARGET
+        if need <= 0:
+            return
+        # least recently used first, just enough of them to free `need` bytes
+        evicted = conn.execute(
+            'DELETE FROM cache_entry WHERE key IN ('
+            ' SELECT key FROM (SELECT key, size, SUM(size) OVER (ORDER BY accessed, key) AS freed FROM cache_entry)'
+            ' WHERE freed - size < ?) RETURNING key, size', (need,)).fetchall()
+        for key, size in evicted:
+            cachestats.record(key, 'evicted', size=size)
+
+    @staticmethod
+    def _live(row, now):
+        return row is not None and (row[1] is None or row[1] > now)
+
+    # --- cache API ---
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._db()
+        now = time.time()
+        row = conn.execute('SELECT value, expires, accessed FROM cache_entry WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return default
+        if not self._live(row, now):
+            conn.execute('DELETE FROM cache_entry WHERE key = ? AND expires <= ?', (key, now))
+            return default
+        if now - row[2] > TOUCH_INTERVAL:
+            conn.execute('UPDATE cache_entry SET accessed = ? WHERE key = ?', (now, key))
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        mapping = {self.make_and_validate_key(k, version=version): k for k in keys}
+        if not mapping:
+            return {}
+        conn = self._db()
+        now = time.time()
+        marks = ','.join('?' * len(mapping))
+        rows = conn.execute(
+            f'SELECT key, value, expires FROM cache_entry WHERE key IN ({marks})', tuple(mapping)).fetchall()
+        found = {}
+        for key, value, expires in rows:
+            if expires is None or expires > now:
+                found[mapping[key]] = pickle.loads(value)
+        if found:
+            conn.execute(f'UPDATE cache_entry SET accessed = ? WHERE key IN ({marks}) AND accessed < ?',
+                         (now, *mapping, now - TOUCH_INTERVAL))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._db()
+        with self._write(conn):
+            self._store(conn, key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        conn = self._db()
+        failed = []
+        with self._write(conn):
+            for k, value in data.items():
+                if not self._store(conn, self.make_and_validate_key(k, version=version), value, timeout):
+                    failed.append(k)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._db()
+        with self._write(conn):
+            row = conn.execute('SELECT value, expires FROM cache_entry WHERE key = ?', (key,)).fetchone()
+            if self._live(row, time.time()):
+                return False
+            return self._store(conn, key, value, timeout)
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Return the cached value, or compute `default` and store it unless
+        another process stored one first, in which case that value wins.  The
+        check and the store share one write transaction.
+        """
+        missing = object()
+        value = self.get(key, missing, version=version)
+        if value is not missing:
+            return value
+        if callable(default):
+            default = default()
+        if default is None:
+            return None
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._db()
+        with self._write(conn):
+            row = conn.execute('SELECT value, expires FROM cache_entry WHERE key = ?', (key,)).fetchone()
+            if self._live(row, time.time()):
+                return pickle.loads(row[0])
+            self._store(conn, key, default, timeout)
+        return default
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._db()
+        now = time.time()
+        return bool(conn.execute(
+            'UPDATE cache_entry SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now)).rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._db()
+        with self._write(conn):
+            row = conn.execute('SELECT value, expires FROM cache_entry WHERE key = ?', (key,)).fetchone()
+            if not self._live(row, time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            conn.execute('UPDATE cache_entry SET value = ?, size = ? WHERE key = ?', (data, len(data), key))
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return bool(self._db().execute('DELETE FROM cache_entry WHERE key = ?', (key,)).rowcount)
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(k, version=version) for k in keys]
+        if keys:
+            self._db().execute(f'DELETE FROM cache_entry WHERE key IN ({",".join("?" * len(keys))})', keys)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._db().execute('SELECT key, expires FROM cache_entry WHERE key = ?', (key,)).fetchone()
+        return self._live(row, time.time())
+
+    def clear(self):
+        self._db().execute('DELETE FROM cache_entry')
+
+    def stats(self):
+        """Entry count, pickled bytes held and the byte budget."""
+        conn = self._db()
+        (entries,) = conn.execute('SELECT COUNT(*) FROM cache_entry').fetchone()
+        (used,) = conn.execute('SELECT bytes FROM cache_stats WHERE id = 0').fetchone()
+        return {'entries': entries, 'bytes': used, 'max_bytes': self._max_bytes}
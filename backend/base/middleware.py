@@ -0,0 +1,77 @@
+# python
+# File: `base/middleware.py`
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from utils import cachestats
+from utils.compression import compress, compress_stream, describe, negotiate, COMPRESSIBLE_TYPES
+from base.settings import COMPRESS_MIN_BYTES
+
+
+class CompressionMiddleware:
+    """
+    Negotiate br/gzip content encoding for responses of at least
+    COMPRESS_MIN_BYTES.  Responses that already carry a Content-Encoding (the
+    api/v1 rendered cache serves precompressed variants) are passed through.
+    Each compressed response reports its ratio and time in X-Compression.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.status_code != 200 or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return response
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return response
+        if not response.streaming and len(response.content) < COMPRESS_MIN_BYTES:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(response.streaming_content, encoding)
+            if response.has_header('Content-Length'):
+                del response['Content-Length']
+            response['X-Compression'] = f'{encoding}; streamed'
+        else:
+            original = response.content
+            data, ms = compress(original, encoding)
+            if len(data) >= len(original):
+                return response
+            response.content = data
+            response['Content-Length'] = str(len(data))
+            response['X-Compression'] = describe(encoding, len(original), len(data), ms)
+
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.endswith('"') and not etag.startswith('W/'):
+            # keep the tag strong but distinct per encoding
+            response['ETag'] = f'{etag[:-1]}-{encoding}"'
+        return response
+
+
+class CacheTelemetryMiddleware:
+    """
+    Flush the cache telemetry counters (utils.cachestats) after each request
+    and, with DEBUG on, report the request's cache events in an X-Cache header,
+    e.g. `payroll_sites_v1=render_miss, payroll_sites_v1=hit`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cachestats.begin_request()
+        response = self.get_response(request)
+        events = cachestats.end_request()
+        if settings.DEBUG and events:
+            response['X-Cache'] = ', '.join(f'{fam}={event}' for fam, event in events)
+        cachestats.flush()
+        return response
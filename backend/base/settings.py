@@ -27,6 +27,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'base.middleware.CompressionMiddleware',
+    'base.middleware.CacheTelemetryMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,6 +90,41 @@ else:
     STATIC_ROOT = None
 
 CACHE_TTL = 600  # 10 minutes
+# api/v1 row sets older than CACHE_TTL are served stale (while one worker refreshes) up to this age
+CACHE_HARD_TTL = 3600
+# utils.refdata sections are reloaded at least this often (seconds), besides on table writes
+REFDATA_TTL = 120
+# Seconds between checks of Site.updated_date for writes made outside the ORM (customers.search)
+SITE_INDEX_POLL = 60
+
+# Hot api/v1 keys filled by `manage.py warm_caches`: (name, endpoint view, payload).
+# Payload values may use placeholders such as '@current_week' (see warm_caches).  The task_list
+# entries match what the payroll pages send: week_of alone (selection popup), week_of + route (processor).
+CACHE_WARM_MANIFEST = [
+    ('customers.sites', 'api.v1.customers.views.sites', {}),
+    ('payroll.sites', 'api.v1.payroll.views.sites', {}),
+    ('routing.task_list', 'api.v1.routing.views.task_list', {}),
+    ('routing.route_list', 'api.v1.routing.views.route_list', {}),
+    ('payroll.task_list.current_week', 'api.v1.payroll.views.task_list', {'week_of': '@current_week'}),
+    ('payroll.task_list.current_route', 'api.v1.payroll.views.task_list',
+     {'week_of': '@current_week', 'route': '@current_route'}),
+    ('payroll.payroll_weeks', 'api.v1.payroll.views.payroll_weeks', {}),
+    ('payroll.comments', 'api.v1.payroll.views.comments', {}),
+]
+# Warm the manifest when a worker loads the WSGI/ASGI application, before it serves traffic
+CACHE_WARM_ON_START = not DEBUG
+
+# One cache shared by every worker process on the host (SQLite in WAL mode, LRU within MAX_BYTES)
+CACHES = {
+    'default': {
+        'BACKEND': 'base.cache.SQLiteCache',
+        'LOCATION': BASE_DIR / 'var' / 'cache.sqlite3',
+        'TIMEOUT': CACHE_TTL,
+        'OPTIONS': {
+            'MAX_BYTES': 256 * 1024 * 1024,
+        },
+    },
+}
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Model management toggle:
@@ -126,4 +163,12 @@ CORS_ALLOW_CREDENTIALS = True
 # CORS_ALLOW_METHODS = list(default_methods) + [...]
 
 RECORD_PER_PAGE = 50
-MAX_RECORDS = 3000
\ No newline at end of file
+MAX_RECORDS = 3000
+# Rows fetched per round trip when a list endpoint streams its response ("stream": true)
+STREAM_CHUNK_SIZE = 2000
+# Responses smaller than this are sent uncompressed (base.middleware.CompressionMiddleware)
+COMPRESS_MIN_BYTES = 1024
+# Closed payroll week snapshots (payroll.snapshots)
+PAYROLL_SNAPSHOT_DIR = BASE_DIR / 'var' / 'payroll_snapshots'
+# SQLite FTS5 sidecar for invoice text search (accounting.fulltext, manage.py sync_invoice_fts)
+INVOICE_FTS_PATH = BASE_DIR / 'var' / 'invoice_fts.sqlite3'
\ No newline at end of file
@@ -0,0 +1,22 @@
+# python
+# File: `base/settings_test.py`
+"""
+Settings for the test suite: SQLite and an in-process cache in place of SQL
+Server and the shared cache file.
+
+    python manage.py test --settings=base.settings_test
+"""
+from base.settings import *  # noqa: F401,F403
+from base.settings import CACHE_TTL
+
+DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'TIMEOUT': CACHE_TTL,
+    },
+}
+
+# The test runner creates the tables of managed models; the api/v1 tests read accounting.Deposit.
+MODELS_MANAGED_OVERRIDES = {'accounting': True}
@@ -0,0 +1,35 @@
+# python
+# File: `base/startup.py`
+"""
+Per-worker start-up, called by the WSGI and ASGI entry points once Django is
+set up.  Each step is independent: a failure is logged and the worker starts
+anyway, leaving that data to load on its first read.
+"""
+import logging
+
+from base.settings import CACHE_WARM_ON_START
+
+logger = logging.getLogger(__name__)
+
+
+def warm():
+    # Load reference data (routes, employees, comments, weeks) once per worker at start.
+    try:
+        from utils import refdata
+        refdata.preload()
+    except Exception:
+        logger.exception('reference data preload failed')
+
+    # Build the in-process employee search index (hr.employees `q`) before the first keystroke.
+    # A failed build is logged by utils.derived, which returns None and retries on the next search.
+    from hr import search
+    if search.index() is None:
+        logger.warning('employee search index not built; the first search will retry')
+
+    # Fill the hot cache keys before this worker admits traffic (already resident keys are cheap hits).
+    if CACHE_WARM_ON_START:
+        try:
+            from django.core.management import call_command
+            call_command('warm_caches')
+        except Exception:
+            logger.exception('cache warm-up failed')
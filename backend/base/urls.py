@@ -11,6 +11,7 @@ urlpatterns = [
     path('api/v1/accounting/', include('api.v1.accounting.urls')),
     path('api/v1/hr/', include('api.v1.hr.urls')),
     path('api/v1/customers/', include('api.v1.customers.urls')),
+    path('api/v1/cache/', include('api.v1.cache.urls')),
     path('api/v1/api_auth/', include('api.v1.api_auth.urls')),
 ]
 
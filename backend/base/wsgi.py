@@ -2,4 +2,9 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'base.settings')
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Preload reference data, build search indexes and warm the hot cache keys (base.startup).
+from base import startup
+
+startup.warm()
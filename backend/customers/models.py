@@ -3,6 +3,7 @@ from django.db import models
 from django.core.validators import MinLengthValidator
 from django.conf import settings
 from django.db import models
+from utils.versions import VersionedManager
 
 
 def _managed_for(app_label: str):
@@ -66,6 +67,8 @@ class Site(models.Model):
     pays_own_invoices = models.BooleanField(null=True, blank=True, db_column='PaysOwnInvoices')
     ct_exception = models.BooleanField(null=True, blank=True, db_column='CT_Exception')
 
+    objects = VersionedManager()
+
     class Meta:
         db_table = 'Site'
         verbose_name = 'Site'
@@ -0,0 +1,49 @@
+# python
+# File: `customers/search.py`
+"""
+Trigram index over the searchable `Site` columns, for the `q` parameter of
+api/v1 customers.sites.
+
+Text queries match company, reg_name, address, city and phone; all-digit
+queries match cust_id, as the endpoint's SQL search does.  The index is
+built once per worker and rebuilt on the next search after an ORM write to
+`Site` (its `utils.versions` generation changes) or, for writes made outside
+this application, when a poll of max(updated_date) and the row count every
+SITE_INDEX_POLL seconds sees a change.  While a rebuild runs, other threads
+keep searching the previous index.
+
+    from customers import search
+    cust_ids = search.site_ids('maple')   # best first, or None if unavailable
+"""
+from django.apps import apps
+
+from base.settings import SITE_INDEX_POLL
+from utils.derived import Derived
+from utils.trigram import TrigramIndex
+
+COLUMNS = ('company', 'reg_name', 'address', 'city', 'phone', 'cust_id')
+TEXT_FIELDS = (0, 1, 2, 3, 4)
+DIGIT_FIELDS = (5,)
+
+
+def _build():
+    Site = apps.get_model('customers', 'Site')
+    rows = Site.objects.values_list('pk', *COLUMNS)
+    return TrigramIndex((row[0], row[1:]) for row in rows.iterator(chunk_size=2000))
+
+
+_index = Derived(('Site',), _build, watch=('customers', 'Site', 'updated_date'), poll=SITE_INDEX_POLL)
+
+
+def index():
+    """The current Site index, or None when it cannot be built."""
+    return _index.get()
+
+
+def site_ids(q, limit=None):
+    """cust_ids of sites matching `q`, best first; None when the index is unavailable."""
+    idx = index()
+    if idx is None:
+        return None
+    q = str(q).strip()
+    return idx.search(q, DIGIT_FIELDS if q.isdigit() else TEXT_FIELDS, limit)
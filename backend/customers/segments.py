@@ -0,0 +1,146 @@
+# python
+# File: `customers/segments.py`
+"""
+Bitmap index over the `Site` flags and small coded columns, for customer
+segment counts and lists (api/v1 customers.segments).
+
+Sites are numbered in cust_id order and every (column, value) pair keeps a
+bitmap of the sites holding it, as a Python int: bit n is set when site n
+has the value.  A segment is an expression over those pairs,
+
+    {"active": true, "sms_opt_in": true}                  both (a dict ANDs its entries)
+    {"or": [{"pmt_type": 1}, {"inv_type": [2, 3]}]}       either; a list is any of its values
+    {"and": [{"active": true}, {"not": {"cod": true}}]}   NOT is everything else, nulls included
+
+so evaluating it is a few big-integer ANDs, ORs and NOTs and counting it is
+`int.bit_count()`, with no query.  A flag compared to false, as in SQL,
+does not match sites where it is null; compare to null for those.
+
+The index follows `Site` as `customers.search` does (`utils.derived`):
+rebuilt on the next use after its `utils.versions` generation changes, or
+when a poll of max(updated_date) and the row count every SITE_INDEX_POLL
+seconds sees a write made outside this application.
+
+    from customers import segments
+    index = segments.index()
+    bits = index.evaluate({'active': True, 'needs_price_increased': True})
+    index.count(bits), index.cust_ids(bits, limit=50)
+"""
+from bisect import bisect_right
+
+from django.apps import apps
+
+from base.settings import SITE_INDEX_POLL
+from utils.derived import Derived
+from utils.types import validate_bool
+
+FLAGS = (
+    'cod', 'voucher', 'taxable', 'other_bill', 'mailto', 'adv_bill', 'adv_credit', 'site_comm', 'service_client',
+    'active', 'send_receipt', 'e_mail_flag', 'signature_required', 'sms_opt_in', 'needs_price_increased',
+    'call_blasted', 'pays_own_invoices', 'ct_exception',
+)
+CODES = ('mkt_co', 'pmt_type', 'inv_type', 'prospect_status', 'business_type', 'billing_cycle', 'task_style')
+
+def _bitmap(positions, size):
+    """int with the bits at `positions` set."""
+    buf = bytearray(size)
+    for n in positions:
+        buf[n >> 3] |= 1 << (n & 7)
+    return int.from_bytes(buf, 'little')
+
+
+class SegmentIndex:
+
+    def __init__(self, rows):
+        self.ids = []
+        positions = {}
+        columns = FLAGS + CODES
+        for n, row in enumerate(rows):
+            self.ids.append(row[0])
+            for column, value in zip(columns, row[1:]):
+                positions.setdefault((column, value), []).append(n)
+        size = (len(self.ids) + 7) // 8
+        self.bits = {key: _bitmap(found, size) for key, found in positions.items()}
+        self.all = (1 << len(self.ids)) - 1
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _leaf(self, column, value):
+        """Bitmap of the sites whose `column` is `value` (or any of a list of values; null for nulls)."""
+        if column in FLAGS:
+            parse, values = validate_bool, [value]
+        elif column in CODES:
+            parse = int
+            values = value.split(',') if isinstance(value, str) else value if isinstance(value, list) else [value]
+        else:
+            raise ValueError(f'unknown segment field: {column}')
+        found = 0
+        for v in values:
+            if isinstance(v, str):
+                v = v.strip()
+            if v is None or v == 'null':
+                parsed = None
+            else:
+                try:
+                    parsed = parse(v)
+                except (TypeError, ValueError):
+                    parsed = None
+                if parsed is None:
+                    raise ValueError(f'invalid value for {column}: {v}')
+            found |= self.bits.get((column, parsed), 0)
+        return found
+
+    def evaluate(self, expr):
+        """Bitmap of the sites in segment `expr`; raises ValueError for a malformed expression."""
+        if not isinstance(expr, dict):
+            raise ValueError('a segment is an object')
+        found = self.all
+        for key, value in expr.items():
+            if key == 'and' or key == 'or':
+                if not isinstance(value, list) or not value:
+                    raise ValueError(f'"{key}" takes a non-empty list')
+                parts = [self.evaluate(part) for part in value]
+                combined = parts[0]
+                for part in parts[1:]:
+                    combined = combined & part if key == 'and' else combined | part
+            elif key == 'not':
+                combined = self.all & ~self.evaluate(value)
+            else:
+                combined = self._leaf(key, value)
+            found &= combined
+        return found
+
+    @staticmethod
+    def count(bits):
+        return bits.bit_count()
+
+    def cust_ids(self, bits, after=None, limit=None):
+        """cust_ids of the sites in `bits`, in cust_id order, starting after cust_id `after`."""
+        start = bisect_right(self.ids, after) if after is not None else 0
+        bits >>= start
+        found = []
+        # walk the set bits a byte at a time, skipping empty bytes
+        for offset, byte in enumerate(bits.to_bytes((bits.bit_length() + 7) // 8, 'little')):
+            while byte:
+                low = byte & -byte
+                found.append(self.ids[start + offset * 8 + low.bit_length() - 1])
+                if limit is not None and len(found) >= limit:
+                    return found
+                byte ^= low
+        return found
+
+
+def _build():
+    Site = apps.get_model('customers', 'Site')
+    rows = Site.objects.values_list('cust_id', *FLAGS, *CODES).iterator(chunk_size=2000)
+    # sorted here rather than in SQL so that `after` cursors bisect in the same (Python) order
+    return SegmentIndex(sorted(rows, key=lambda row: row[0]))
+
+
+_index = Derived(('Site',), _build, watch=('customers', 'Site', 'updated_date'), poll=SITE_INDEX_POLL)
+
+
+def index():
+    """The current segment index, or None when it cannot be built."""
+    return _index.get()
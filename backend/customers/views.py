@@ -109,7 +109,7 @@ def site_list(request):
             return HttpResponseBadRequest("No valid columns specified.")
 
     # Build queryset with filters
-    queryset = Site.objects.all()
+    queryset = Site.objects.cached()
     for param, (field, lookup, converter) in ALLOWED_FILTERS.items():
         if param in request.GET:
             try:
@@ -135,7 +135,7 @@ def site_list(request):
 @require_GET
 def get_site(request, uid):
     try:
-        site = Site.objects.get(cust_id=uid)
+        site = Site.objects.cached().get(cust_id=uid)
     except Site.DoesNotExist:
         return HttpResponseBadRequest("Site not found.")
 
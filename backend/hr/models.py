@@ -1,6 +1,7 @@
 from decimal import Decimal
 from django.db import models
 from django.conf import settings
+from utils.versions import VersionedManager
 
 def _managed_for(app_label: str):
     return settings.MODELS_MANAGED_OVERRIDES.get(app_label, settings.MODELS_MANAGED_DEFAULT)
@@ -41,6 +42,8 @@ class Employee(models.Model):
     entity = models.CharField(max_length=200, null=True, blank=True, db_column='Entity')
     email = models.EmailField(max_length=253, null=True, blank=True, db_column='Email')
 
+    objects = VersionedManager()
+
     class Meta:
         db_table = 'Employee'
         verbose_name = 'Employee'
@@ -0,0 +1,54 @@
+# python
+# File: `hr/search.py`
+"""
+Fuzzy index over `Employee`, for the `q` parameter of api/v1 hr.employees
+(the employee picker types into it).
+
+Text queries match name, company, email and city as the endpoint's SQL
+search does, and beyond it tolerate misspelled or like-sounding words in
+name, company and city (`utils.fuzzy`).  All-digit queries are left to SQL,
+which matches them against the id.  The index is built when a worker starts
+and rebuilt on the next search after a write to `Employee`: the create,
+update and delete views call `invalidate()`, and ORM writes anywhere change
+its `utils.versions` generation.
+
+    from hr import search
+    emp_ids = search.employee_ids('jonh smyth')   # best first, or None if unavailable
+"""
+from django.apps import apps
+
+from utils.derived import Derived
+from utils.fuzzy import FuzzyIndex
+
+COLUMNS = ('name', 'company', 'email', 'city')
+FUZZY_FIELDS = (0, 1, 3)
+
+
+def _build():
+    Employee = apps.get_model('hr', 'Employee')
+    rows = Employee.objects.order_by('name', 'id').values_list('id', *COLUMNS)
+    return FuzzyIndex(((row[0], row[1:]) for row in rows.iterator(chunk_size=2000)), fuzzy=FUZZY_FIELDS)
+
+
+_index = Derived(('Employee',), _build)
+
+
+def index():
+    """The current Employee index, or None when it cannot be built."""
+    return _index.get()
+
+
+def invalidate():
+    """Rebuild the index on its next use (after an employee is created, updated or deleted)."""
+    _index.invalidate()
+
+
+def employee_ids(q, limit=None):
+    """Employee ids matching `q`, best first; None for all-digit queries or when the index is unavailable."""
+    q = str(q).strip()
+    if q.isdigit():
+        return None
+    idx = index()
+    if idx is None:
+        return None
+    return idx.search(q, limit)
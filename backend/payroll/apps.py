@@ -9,6 +9,6 @@ class PayrollConfig(AppConfig):
     def ready(self):
         # import signal handlers or perform startup tasks; ignore if module missing
         try:
-            import signals
+            from . import signals
         except Exception:
             pass
\ No newline at end of file
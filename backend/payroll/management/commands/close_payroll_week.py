@@ -0,0 +1,42 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll import snapshots
+
+
+class Command(BaseCommand):
+    help = 'Write the closed-week snapshots (task list and aggregate) for payroll weeks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('weeks', nargs='*', help='week dates, e.g. 2025-01-06')
+        parser.add_argument('--all', action='store_true',
+                            help='every finished week (MonthlyInvoice WeekOf) that has no snapshot yet')
+
+    def handle(self, *args, **options):
+        weeks = list(options['weeks'])
+        if options['all']:
+            # the WeekOf dates task_list is filtered on, not the Weekdone dates of vw_Payroll_Payroll_Weeks
+            MonthlyInvoice = apps.get_model('accounting', 'MonthlyInvoice')
+            done = set(snapshots.closed_weeks())
+            for week in MonthlyInvoice.objects.exclude(week_of__isnull=True).order_by('week_of') \
+                    .values_list('week_of', flat=True).distinct():
+                key = snapshots.week_key(week)
+                if not key or key in done or key in weeks:
+                    continue
+                reason = snapshots.unfinished(key)
+                if reason is None:
+                    weeks.append(key)
+                else:
+                    self.stdout.write(f'{key} skipped: {reason}')
+        if not weeks:
+            if options['all']:
+                return
+            raise CommandError('name the weeks to close, or pass --all')
+
+        for week in weeks:
+            try:
+                written = snapshots.close(week)
+            except ValueError as e:
+                raise CommandError(str(e))
+            counts = ', '.join(f'{kind}: {n} rows' for kind, n in written.items())
+            self.stdout.write(self.style.SUCCESS(f'{snapshots.week_key(week)} closed ({counts})'))
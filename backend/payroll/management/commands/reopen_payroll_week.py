@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll import snapshots
+
+
+class Command(BaseCommand):
+    help = 'Remove the closed-week snapshots of payroll weeks so they are read from the database again'
+
+    def add_arguments(self, parser):
+        parser.add_argument('weeks', nargs='+', help='week dates, e.g. 2025-01-06')
+
+    def handle(self, *args, **options):
+        for week in options['weeks']:
+            try:
+                removed = snapshots.reopen(week)
+            except ValueError as e:
+                raise CommandError(str(e))
+            if removed:
+                self.stdout.write(self.style.SUCCESS(f'{snapshots.week_key(week)} reopened ({", ".join(removed)})'))
+            else:
+                self.stdout.write(self.style.WARNING(f'{snapshots.week_key(week)} had no snapshot'))
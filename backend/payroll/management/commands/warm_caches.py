@@ -0,0 +1,75 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from importlib import import_module
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from base.settings import CACHE_WARM_MANIFEST
+from utils import refdata
+
+
+def _current_week():
+    """WeekOf of the newest payroll selection, as the YYYY-MM-DD the payroll pages send."""
+    week = refdata.payroll_selection().week_of
+    return week.strftime('%Y-%m-%d') if week else None
+
+
+def _current_route():
+    """Route of the newest payroll selection."""
+    return refdata.payroll_selection().route or None
+
+
+# Placeholders allowed as payload values in CACHE_WARM_MANIFEST
+PLACEHOLDERS = {
+    '@current_week': _current_week,
+    '@current_route': _current_route,
+}
+
+
+class Command(BaseCommand):
+    help = 'Fill the hot api/v1 cache keys listed in settings.CACHE_WARM_MANIFEST, in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='keys filled concurrently')
+        parser.add_argument('--only', nargs='*', default=None, help='manifest names to warm (default: all)')
+
+    def _resolve(self, payload):
+        resolved = {}
+        for param, value in payload.items():
+            if isinstance(value, str) and value in PLACEHOLDERS:
+                value = PLACEHOLDERS[value]()
+                if value is None:
+                    return None
+            resolved[param] = value
+        return resolved
+
+    def _warm(self, name, view_path, payload):
+        started = time.perf_counter()
+        try:
+            module, _, attr = view_path.rpartition('.')
+            endpoint = getattr(import_module(module), attr).endpoint
+            payload = self._resolve(payload)
+            if payload is None:
+                return name, None, 'skipped (placeholder unresolved)'
+            rows = endpoint.warm(payload)
+            return name, rows, f'{(time.perf_counter() - started) * 1000:.0f} ms'
+        except Exception as e:
+            return name, None, f'failed: {e!r}'
+        finally:
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        manifest = [entry for entry in CACHE_WARM_MANIFEST
+                    if options['only'] is None or entry[0] in options['only']]
+        if not manifest:
+            raise CommandError('nothing to warm')
+
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            futures = [pool.submit(self._warm, *entry) for entry in manifest]
+            for future in as_completed(futures):
+                name, rows, detail = future.result()
+                if rows is None:
+                    self.stdout.write(self.style.WARNING(f'{name}: {detail}'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'{name}: {rows} rows, {detail}'))
@@ -8,6 +8,7 @@ from reportlab.lib.colors import describe
 from datetime import datetime, date
 
 from utils import dt
+from utils.versions import VersionedManager
 
 # Ensure predictable Decimal behavior for money calculations
 getcontext().prec = 12
@@ -20,6 +21,8 @@ def _managed_for(app_label: str):
 class PayrollComments(models.Model):
     comment = models.TextField(primary_key=True, null=False, blank=False, db_column='comment')
 
+    objects = VersionedManager()
+
     class Meta:
         db_table = 'vw_Payroll_Comments'
         verbose_name = 'Payroll Comment'
@@ -34,6 +37,8 @@ class PayrollAggregate(models.Model):
     completed_count = models.IntegerField(null=True, blank=True, db_column='Completed_Count')
     percent_complete = models.DecimalField(max_digits=19, decimal_places=2, default=Decimal('0.00'), db_column='Percent_Complete')
 
+    objects = VersionedManager()
+
     class Meta:
         db_table = 'Accounting.vw_Payroll_Aggregate'
         verbose_name = 'Payroll Aggregate'
@@ -53,6 +58,8 @@ class PayrollSites(models.Model):
     adv_bill = models.BooleanField(default=False, db_column='AdvBill')
     in_monthly = models.BooleanField(default=False, db_column='InMonthly')
 
+    objects = VersionedManager()
+
     class Meta:
         db_table = 'vw_Payroll_Sites'
         verbose_name = 'Payroll Site'
@@ -87,6 +94,8 @@ class PayrollTasks(models.Model):
     temp_deposit_date = models.DateTimeField(null=True, blank=True, db_column='TempDepositDate')
     site_comm = models.BooleanField(default=False, db_column='SiteComm')
 
+    objects = VersionedManager()
+
     class Meta:
         db_table = 'vw_Payroll_Tasks'
         verbose_name = 'Payroll Task'
@@ -119,6 +128,8 @@ class PSelect(models.Model):
     route = models.CharField(max_length=3, null=True, blank=True, db_column='Route')
     route_description = models.CharField(max_length=50, null=True, blank=True, db_column='route_description')
 
+    objects = VersionedManager()
+
     # Convenience read-only properties that return only the date portion formatted as MM/DD/YYYY
     @property
     def start_mmddyyyy(self):
@@ -215,6 +226,8 @@ class PSelectTable(models.Model):
     trav_dir = models.CharField(max_length=50, null=True, blank=True, db_column='TravDir')
     route = models.CharField(max_length=3, null=True, blank=True, db_column='route')
 
+    objects = VersionedManager()
+
     class Meta:
         db_table = 'pselect'
         managed = False
@@ -225,6 +238,8 @@ class PayrollWeeks(models.Model):
     payroll_week = models.DateTimeField(null=False, blank=False, db_column='payroll_week')
     task_count = models.PositiveSmallIntegerField(default=1, db_column='task_count')
 
+    objects = VersionedManager()
+
     def __str__(self):
         return f"PayrollWeeks {self.row_id} ({self.payroll_week or 'no week'})"
 
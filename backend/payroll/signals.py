@@ -0,0 +1,28 @@
+# python
+# File: `payroll/signals.py`
+"""Drop closed-week snapshots (payroll.snapshots) when a task of the week is saved or deleted."""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from payroll import snapshots
+
+TASKS = 'accounting.MonthlyInvoice'
+
+
+@receiver(pre_save, sender=TASKS, dispatch_uid='payroll.snapshots.moving')
+def _week_before(sender, instance, **kwargs):
+    # an edit may move a task out of a closed week; remember the week it is leaving
+    if instance.pk is not None and snapshots.closed_weeks():
+        instance._snapshot_week = sender._default_manager.filter(pk=instance.pk) \
+            .values_list('week_of', flat=True).first()
+
+
+@receiver(post_save, sender=TASKS, dispatch_uid='payroll.snapshots.saved')
+def _task_saved(sender, instance, **kwargs):
+    snapshots.discard(instance.week_of)
+    snapshots.discard(getattr(instance, '_snapshot_week', None))
+
+
+@receiver(post_delete, sender=TASKS, dispatch_uid='payroll.snapshots.deleted')
+def _task_deleted(sender, instance, **kwargs):
+    snapshots.discard(instance.week_of)
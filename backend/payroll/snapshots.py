@@ -0,0 +1,192 @@
+# python
+# File: `payroll/snapshots.py`
+"""
+Snapshot store for closed payroll weeks.
+
+Once a week is finished (it is before the current payroll week, the WeekOf of
+the newest payroll selection, and every one of its tasks has a week_done) its
+`payroll.task_list` and `payroll_aggregate` rows should no longer change, so
+`close(week)` writes them once, packed by `utils.codec`, to
+PAYROLL_SNAPSHOT_DIR/<YYYY-MM-DD>/<kind>.rows.  The two endpoints then answer
+a request filtered on that `week_of` from the file, applying any `route` or
+`cust_id` filter to its rows: no database access and no TTL.
+
+A save or delete of a MonthlyInvoice task in a closed week drops the week's
+snapshots (payroll.signals), as does `reopen(week)`.  Queryset bulk writes
+send no per-row signals: reopen the weeks they touch.
+
+    manage.py close_payroll_week 2025-01-06
+    manage.py reopen_payroll_week 2025-01-06
+"""
+import os
+import threading
+import zlib
+from datetime import datetime
+from importlib import import_module
+
+from django.apps import apps
+
+from base.settings import PAYROLL_SNAPSHOT_DIR
+from utils import codec, refdata
+from utils.dt import parse_date_val
+
+# kind -> (views module, endpoint view name)
+KINDS = {
+    'tasks': ('api.v1.payroll.views', 'task_list'),
+    'aggregate': ('api.v1.payroll.views', 'payroll_aggregate'),
+}
+
+# Snapshots kept decoded per process; each read still checks the file is there.
+MAX_LOADED = 32
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def week_key(value):
+    """'YYYY-MM-DD' for a week given as a date string or datetime at midnight, else None."""
+    when = parse_date_val(value.strip() if isinstance(value, str) else value)
+    if not isinstance(when, datetime) or when.time() != datetime.min.time():
+        return None
+    return when.strftime('%Y-%m-%d')
+
+
+def path(kind, week):
+    return os.path.join(PAYROLL_SNAPSHOT_DIR, week, f'{kind}.rows')
+
+
+def load(kind, week):
+    """The snapshot rows of `kind` for `week` (a week key), or None if the week has none."""
+    file = path(kind, week)
+    try:
+        stamp = os.stat(file).st_mtime_ns
+    except OSError:
+        _loaded.pop((kind, week), None)
+        return None
+    entry = _loaded.get((kind, week))
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+    try:
+        # PackedRows inflates the whole blob up front, so a plain read is all it needs
+        with open(file, 'rb') as f:
+            rows = codec.PackedRows(f.read())
+    except (OSError, ValueError, zlib.error):
+        return None
+    with _lock:
+        if len(_loaded) >= MAX_LOADED:
+            _loaded.pop(next(iter(_loaded)))
+        _loaded[(kind, week)] = (stamp, rows)
+    return rows
+
+
+def _iexact(value):
+    # as SQL Server compares: case-insensitive, trailing spaces ignored
+    wanted = str(value).rstrip().casefold()
+    return lambda v: str(v if v is not None else '').rstrip().casefold() == wanted
+
+
+def _tests(endpoint, query):
+    """(position, predicate) for each filter of `query` besides week_of, or None if one needs SQL."""
+    tests = []
+    for param, value in query.params.items():
+        if param == 'week_of':
+            continue
+        field, lookup, _ = endpoint.filters[param]
+        position = next((i for i, f in enumerate(endpoint.fields) if f.source == field), None)
+        if position is None or lookup != 'iexact':
+            return None
+        tests.append((position, _iexact(value)))
+    return tests
+
+
+def source(kind):
+    """Snapshot lookup for an Endpoint: serves queries filtered on `week_of`, plus iexact filters."""
+    def lookup(query):
+        week = week_key(query.params['week_of']) if 'week_of' in query.params else None
+        rows = load(kind, week) if week else None
+        if rows is None or len(query.params) == 1:
+            return rows
+        tests = _tests(_endpoint(kind), query)
+        return rows.where(tests) if tests is not None else None
+    return lookup
+
+
+def _endpoint(kind):
+    module, name = KINDS[kind]
+    return getattr(import_module(module), name).endpoint
+
+
+def current_week():
+    """Key of the current payroll week (WeekOf of the newest payroll selection), or None."""
+    return week_key(refdata.payroll_selection().week_of)
+
+
+def unfinished(key):
+    """Why the week `key` cannot be closed yet, or None when it is finished."""
+    current = current_week()
+    if current is None or key >= current:
+        return 'it is not before the current payroll week'
+    MonthlyInvoice = apps.get_model('accounting', 'MonthlyInvoice')
+    open_tasks = MonthlyInvoice.objects.filter(week_of=datetime.strptime(key, '%Y-%m-%d'),
+                                               week_done__isnull=True).count()
+    if open_tasks:
+        return f'{open_tasks} of its tasks have no week_done'
+    return None
+
+
+def close(week):
+    """Write the snapshots of the finished `week`; returns {kind: row count}."""
+    key = week_key(week)
+    if key is None:
+        raise ValueError(f'not a week date: {week!r}')
+    reason = unfinished(key)
+    if reason is not None:
+        raise ValueError(f'{key} is still open: {reason}')
+    os.makedirs(os.path.join(PAYROLL_SNAPSHOT_DIR, key), exist_ok=True)
+    written = {}
+    for kind in KINDS:
+        endpoint = _endpoint(kind)
+        query = endpoint.parse({'week_of': key})
+        rows = endpoint.fetch(query, endpoint.full, None)
+        tmp = f'{path(kind, key)}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(codec.pack(rows))
+        os.replace(tmp, path(kind, key))
+        written[kind] = len(rows)
+    return written
+
+
+def reopen(week):
+    """Remove the snapshots of `week` so it is read from the database again; returns the kinds removed."""
+    key = week_key(week)
+    if key is None:
+        raise ValueError(f'not a week date: {week!r}')
+    removed = []
+    for kind in KINDS:
+        try:
+            os.remove(path(kind, key))
+            removed.append(kind)
+        except FileNotFoundError:
+            pass
+        _loaded.pop((kind, key), None)
+        _endpoint(kind).invalidate()
+    try:
+        os.rmdir(os.path.join(PAYROLL_SNAPSHOT_DIR, key))
+    except OSError:
+        pass
+    return removed
+
+
+def discard(week_of):
+    """Drop the snapshots of the week `week_of` after a write to one of its tasks."""
+    key = week_key(week_of) if week_of is not None else None
+    if key is not None and os.path.isdir(os.path.join(PAYROLL_SNAPSHOT_DIR, key)):
+        reopen(key)
+
+
+def closed_weeks():
+    """Week keys that have a snapshot on disk."""
+    try:
+        return sorted(w for w in os.listdir(PAYROLL_SNAPSHOT_DIR) if week_key(w) == w)
+    except OSError:
+        return []
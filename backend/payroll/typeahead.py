@@ -0,0 +1,75 @@
+# python
+# File: `payroll/typeahead.py`
+"""
+Typeahead indexes for the payroll pickers (AdvancedCombo).
+
+    sites()           PayrollSites by cust_id and company
+    tasks(cust_id)    routing Tasks of one customer by description
+
+Each index is built once per worker (task indexes per customer, on first
+use) and rebuilt on the next lookup after an ORM write changes the
+`utils.versions` generation of the tables behind it.
+"""
+import threading
+from collections import OrderedDict
+
+from django.apps import apps
+
+from utils import versions
+from utils.typeahead import NarrowingCache, PrefixIndex
+
+# Customers whose task index is kept per worker.
+MAX_TASK_INDEXES = 256
+
+SITE_TABLES = versions.expand(('vw_Payroll_Sites',))
+TASK_TABLES = versions.expand(('tasks',))
+
+narrowing = NarrowingCache(ttl=30)
+
+_lock = threading.Lock()
+_sites = {'generation': None, 'index': None}
+_tasks = OrderedDict()
+
+
+def _generation(tables):
+    return tuple(versions.current(tables))
+
+
+def _load_sites():
+    Model = apps.get_model('payroll', 'PayrollSites')
+    rows = Model.objects.values_list('cust_id', 'company')
+    return PrefixIndex((str(cust_id), f'{cust_id} - {company or cust_id}', (cust_id, company))
+                       for cust_id, company in rows)
+
+
+def _load_tasks(cust_id):
+    Model = apps.get_model('routing', 'Tasks')
+    rows = Model.objects.filter(cust_id=cust_id).order_by('task_order', 'id').values_list('id', 'description')
+    return PrefixIndex((task_id, description or str(task_id), (description,)) for task_id, description in rows)
+
+
+def sites():
+    generation = _generation(SITE_TABLES)
+    if _sites['index'] is None or _sites['generation'] != generation:
+        with _lock:
+            if _sites['index'] is None or _sites['generation'] != generation:
+                _sites.update(index=_load_sites(), generation=generation)
+    return _sites['index']
+
+
+def tasks(cust_id):
+    generation = _generation(TASK_TABLES)
+    entry = _tasks.get(cust_id)
+    if entry is None or entry[0] != generation:
+        index = _load_tasks(cust_id)
+        with _lock:
+            _tasks[cust_id] = (generation, index)
+            _tasks.move_to_end(cust_id)
+            while len(_tasks) > MAX_TASK_INDEXES:
+                _tasks.popitem(last=False)
+        return index
+    with _lock:
+        # keep busy customers' indexes; eviction takes the least recently used
+        if cust_id in _tasks:
+            _tasks.move_to_end(cust_id)
+    return entry[1]
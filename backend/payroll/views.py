@@ -22,7 +22,7 @@ from datetime import datetime, timedelta
 from base import settings
 from .models import PayrollComments
 from accounting.models import PSelect
-from utils import dt
+from utils import dt, refdata
 
 
 def _table_exists(table_name: str) -> bool:
@@ -35,6 +35,16 @@ def _table_exists(table_name: str) -> bool:
         return False
 
 
+def _employee(emp_id):
+    """Active employee from the reference data; former employees still come from HR."""
+    emp = refdata.employee(emp_id)
+    if emp is None:
+        HREmployee = apps.get_model('hr', 'Employee')
+        e = HREmployee.objects.only('id', 'name', 'comm_rate').get(pk=int(emp_id))
+        emp = refdata.Employee(e.id, e.name or '', e.comm_rate)
+    return emp
+
+
 def index(request):
     # Get the latest pselect record and related data
     pselect_data = {
@@ -53,7 +63,7 @@ def index(request):
     try:
         PSelect = apps.get_model('accounting', 'PSelect')
         if _table_exists(PSelect._meta.db_table):
-            ps = PSelect.objects.order_by('-uid').first()
+            ps = PSelect.objects.cached().order_by('-uid').first()
             if ps:
                 pselect_data['emp_id'] = str(ps.emp_id).strip() if ps.emp_id else ''
                 pselect_data['old_start'] = ps.oldstart
@@ -61,32 +71,23 @@ def index(request):
                 pselect_data['special_equipment'] = ps.spec_equip
                 old_start_date = ps.oldstart
                 pselect_data['route'] = getattr(ps, 'route', pselect_data['route']) or pselect_data['route']
-                # Look up employee name from HR if possible
+                # Look up employee name from the reference data (HR for former employees)
                 if ps.emp_id:
                     try:
-                        HREmployee = apps.get_model('hr', 'Employee')
-                        if _table_exists(HREmployee._meta.db_table):
-                            emp = HREmployee.objects.get(pk=int(ps.emp_id))
-                            pselect_data['employee_name'] = emp.name
-                            pselect_data['commrate'] = emp.commrate if getattr(emp, 'commrate', None) is not None else Decimal('0.35')  # | 0.00
+                        emp = _employee(ps.emp_id)
+                        pselect_data['employee_name'] = emp.name
+                        pselect_data['commrate'] = emp.comm_rate if emp.comm_rate is not None else Decimal('0.35')  # | 0.00
                     except Exception:
                         pselect_data['employee_name'] = f"Employee #{ps.emp_id}"
     except LookupError:
         pass
 
     # --- New: load active employees for the popup ---
-    employee_options = []
-    try:
-        HREmployee = apps.get_model('hr', 'Employee')
-        if _table_exists(HREmployee._meta.db_table):
-            qs = HREmployee.objects.filter(employed=True).order_by('name').values_list('id', 'name')
-            # normalize id to string to make template comparison straightforward
-            employee_options = [
-                {'id': str(eid), 'name': (name.title() if name else '')}
-                for (eid, name) in qs
-            ]
-    except Exception:
-        employee_options = []
+    # normalize id to string to make template comparison straightforward
+    employee_options = [
+        {'id': str(emp.id), 'name': emp.name.title()}
+        for emp in refdata.employees()
+    ]
     # Ensure the selected employee from pselect_data is in the options
     if pselect_data.get('emp_id') and pselect_data.get('employee_name'):
         emp_id_str = str(pselect_data['emp_id'])
@@ -98,26 +99,17 @@ def index(request):
     # --------------------------------------------------
 
     # --- New: load active routes for the popup (server-rendered) ---
-    route_options = []
-    try:
-        # prefer importing model via apps to avoid import-time errors if app not present
-        Route = apps.get_model('routing', 'Route')
-        if _table_exists(Route._meta.db_table):
-            qs = Route.objects.filter(active=True).order_by('route').values_list('id', 'route')
-            route_options = [{'id': str(rid), 'route': (route or '')} for (rid, route) in qs]
-    except Exception:
-        route_options = []
+    route_options = [
+        {'id': str(r.id), 'route': r.route}
+        for r in sorted(refdata.routes(), key=lambda r: r.route)
+    ]
     # --------------------------------------------------
 
     # Get filter values from request.GET with defaults
     route_filter = request.GET.get('route')
     if route_filter:
-        try:
-            Route = apps.get_model('routing', 'Route')
-            route_obj = Route.objects.get(id=int(route_filter))
-            route_filter = route_obj.route
-        except Exception:
-            route_filter = 'A'
+        route_obj = refdata.route_by_id(route_filter)
+        route_filter = route_obj.route if route_obj else 'A'
     else:
         route_filter = 'A'
 
@@ -135,11 +127,9 @@ def index(request):
     if employee_param:
         try:
             emp_id = int(employee_param)
-            HREmployee = apps.get_model('hr', 'Employee')
-            if _table_exists(HREmployee._meta.db_table):
-                emp = HREmployee.objects.get(pk=emp_id)
-                pselect_data['emp_id'] = str(emp_id)
-                pselect_data['employee_name'] = emp.name
+            emp = _employee(emp_id)
+            pselect_data['emp_id'] = str(emp_id)
+            pselect_data['employee_name'] = emp.name
         except Exception:
             pass
 
@@ -155,12 +145,8 @@ def index(request):
     if request.GET.get('route'):
         pselect_data['route_id'] = str(request.GET.get('route'))
     else:
-        try:
-            Route = apps.get_model('routing', 'Route')
-            route_obj = Route.objects.get(route=pselect_data['route'])
-            pselect_data['route_id'] = str(route_obj.id)
-        except Exception:
-            pselect_data['route_id'] = ''
+        route_obj = refdata.route_by_code(pselect_data['route'])
+        pselect_data['route_id'] = str(route_obj.id) if route_obj else ''
 
     # Provide tasks from accounting.MonthlyInvoice with 7-day date range filter
     tasks = []
@@ -168,7 +154,7 @@ def index(request):
         PayrollTasks = apps.get_model('accounting', 'PayrollTasks')
         tasks_table = PayrollTasks._meta.db_table
 
-        queryset = PayrollTasks.objects.all()
+        queryset = PayrollTasks.objects.cached()
 
         # Filter by 7-day range if we have a start_date
         if start_date:
@@ -192,17 +178,8 @@ def index(request):
     except LookupError:
         tasks = []
 
-    # Build comment dropdown set from all distinct MonthlyInvoice.comment values (not just filtered tasks)
-    comment_set = set()
-    try:
-        PayrollTasks = apps.get_model('payroll', 'PayrollComments')
-        comments_table = PayrollComments._meta.db_table
-        qs = PayrollComments.objects.values_list('comment', flat=True).order_by('comment').distinct()
-        # Uppercase all distinct comment values
-        comment_set = {str(c).upper() for c in qs}
-    except Exception:
-        comment_set = set()
-    comment_options = sorted(comment_set)
+    # Comment dropdown: all distinct payroll comments (not just filtered tasks), upper-cased
+    comment_options = list(refdata.comments())
 
     # Buttons helper for the template
     buttons = range(9)
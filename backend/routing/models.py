@@ -4,6 +4,7 @@ from dataclasses import asdict
 from decimal import Decimal, ROUND_HALF_UP
 
 from django.db import models
+from utils.versions import VersionedManager
 
 
 class Routes(models.Model):
@@ -18,6 +19,8 @@ class Routes(models.Model):
     latitude = models.FloatField(null=True, blank=True, db_column='Latitude')
     longitude = models.FloatField(null=True, blank=True, db_column='Longitude')
 
+    objects = VersionedManager()
+
     class Meta:
         db_table = 'tbl_Route'
         verbose_name = 'Route'
@@ -51,6 +54,8 @@ class Tasks(models.Model):
     obros_id = models.IntegerField(null=True, blank=True, db_column='OBROS_ID')
     selected = models.BooleanField(default=False, db_column='Selected', db_default='False')
 
+    objects = VersionedManager()
+
     class Meta:
         db_table = 'tasks'
         verbose_name = 'Task'
@@ -3,7 +3,7 @@ import {AdvancedCombo} from './advanced-combo.js';
 
 /*
 Initializes five AdvancedCombo instances and wires site changes + modal show.
-- fetchTasks uses `insert-payroll-entry-site-modal` value to call the server API.
+- fetchTasks uses `insert-payroll-entry-site-modal` value to call the task typeahead API.
 - createHandler posts to an example create API and expects a JSON-created item.
 */
 
@@ -12,28 +12,20 @@ document.addEventListener('DOMContentLoaded', () => {
     const modalEl = document.getElementById('insertEntryModal');
     const insertBtn = document.getElementById('insertEntryBtn');
 
-    async function fetchTasks(query = '') {
+    async function fetchTasks(query = '', slot = 0) {
         const custId = siteSelect ? siteSelect.value : '';
         if (!custId) return [];
-        const url = `/api/payroll_task_selection_api?cust_id=${encodeURIComponent(custId)}&q=${encodeURIComponent(query)}`;
+        // ranked top-k typeahead; `client` lets each combo narrow its own previous results
+        const url = `/api/v1/payroll/typeahead/tasks?cust_id=${encodeURIComponent(custId)}&q=${encodeURIComponent(query)}&client=task-${slot}`;
         const res = await fetch(url);
         if (!res.ok) throw new Error('Network error');
         const json = await res.json();
-        const tasks = json.tasks ?? json.data ?? json ?? [];
-        return (tasks || []).map(t => {
-            const parts = [];
-            if (t.master_id) parts.push(t.master_id);
-            if (t.company) parts.push(t.company);
-            if (t.description) parts.push(t.description);
-            const tax = t.sale_tax_formatted ?? t.sale_tax;
-            if (tax !== undefined && tax !== null && String(tax).trim() !== '') parts.push(`tax: ${tax}`);
-            return {
-                id: String(t.id ?? ''),
-                label: parts.join(' \u2014 ') || String(t.description ?? t.id ?? ''),
-                icon: t.icon_url || t.icon || '',
-                meta: t.sale_tax_formatted ?? ''
-            };
-        });
+        return (json.items || []).map(t => ({
+            id: String(t.id ?? ''),
+            label: t.label || String(t.id ?? ''),
+            icon: '',
+            meta: ''
+        }));
     }
 
     async function createTaskOnServer(text) {
@@ -54,11 +46,11 @@ document.addEventListener('DOMContentLoaded', () => {
         };
     }
 
-    function comboOptions() {
+    function comboOptions(slot) {
         return {
             fetcher: async (q) => {
                 try {
-                    return await fetchTasks(q);
+                    return await fetchTasks(q, slot);
                 } catch (e) {
                     console.error(e);
                     return [];
@@ -88,7 +80,7 @@ document.addEventListener('DOMContentLoaded', () => {
     for (let i = 1; i <= 5; i++) {
         const root = document.getElementById(`taskComboRoot-${i}`);
         if (!root) continue;
-        const combo = new AdvancedCombo(root, comboOptions());
+        const combo = new AdvancedCombo(root, comboOptions(i));
         combos.push(combo);
     }
 
@@ -0,0 +1,115 @@
+# python
+# File: `utils/cachestats.py`
+"""
+Cache telemetry per key family.
+
+A key family is the part of a cache key before its generation, e.g.
+`payroll_sites_v1` for `payroll_sites_v1_3f2a9c0d1e4b_<digest>`.  Events
+(hit, miss, stale, fill, eviction, ...) are counted in process and added to
+shared counters by `flush()`, which `base.middleware.CacheTelemetryMiddleware`
+calls after each request at most every FLUSH_INTERVAL seconds; `snapshot()`
+reads the totals of all workers.  The events of the current request are also
+kept per thread so the middleware can report them in debug headers.
+"""
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+
+PREFIX = 'cachestats'
+FLUSH_INTERVAL = 5.0
+
+# counters kept per family; *_us and bytes are sums (fill_bytes counts packed row sets only)
+EVENTS = ('hit', 'miss', 'stale', 'fill', 'fill_error', 'wait', 'render_hit', 'render_miss', 'evicted')
+SUMS = ('fill_us', 'fill_bytes', 'evicted_bytes')
+
+_family_re = re.compile(r'^(?::\d+:)?(.+?)(?:_[0-9a-f]{12}_.*|:.*)?$')
+
+_lock = threading.Lock()
+_pending = defaultdict(lambda: defaultdict(int))
+_last_flush = time.monotonic()
+_request = threading.local()
+
+
+def family(key):
+    """Key family of a cache key (strips Django's version prefix, generation and digest)."""
+    m = _family_re.match(key)
+    return m.group(1) if m else key
+
+
+def record(key, event, us=0, size=0):
+    """Count `event` for the family of `key`, with optional fill time (µs) and byte size."""
+    fam = family(key)
+    with _lock:
+        counters = _pending[fam]
+        counters[event] += 1
+        if event == 'fill':
+            counters['fill_us'] += int(us)
+            counters['fill_bytes'] += int(size)
+        elif event == 'evicted':
+            counters['evicted_bytes'] += int(size)
+    events = getattr(_request, 'events', None)
+    if events is not None:
+        events.append((fam, event))
+
+
+def begin_request():
+    _request.events = []
+
+
+def end_request():
+    """Events of the current request, as (family, event) pairs."""
+    events = getattr(_request, 'events', None) or []
+    _request.events = None
+    return events
+
+
+def flush(force=False):
+    """Add this process's pending counters to the shared totals."""
+    global _last_flush
+    now = time.monotonic()
+    if not force and now - _last_flush < FLUSH_INTERVAL:
+        return
+    with _lock:
+        pending = {fam: dict(c) for fam, c in _pending.items()}
+        _pending.clear()
+        _last_flush = now
+    if not pending:
+        return
+    try:
+        families = set(cache.get(f'{PREFIX}:families') or ())
+        if not families.issuperset(pending):
+            cache.set(f'{PREFIX}:families', sorted(families | set(pending)), None)
+        for fam, counters in pending.items():
+            for name, value in counters.items():
+                key = f'{PREFIX}:{fam}:{name}'
+                cache.add(key, 0, None)
+                cache.incr(key, value)
+    except Exception:
+        # telemetry must never break a request
+        pass
+
+
+def snapshot():
+    """Totals of all workers per family, with derived hit ratio and mean fill time."""
+    families = cache.get(f'{PREFIX}:families') or ()
+    names = EVENTS + SUMS
+    keys = [f'{PREFIX}:{fam}:{name}' for fam in families for name in names]
+    values = cache.get_many(keys) if keys else {}
+    result = {}
+    for fam in families:
+        stats = {name: values.get(f'{PREFIX}:{fam}:{name}', 0) for name in names}
+        reads = stats['hit'] + stats['stale'] + stats['miss']
+        stats['hit_ratio'] = round((stats['hit'] + stats['stale']) / reads, 4) if reads else None
+        stats['fill_ms_avg'] = round(stats['fill_us'] / stats['fill'] / 1000, 2) if stats['fill'] else None
+        stats['fills_never_hit'] = stats['fill'] > 0 and stats['hit'] + stats['stale'] + stats['render_hit'] == 0
+        result[fam] = stats
+    return result
+
+
+def reset():
+    families = cache.get(f'{PREFIX}:families') or ()
+    cache.delete_many([f'{PREFIX}:{fam}:{name}' for fam in families for name in EVENTS + SUMS])
+    cache.delete(f'{PREFIX}:families')
@@ -0,0 +1,236 @@
+# python
+# File: `utils/codec.py`
+"""
+Compact columnar codec for cached row lists.
+
+`pack(rows)` turns a list of equal-length tuples into one zlib-compressed
+blob: a row count and, per column, the cheapest encoding that round-trips
+its values exactly:
+
+    bool     bit-packed values (+ null bitmap)
+    int      int64 array (+ null bitmap)
+    fixed    Decimals sharing one exponent as scaled int64, e.g. cents
+    days     dates / midnight datetimes as epoch days (int32)
+    micros   other datetimes as epoch microseconds (int64)
+    dict     strings (and None) as indexes into a table of distinct values
+    obj      anything else, as is
+
+`PackedRows(blob)` decompresses once and decodes cells only for the rows
+read, so `match()` (the cached `q` filter) scans just the searched columns
+and builds tuples for the rows that pass.
+
+    blob = codec.pack(rows)
+    data = codec.PackedRows(blob)
+    hits = data.match('acme', (0, 2))
+    page = data[100:200]
+"""
+import pickle
+import zlib
+from array import array
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+VERSION = 1
+LEVEL = 6
+
+_EPOCH = date(1970, 1, 1)
+_DAY = timedelta(days=1)
+_MICRO = timedelta(microseconds=1)
+
+
+def _bits(flags):
+    out = bytearray((len(flags) + 7) // 8)
+    for i, f in enumerate(flags):
+        if f:
+            out[i >> 3] |= 1 << (i & 7)
+    return bytes(out)
+
+
+def _bit(bits, i):
+    return bool(bits[i >> 3] & (1 << (i & 7)))
+
+
+def _nulls(values):
+    return _bits([v is None for v in values]) if any(v is None for v in values) else None
+
+
+def _encode_column(values):
+    present = [v for v in values if v is not None]
+    types = {type(v) for v in present}
+    nulls = _nulls(values)
+
+    if not present or types <= {str}:
+        table = list(dict.fromkeys(values))
+        index = {v: i for i, v in enumerate(table)}
+        codes = array('H' if len(table) <= 0xFFFF else 'I', [index[v] for v in values])
+        return ('dict', tuple(table), codes.typecode, codes.tobytes())
+
+    if types == {bool}:
+        return ('bool', _bits(values), nulls)
+
+    if types == {int}:
+        if all(-(1 << 63) <= v < (1 << 63) for v in present):
+            return ('int', array('q', [0 if v is None else v for v in values]).tobytes(), nulls)
+
+    # -0 and NaN/Infinity do not survive scaling
+    if types == {Decimal} and all(v.is_finite() and not (v.is_zero() and v.is_signed()) for v in present):
+        exponents = {v.as_tuple().exponent for v in present}
+        if len(exponents) == 1:
+            exp = exponents.pop()
+            scaled = [0 if v is None else int(v.scaleb(-exp)) for v in values]
+            if all(-(1 << 63) <= v < (1 << 63) for v in scaled):
+                return ('fixed', exp, array('q', scaled).tobytes(), nulls)
+
+    if types == {date}:
+        days = [0 if v is None else (v - _EPOCH).days for v in values]
+        return ('days', None, False, array('i', days).tobytes(), nulls)
+
+    if types == {datetime}:
+        zones = {v.tzinfo for v in present}
+        tz = zones.pop() if len(zones) == 1 else False
+        # naive or fixed-offset only: epoch arithmetic across DST changes would not round-trip
+        if tz is None or (tz is not False and tz.utcoffset(None) is not None):
+            epoch = datetime(1970, 1, 1, tzinfo=tz)
+            if all(v.hour == v.minute == v.second == v.microsecond == 0 for v in present):
+                days = [0 if v is None else (v - epoch).days for v in values]
+                return ('days', tz, True, array('i', days).tobytes(), nulls)
+            micros = [0 if v is None else (v - epoch) // _MICRO for v in values]
+            return ('micros', tz, array('q', micros).tobytes(), nulls)
+
+    return ('obj', list(values))
+
+
+def pack(rows):
+    """Compressed columnar blob for a list of equal-length tuples."""
+    rows = list(rows)
+    columns = [_encode_column(list(col)) for col in zip(*rows)] if rows else []
+    payload = pickle.dumps((VERSION, len(rows), columns), pickle.HIGHEST_PROTOCOL)
+    return zlib.compress(payload, LEVEL)
+
+
+def _decoder(column):
+    """Function from row index to cell value for one encoded column."""
+    kind = column[0]
+
+    if kind == 'dict':
+        _, table, typecode, raw = column
+        codes = _array(typecode, raw)
+        return lambda i: table[codes[i]]
+
+    if kind == 'obj':
+        return column[1].__getitem__
+
+    if kind == 'bool':
+        _, bits, nulls = column
+        if nulls is None:
+            return lambda i: _bit(bits, i)
+        return lambda i: None if _bit(nulls, i) else _bit(bits, i)
+
+    if kind == 'int':
+        _, raw, nulls = column
+        get = _array('q', raw).__getitem__
+    elif kind == 'fixed':
+        _, exp, raw, nulls = column
+        values = _array('q', raw)
+        get = lambda i: Decimal(values[i]).scaleb(exp)
+    elif kind == 'days':
+        _, tz, as_datetime, raw, nulls = column
+        values = _array('i', raw)
+        if as_datetime:
+            epoch = datetime(1970, 1, 1, tzinfo=tz)
+            get = lambda i: epoch + values[i] * _DAY
+        else:
+            get = lambda i: _EPOCH + values[i] * _DAY
+    elif kind == 'micros':
+        _, tz, raw, nulls = column
+        values = _array('q', raw)
+        epoch = datetime(1970, 1, 1, tzinfo=tz)
+        get = lambda i: epoch + values[i] * _MICRO
+    else:
+        raise ValueError(f'unknown column encoding {kind!r}')
+
+    if nulls is None:
+        return get
+    return lambda i: None if _bit(nulls, i) else get(i)
+
+
+def _array(typecode, raw):
+    values = array(typecode)
+    values.frombytes(raw)
+    return values
+
+
+class PackedRows:
+    """Read-only sequence of row tuples over a `pack()` blob, decoded on access."""
+
+    def __init__(self, blob):
+        version, self.length, self.columns = pickle.loads(zlib.decompress(blob))
+        if version != VERSION:
+            raise ValueError(f'unsupported packed rows version {version}')
+        self._decoders = [None] * len(self.columns)
+
+    def _get(self, c):
+        decode = self._decoders[c]
+        if decode is None:
+            decode = self._decoders[c] = _decoder(self.columns[c])
+        return decode
+
+    def row(self, i):
+        return tuple(self._get(c)(i) for c in range(len(self.columns)))
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.row(i) for i in range(*item.indices(self.length))]
+        if item < 0:
+            item += self.length
+        if not 0 <= item < self.length:
+            raise IndexError('row index out of range')
+        return self.row(item)
+
+    def __iter__(self):
+        for i in range(self.length):
+            yield self.row(i)
+
+    def where(self, tests):
+        """Rows passing every (position, predicate) test, decoding only the tested columns until a row passes."""
+        keep = range(self.length)
+        for c, test in tests:
+            decode = self._get(c)
+            keep = [i for i in keep if test(decode(i))]
+        return [self.row(i) for i in keep]
+
+    def match(self, q, positions):
+        """
+        Rows where any column in `positions` contains `q` (case-insensitive),
+        as Search.match does on plain lists.  String columns are matched once
+        per distinct value.
+        """
+        if not self.length:
+            return []
+        ql = q.lower()
+        hits = bytearray(self.length)
+        for c in positions:
+            column = self.columns[c]
+            if column[0] == 'dict':
+                _, table, typecode, raw = column
+                wanted = {k for k, v in enumerate(table) if ql in (v if v is not None else '').lower()}
+                if wanted:
+                    for i, code in enumerate(_array(typecode, raw)):
+                        if code in wanted:
+                            hits[i] = 1
+            else:
+                decode = self._get(c)
+                for i in range(self.length):
+                    if not hits[i]:
+                        v = decode(i)
+                        if ql in str(v if v is not None else '').lower():
+                            hits[i] = 1
+        return [self.row(i) for i in range(self.length) if hits[i]]
+
+
+def unpack(value):
+    """Row sequence for a cached value: PackedRows for a blob, anything else unchanged."""
+    return PackedRows(value) if isinstance(value, bytes) else value
@@ -0,0 +1,104 @@
+# python
+# File: `utils/compression.py`
+"""
+Content-encoding helpers shared by `base.middleware.CompressionMiddleware`
+and the api/v1 rendered-response cache.
+
+Brotli is used when the optional `brotli` package is installed; gzip is
+always available.  Bodies below COMPRESS_MIN_BYTES are sent as-is.
+"""
+import gzip
+import time
+import zlib
+
+from base.settings import COMPRESS_MIN_BYTES
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Server preference among encodings the client accepts equally.
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# Levels for per-request compression; cache fills compress once and can afford more.
+LEVELS = {'br': 5, 'gzip': 6}
+FILL_LEVELS = {'br': 9, 'gzip': 9}
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/', 'application/javascript')
+
+
+def negotiate(accept_encoding, available=ENCODINGS):
+    """
+    Pick an encoding from `available` for an Accept-Encoding header, honouring
+    q-values (q=0 refuses).  Returns None when identity should be sent.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for enc in available:
+        q = weights.get(enc, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+def compress(body, encoding, level=None):
+    """Compress `body`; returns (data, milliseconds spent)."""
+    level = LEVELS[encoding] if level is None else level
+    started = time.perf_counter()
+    if encoding == 'br':
+        data = brotli.compress(body, quality=level)
+    else:
+        data = gzip.compress(body, compresslevel=level, mtime=0)
+    return data, (time.perf_counter() - started) * 1000
+
+
+def precompress(body):
+    """All variants of `body` worth storing: {encoding: (data, ms)}; empty below the threshold."""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return {}
+    variants = {}
+    for enc in ENCODINGS:
+        data, ms = compress(body, enc, FILL_LEVELS[enc])
+        if len(data) < len(body):
+            variants[enc] = (data, ms)
+    return variants
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of byte chunks incrementally, flushing after each chunk."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=LEVELS['br'])
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    # wbits 16+MAX_WBITS writes a gzip header and trailer
+    compressor = zlib.compressobj(LEVELS['gzip'], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def describe(encoding, original, compressed, ms, cached=False):
+    """Value of the X-Compression header: encoding, ratio and compression time."""
+    ratio = original / compressed if compressed else 0.0
+    value = f'{encoding}; ratio={ratio:.2f}; ms={ms:.2f}; bytes={original}->{compressed}'
+    return value + '; precompressed' if cached else value
@@ -0,0 +1,87 @@
+# python
+# File: `utils/derived.py`
+"""
+Per-worker structures derived from database tables (search indexes,
+bitmaps), rebuilt when the tables change.
+
+A `Derived` is rebuilt on its next use after an ORM write changes the
+`utils.versions` generation of a table behind it, after `invalidate()`, or,
+with `watch`, when a poll of max(<column>) and the row count every `poll`
+seconds sees a write made outside this application.  The first build waits;
+later rebuilds run in one thread while the others keep using the previous
+structure.  A failed build is logged, and `get()` returns None while no build
+has succeeded.
+
+    index = Derived(('Site',), lambda: TrigramIndex(...), watch=('customers', 'Site', 'updated_date'), poll=60)
+    idx = index.get()
+"""
+import logging
+import threading
+import time
+
+from django.apps import apps
+from django.db.models import Count, Max
+
+from utils import versions
+
+logger = logging.getLogger(__name__)
+
+
+class Derived:
+
+    def __init__(self, tables, build, watch=None, poll=None):
+        self.tables = versions.expand(tables)
+        self.build = build
+        self.watch = watch
+        self.poll = poll
+        self.value = None
+        self.generation = None
+        self.stamp = None
+        self.polled_at = 0.0
+        self.changed = False
+        self._lock = threading.Lock()
+
+    def _stamp(self):
+        if self.watch is None:
+            return None
+        app_label, model_name, column = self.watch
+        Model = apps.get_model(app_label, model_name)
+        return tuple(Model.objects.aggregate(Max(column), Count('pk')).values())
+
+    def _stale(self, generation):
+        if self.value is None or self.changed or generation != self.generation:
+            return True
+        if self.watch is None or time.monotonic() - self.polled_at < self.poll:
+            return False
+        self.polled_at = time.monotonic()
+        self.changed = self._stamp() != self.stamp
+        return self.changed
+
+    def _rebuild(self, generation):
+        # cleared first, so an invalidate() during the build forces another one
+        self.changed = False
+        try:
+            stamp = self._stamp()
+            value = self.build()
+        except Exception:
+            self.changed = True
+            raise
+        self.value, self.generation, self.stamp, self.polled_at = value, generation, stamp, time.monotonic()
+
+    def get(self):
+        """The current structure, or None when it cannot be built."""
+        try:
+            generation = tuple(versions.current(self.tables))
+            if self._stale(generation) and self._lock.acquire(blocking=self.value is None):
+                try:
+                    if self._stale(generation):
+                        self._rebuild(generation)
+                finally:
+                    self._lock.release()
+        except Exception:
+            logger.exception('rebuilding %r failed', self.tables)
+        return self.value
+
+    def invalidate(self):
+        """Rebuild on the next use."""
+        self.changed = True
@@ -0,0 +1,203 @@
+# python
+# File: `utils/fuzzy.py`
+"""
+In-memory fuzzy name index: substring, word prefix, phonetic and bounded
+edit-distance matching over a few text fields per document.
+
+Each document is a key plus a tuple of text fields, folded to lowercase
+ASCII.  A query is answered in three tiers, best first:
+
+    substring   the query appears in a field, as `field__icontains` would
+                find it (ranked as in `utils.trigram`)
+    words       every query word is a word, or the start of a word, of the
+                document's `fuzzy` fields             ("jo smi" -> "John Smith")
+    fuzzy       every query word is at least a near miss: a word with the
+                same phonetic key ("kathryn" -> "Catherine"), or within
+                `max_distance` edits ("jonh" -> "John")
+
+Near misses are found without comparing the query to every word: each word
+of the vocabulary is stored under the strings left by deleting up to two of
+its characters, and a query word only checks the words sharing one of its
+own deletions.  Documents in the last two tiers are ranked by total edit
+cost, then best field, then insertion order.
+
+    index = FuzzyIndex(((pk, (name, company)) for pk, name, company in rows), fuzzy=(0, 1))
+    index.search('jonh smyth')   # keys, best first
+"""
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import combinations
+
+from utils.trigram import TrigramIndex
+
+_word_re = re.compile(r'[0-9a-z]+')
+
+# Sorts after every character that can follow a prefix in the vocabulary.
+_HIGH = '\U0010ffff'
+
+# Words shorter than this are matched exactly or by prefix only.
+MIN_FUZZY = 3
+
+# Cost of a phonetic match that is not also within the edit bound.
+PHONETIC_COST = 2
+
+
+def fold(text):
+    """Lowercase ASCII form of `text`: accents dropped ("José" -> "jose")."""
+    if text is None:
+        return ''
+    return unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii').lower()
+
+
+def max_distance(word):
+    """Edits allowed for a query word: none below MIN_FUZZY letters, one up to five, then two."""
+    n = len(word)
+    return 0 if n < MIN_FUZZY else 1 if n <= 5 else 2
+
+
+_codes = {}
+for _letters, _code in (('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'), ('l', '4'), ('mn', '5'), ('r', '6')):
+    for _c in _letters:
+        _codes[_c] = _code
+
+
+def phonetic(word):
+    """
+    Soundex-style key that codes the first letter too, so names differing only
+    in a like-sounding initial agree ("catherine", "kathryn" -> "2365").
+    Vowels separate repeated codes; h and w do not.  Words starting with a
+    vowel keep a leading "0".
+    """
+    if not word or word.isdigit():
+        return ''
+    key = [] if word[0] in _codes else ['0']
+    last = None
+    for c in word:
+        code = _codes.get(c)
+        if code is None:
+            if c not in 'hw':
+                last = None
+            continue
+        if code != last:
+            key.append(code)
+        last = code
+    return ''.join(key)
+
+
+def deletions(word, depth):
+    """`word` and every string left by deleting up to `depth` of its characters."""
+    found = {word}
+    for k in range(1, min(depth, len(word) - 1) + 1):
+        for drop in combinations(range(len(word)), k):
+            found.add(''.join(c for i, c in enumerate(word) if i not in drop))
+    return found
+
+
+def distance(a, b, bound):
+    """Edit distance between `a` and `b` (adjacent swaps count once), or None when over `bound`."""
+    if abs(len(a) - len(b)) > bound:
+        return None
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        # a swap reaches back two rows, so stop only when both are over the bound
+        if min(current) > bound and min(previous) > bound:
+            return None
+    return current[-1] if current[-1] <= bound else None
+
+
+class FuzzyIndex:
+
+    def __init__(self, docs, fuzzy=None):
+        docs = [(key, tuple(fold(f) for f in fields)) for key, fields in docs]
+        self.substring = TrigramIndex(docs)
+        self.keys = self.substring.keys
+        vocabulary = {}
+        postings = []            # word -> {doc: best field rank}
+        for doc, (_, fields) in enumerate(docs):
+            for rank in (fuzzy if fuzzy is not None else range(len(fields))):
+                for word in _word_re.findall(fields[rank]):
+                    w = vocabulary.setdefault(word, len(vocabulary))
+                    if w == len(postings):
+                        postings.append({})
+                    if postings[w].get(doc, rank + 1) > rank:
+                        postings[w][doc] = rank
+        self.ids = vocabulary
+        self.words = sorted(vocabulary, key=vocabulary.get)
+        self.postings = postings
+        self.sorted_words = sorted(vocabulary)
+        self.sounds = defaultdict(list)
+        self.near = defaultdict(list)
+        for w, word in enumerate(self.words):
+            if len(word) < MIN_FUZZY or word.isdigit():
+                continue
+            self.sounds[phonetic(word)].append(w)
+            # a query word may sit two edits from words of four letters or more
+            for variant in deletions(word, 1 if len(word) < 4 else 2):
+                self.near[variant].append(w)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _costs(self, qword):
+        """{vocabulary word: cost} for words matching `qword`: 0 exact or prefix, else edits."""
+        costs = {}
+        lo = bisect_left(self.sorted_words, qword)
+        hi = bisect_left(self.sorted_words, qword + _HIGH, lo)
+        for word in self.sorted_words[lo:hi]:
+            costs[self.ids[word]] = 0
+        bound = max_distance(qword)
+        if not bound or qword.isdigit():
+            return costs
+        for w in self.sounds.get(phonetic(qword), ()):
+            costs.setdefault(w, PHONETIC_COST)
+        seen = set()
+        for variant in deletions(qword, bound):
+            for w in self.near.get(variant, ()):
+                if w in seen:
+                    continue
+                seen.add(w)
+                d = distance(qword, self.words[w], bound)
+                if d is not None and d < costs.get(w, d + 1):
+                    costs[w] = d
+        return costs
+
+    def search(self, q, limit=None):
+        """Keys of documents matching `q`, best first (see the module docstring)."""
+        ql = fold(q).strip()
+        if not ql:
+            return []
+        found = self.substring.search(ql, limit=limit)
+        if limit is not None and len(found) >= limit:
+            return found
+        qwords = _word_re.findall(ql)
+        if not qwords:
+            return found
+
+        matched = None           # doc -> (total cost, best field rank)
+        for qword in qwords:
+            docs = {}
+            for w, cost in self._costs(qword).items():
+                for doc, rank in self.postings[w].items():
+                    best = docs.get(doc)
+                    if best is None or (cost, rank) < best:
+                        docs[doc] = (cost, rank)
+            if matched is None:
+                matched = docs
+            else:
+                matched = {doc: (c + docs[doc][0], min(r, docs[doc][1]))
+                           for doc, (c, r) in matched.items() if doc in docs}
+            if not matched:
+                return found
+
+        have = set(found)
+        ranked = sorted((score, doc) for doc, score in matched.items() if self.keys[doc] not in have)
+        found.extend(self.keys[doc] for _, doc in ranked)
+        return found[:limit] if limit is not None else found
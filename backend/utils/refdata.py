@@ -0,0 +1,164 @@
+# python
+# File: `utils/refdata.py`
+"""
+In-process registry of small, slow-changing reference data.
+
+Routes, active employees (id -> name, commission rate), payroll comments,
+payroll weeks and the current payroll selection are loaded once per worker and kept as tuples and read-only
+mappings.  A section is reloaded on its next read when the generation of a
+table behind it changes (`utils.versions`) or when it is older than
+REFDATA_TTL, so edits in any worker show up without a query per page.
+
+    from utils import refdata
+    routes = refdata.routes()
+    name = refdata.employee_name(emp_id)
+"""
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from django.apps import apps
+
+from base.settings import REFDATA_TTL
+from utils import versions
+
+Route = namedtuple('Route', 'id route description active sort_order')
+Employee = namedtuple('Employee', 'id name comm_rate')
+Selection = namedtuple('Selection', 'week_of route')
+
+_lock = threading.Lock()
+
+
+class _Section:
+    """One lazily loaded, generation-checked piece of reference data."""
+
+    def __init__(self, name, tables, loader, empty):
+        self.name = name
+        self.tables = versions.expand(tables)
+        self.loader = loader
+        self.empty = empty
+        self.value = None
+        self.generation = None
+        self.loaded_at = 0.0
+
+    def get(self):
+        generation = tuple(versions.current(self.tables))
+        if self.value is not None and generation == self.generation \
+                and time.monotonic() - self.loaded_at < REFDATA_TTL:
+            return self.value
+        with _lock:
+            if self.value is None or generation != self.generation \
+                    or time.monotonic() - self.loaded_at >= REFDATA_TTL:
+                try:
+                    self.value = self.loader()
+                except Exception:
+                    # keep serving the previous value (or an empty one) if the database is unavailable
+                    if self.value is None:
+                        return self.empty
+                self.generation = generation
+                self.loaded_at = time.monotonic()
+        return self.value
+
+
+def _load_routes():
+    Model = apps.get_model('routing', 'Routes')
+    rows = Model.objects.order_by('sortOrder', 'route').values_list(
+        'id', 'route', 'description', 'active', 'sortOrder')
+    routes = tuple(Route(rid, (route or '').strip(), desc or '', bool(active), order)
+                   for rid, route, desc, active, order in rows)
+    return (routes,
+            MappingProxyType({r.id: r for r in routes}),
+            MappingProxyType({r.route: r for r in routes if r.route}))
+
+
+def _load_employees():
+    Model = apps.get_model('hr', 'Employee')
+    rows = Model.objects.filter(employed=True).order_by('name').values_list('id', 'name', 'comm_rate')
+    employees = tuple(Employee(eid, name or '', rate) for eid, name, rate in rows)
+    return employees, MappingProxyType({e.id: e for e in employees})
+
+
+def _load_comments():
+    Model = apps.get_model('payroll', 'PayrollComments')
+    rows = Model.objects.exclude(comment__isnull=True).values_list('comment', flat=True)
+    return tuple(sorted({str(c).strip().upper() for c in rows if str(c).strip()}))
+
+
+def _load_weeks():
+    Model = apps.get_model('payroll', 'PayrollWeeks')
+    return tuple(Model.objects.order_by('-payroll_week').values_list('payroll_week', 'task_count'))
+
+
+def _load_selection():
+    Model = apps.get_model('payroll', 'PSelect')
+    row = Model.objects.exclude(start__isnull=True).order_by('-start').values_list('start', 'route').first()
+    return Selection(row[0], (row[1] or '').strip()) if row else Selection(None, '')
+
+
+_routes = _Section('routes', ('tbl_Route',), _load_routes, ((), MappingProxyType({}), MappingProxyType({})))
+_employees = _Section('employees', ('Employee',), _load_employees, ((), MappingProxyType({})))
+_comments = _Section('comments', ('vw_Payroll_Comments',), _load_comments, ())
+_weeks = _Section('weeks', ('vw_Payroll_Payroll_Weeks',), _load_weeks, ())
+_selection = _Section('selection', ('vw_Payroll_pselect',), _load_selection, Selection(None, ''))
+
+SECTIONS = (_routes, _employees, _comments, _weeks, _selection)
+
+
+def routes(active_only=True):
+    """Routes in sort order."""
+    all_routes = _routes.get()[0]
+    return tuple(r for r in all_routes if r.active) if active_only else all_routes
+
+
+def route_by_id(route_id):
+    try:
+        return _routes.get()[1].get(int(route_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def route_by_code(code):
+    return _routes.get()[2].get((code or '').strip())
+
+
+def employees():
+    """Active employees ordered by name."""
+    return _employees.get()[0]
+
+
+def employee(emp_id):
+    """Active employee by id, or None."""
+    try:
+        return _employees.get()[1].get(int(emp_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def employee_name(emp_id, default=''):
+    e = employee(emp_id)
+    return e.name if e else default
+
+
+def comments():
+    """Distinct payroll comments, upper-cased and sorted."""
+    return _comments.get()
+
+
+def weeks():
+    """(payroll_week, task_count) pairs, newest first."""
+    return _weeks.get()
+
+
+def preload():
+    """Load every section now (worker start); failures are left for the first read to retry."""
+    for section in SECTIONS:
+        section.get()
+
+
+def payroll_selection():
+    """
+    WeekOf (`start`) and route of the newest payroll selection: the week the
+    payroll pages send as `week_of`, unlike the Weekdone dates of `weeks()`.
+    """
+    return _selection.get()
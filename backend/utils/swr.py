@@ -0,0 +1,115 @@
+# python
+# File: `utils/swr.py`
+"""
+Stale-while-revalidate reads with single-flight fills over the shared cache.
+
+An entry is stored as (value, fresh_until) and lives in the cache for the
+hard TTL.  Until `fresh_until` it is served as is; after that it is still
+served, and the first reader to take the key's fill lock reloads it on a
+background thread.  On a plain miss one process takes the lock and runs the
+loader while identical requests wait for its result instead of running the
+same query.  The lock is a `cache.add`, so it holds across worker processes.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connections
+
+from utils import cachestats
+
+# A fill lock outlives a crashed filler by at most this long (seconds).
+LOCK_TTL = 30
+# Waiters poll for the filler's result with this back-off, for at most LOCK_TTL.
+POLL_START = 0.02
+POLL_MAX = 0.25
+
+
+def _lock(key):
+    return f'{key}:fill'
+
+
+def peek(key):
+    """The cached value for `key`, fresh or stale, or None; never loads."""
+    entry = cache.get(key)
+    cachestats.record(key, 'miss' if entry is None else 'hit' if time.time() < entry[1] else 'stale')
+    return entry[0] if entry is not None else None
+
+
+def store(key, value, soft_ttl, hard_ttl):
+    cache.set(key, (value, time.time() + soft_ttl), max(hard_ttl, soft_ttl))
+
+
+def _fill(key, loader, soft_ttl, hard_ttl):
+    started = time.perf_counter()
+    try:
+        value = loader()
+    except Exception:
+        cachestats.record(key, 'fill_error')
+        cache.delete(_lock(key))
+        raise
+    try:
+        store(key, value, soft_ttl, hard_ttl)
+        # packed row sets (utils.codec) are already bytes; other values are not serialized again to measure them
+        size = len(value) if isinstance(value, (bytes, bytearray)) else 0
+        cachestats.record(key, 'fill', us=(time.perf_counter() - started) * 1e6, size=size)
+        return value
+    finally:
+        cache.delete(_lock(key))
+
+
+def _refresh_in_background(key, loader, soft_ttl, hard_ttl):
+    def run():
+        try:
+            _fill(key, loader, soft_ttl, hard_ttl)
+        except Exception:
+            # the stale entry stays until its hard TTL; the next stale read retries
+            pass
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=run, name=f'swr-refresh {key}', daemon=True).start()
+
+
+def get_or_fill(key, loader, soft_ttl, hard_ttl, refresh=False):
+    """
+    Value for `key`, loading it with `loader()` when missing.  Stale values
+    are returned at once while one background refresh runs; `refresh` forces
+    a synchronous reload.  Exceptions from `loader` propagate to the caller
+    that ran it.
+    """
+    if refresh:
+        cache.add(_lock(key), 1, LOCK_TTL)
+        return _fill(key, loader, soft_ttl, hard_ttl)
+
+    entry = cache.get(key)
+    if entry is not None:
+        value, fresh_until = entry
+        if time.time() < fresh_until:
+            cachestats.record(key, 'hit')
+            return value
+        cachestats.record(key, 'stale')
+        if cache.add(_lock(key), 1, LOCK_TTL):
+            _refresh_in_background(key, loader, soft_ttl, hard_ttl)
+        return value
+
+    cachestats.record(key, 'miss')
+    if cache.add(_lock(key), 1, LOCK_TTL):
+        return _fill(key, loader, soft_ttl, hard_ttl)
+    cachestats.record(key, 'wait')
+
+    # Someone else is filling: wait for their result rather than repeat the query.
+    deadline = time.monotonic() + LOCK_TTL
+    delay = POLL_START
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, POLL_MAX)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if not cache.has_key(_lock(key)):
+            break
+    # the filler failed or gave up: take over the fill, or load uncached if another waiter did
+    if cache.add(_lock(key), 1, LOCK_TTL):
+        return _fill(key, loader, soft_ttl, hard_ttl)
+    return loader()
@@ -0,0 +1,91 @@
+# python
+# File: `utils/trigram.py`
+"""
+In-memory trigram index for case-insensitive substring search.
+
+Each document is a key plus a tuple of text fields.  A query of three or
+more characters is answered by intersecting the posting lists of its
+trigrams, which narrows the documents to a few candidates, and then checking
+the candidates with a real substring test, so results are exactly those of
+`field__icontains`.  Shorter queries scan the lowercased fields directly.
+
+Matches are ranked: a match at the start of a field beats one at the start
+of a word, which beats one inside a word; then earlier fields beat later
+ones, and shorter field values beat longer ones.
+
+    index = TrigramIndex((pk, (company, city)) for pk, company, city in rows)
+    index.search('acme')             # keys, best first
+    index.search('55', fields=(1,))  # only the second field
+"""
+from array import array
+from collections import defaultdict
+
+# Joins a document's fields; never part of a query, so no trigram spans two fields.
+SEP = '\x1f'
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+
+    def __init__(self, docs):
+        self.keys = []
+        self.fields = []
+        postings = defaultdict(list)
+        for key, fields in docs:
+            doc = len(self.keys)
+            lowered = tuple(str(f).lower() if f is not None else '' for f in fields)
+            self.keys.append(key)
+            self.fields.append(lowered)
+            for gram in trigrams(SEP.join(lowered)):
+                postings[gram].append(doc)
+        # documents are numbered in insertion order, so every posting list is sorted
+        self.postings = {gram: array('I', docs) for gram, docs in postings.items()}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def candidates(self, ql):
+        """Documents that may contain `ql` (already lowercased)."""
+        if len(ql) < 3:
+            return range(len(self.keys))
+        lists = []
+        for gram in trigrams(ql):
+            docs = self.postings.get(gram)
+            if docs is None:
+                return ()
+            lists.append(docs)
+        lists.sort(key=len)
+        found = set(lists[0])
+        for docs in lists[1:]:
+            found.intersection_update(docs)
+            if not found:
+                break
+        return sorted(found)
+
+    def search(self, q, fields=None, limit=None):
+        """Keys of documents with `q` in any of `fields` (positions; default all), best first."""
+        ql = str(q).lower()
+        if not ql:
+            return []
+        scored = []
+        for doc in self.candidates(ql):
+            values = self.fields[doc]
+            best = None
+            for rank, f in enumerate(fields if fields is not None else range(len(values))):
+                value = values[f]
+                pos = value.find(ql)
+                if pos < 0:
+                    continue
+                where = 0 if pos == 0 else 1 if not value[pos - 1].isalnum() else 2
+                score = (where, rank, len(value), pos)
+                if best is None or score < best:
+                    best = score
+            if best is not None:
+                scored.append((best, doc))
+        scored.sort()
+        if limit is not None:
+            scored = scored[:limit]
+        return [self.keys[doc] for _, doc in scored]
@@ -0,0 +1,150 @@
+# python
+# File: `utils/typeahead.py`
+"""
+Prefix/token index and per-client narrowing cache for typeahead lookups.
+
+Entries are (id, label, fields).  Fields are normalized to lowercase
+alphanumeric tokens, and every suffix of a field that starts at a token is
+kept in one sorted list, so a query is a binary-search range.  Matches are
+ranked prefix-first:
+
+    0  a field starts with the query       ("map"   -> "Maple Grove")
+    1  a word inside a field does          ("gro"   -> "Maple Grove")
+    2  every query word starts some word   ("gr ma" -> "Maple Grove")
+
+and then by label.  `NarrowingCache` remembers each client's last match list
+briefly: when the next keystroke extends the previous query, only those
+entries are re-checked instead of searching the whole index.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+_token_re = re.compile(r'[0-9a-z]+')
+
+# Sorts after every character that can follow a prefix in the suffix list.
+_HIGH = '\U0010ffff'
+
+
+def tokens(text):
+    return _token_re.findall(str(text).lower()) if text is not None else []
+
+
+def normalize(text):
+    return ' '.join(tokens(text))
+
+
+class PrefixIndex:
+
+    def __init__(self, entries):
+        self.ids = []
+        self.labels = []
+        self.fields = []
+        suffixes = []
+        for n, (id_, label, fields) in enumerate(entries):
+            normalized = tuple(v for v in (normalize(f) for f in fields) if v)
+            self.ids.append(id_)
+            self.labels.append(label)
+            self.fields.append(normalized)
+            for v in normalized:
+                suffixes.append((v, 0, n))
+                for m in re.finditer(' ', v):
+                    suffixes.append((v[m.end():], 1, n))
+        suffixes.sort()
+        self.suffixes = [s for s, _, _ in suffixes]
+        self.refs = [(tier, n) for _, tier, n in suffixes]
+        # entries in label order, for empty queries and tie-breaks
+        self.order = sorted(range(len(self.ids)), key=lambda n: (str(self.labels[n]).lower(), n))
+        self.position = {n: i for i, n in enumerate(self.order)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _prefixed(self, prefix):
+        """{entry: best tier} for entries with a field or word suffix starting with `prefix`."""
+        lo = bisect_left(self.suffixes, prefix)
+        hi = bisect_left(self.suffixes, prefix + _HIGH, lo)
+        found = {}
+        for tier, n in self.refs[lo:hi]:
+            if found.get(n, 2) > tier:
+                found[n] = tier
+        return found
+
+    def tier(self, n, qn, qtokens):
+        """Rank of entry `n` for the normalized query, or None if it does not match."""
+        best = None
+        for v in self.fields[n]:
+            if v.startswith(qn):
+                return 0
+            if best is None and (' ' + qn) in v:
+                best = 1
+        if best is None and len(qtokens) > 1:
+            words = [w for v in self.fields[n] for w in v.split(' ')]
+            if all(any(w.startswith(t) for w in words) for t in qtokens):
+                best = 2
+        return best
+
+    def match(self, q, within=None):
+        """Matching entries, best first.  `within` restricts the check to earlier candidates."""
+        qtokens = tokens(q)
+        qn = ' '.join(qtokens)
+        if not qn:
+            return list(self.order) if within is None else list(within)
+        if within is not None:
+            found = {}
+            for n in within:
+                t = self.tier(n, qn, qtokens)
+                if t is not None:
+                    found[n] = t
+        else:
+            found = self._prefixed(qn)
+            if len(qtokens) > 1:
+                common = None
+                for t in qtokens:
+                    hits = self._prefixed(t)
+                    common = set(hits) if common is None else common & hits.keys()
+                for n in common or ():
+                    found.setdefault(n, 2)
+        position = self.position
+        return sorted(found, key=lambda n: (found[n], position[n]))
+
+    def items(self, entries, k):
+        return [{'id': self.ids[n], 'label': self.labels[n]} for n in entries[:k]]
+
+
+# Longer previous match lists are not worth re-checking entry by entry; search the index instead.
+NARROW_MAX = 5000
+
+
+class NarrowingCache:
+    """Last (query, matches) per client and scope, for `ttl` seconds."""
+
+    def __init__(self, ttl=30, max_clients=2000):
+        self.ttl = ttl
+        self.max_clients = max_clients
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, index, client, q):
+        """Matches for `q` on `index`, narrowed from the client's previous query when it extends it."""
+        qn = normalize(q)
+        now = time.monotonic()
+        with self._lock:
+            previous = self._entries.get(client)
+        within = None
+        if previous is not None:
+            prev_index, prev_q, prev_matches, expires = previous
+            if prev_index is index and expires > now and prev_q and qn.startswith(prev_q):
+                if qn == prev_q:
+                    return prev_matches
+                if len(prev_matches) <= NARROW_MAX:
+                    within = prev_matches
+        matches = index.match(qn, within)
+        with self._lock:
+            self._entries[client] = (index, qn, matches, now + self.ttl)
+            self._entries.move_to_end(client)
+            while len(self._entries) > self.max_clients:
+                self._entries.popitem(last=False)
+        return matches
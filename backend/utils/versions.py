@@ -0,0 +1,192 @@
+# python
+# File: `utils/versions.py`
+"""
+Per-table data generations kept in the shared cache.
+
+Every write through the ORM to a model managed by `VersionedManager` (the
+application's own tables; Django's session, auth and admin tables are left
+alone) replaces the generation token of the model's table once its
+transaction commits: `save()`/`delete()` via signals, and queryset
+`update()`, `delete()`, `bulk_create()` and `bulk_update()` via the manager.  Readers fold the tokens of the tables they depend on
+into cache keys and ETags, so a write in any worker retires every dependent
+key without anyone tracking individual keys.
+
+The SQL views are never written; `VIEW_SOURCES` maps each one defined in
+@scripts/sql/views.sql to the base tables it selects from, and readers of a
+view depend on those tables.  Views the models read whose definitions are not
+in the repo (`UNMAPPED_VIEWS`) depend on `ANY_TABLE` instead, which writes
+to any table that may feed them (`UNMAPPED_SOURCES`) also bump.
+
+`VersionedQuerySet.cached(ttl)` applies the same scheme to plain ORM reads:
+the results are cached under the compiled SQL and params, folded with the
+generations of the tables the query reads.
+
+    site = Site.objects.cached().get(cust_id=cust_id)
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import models, router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.core.exceptions import EmptyResultSet
+from django.dispatch import receiver
+
+from base.settings import CACHE_HARD_TTL, CACHE_TTL
+from utils import swr
+
+PREFIX = 'data_version'
+
+# Generation shared by the readers of UNMAPPED_VIEWS, whose exact sources are unknown.
+ANY_TABLE = '*'
+
+# view -> the tables its definition in @scripts/sql/views.sql selects from
+VIEW_SOURCES = {
+    'vw_Payroll_Sites': ('MonthlyInvoice', 'Site'),                       # MonthlyInvoice LEFT JOIN Site, UNION Site
+    'vw_Payroll_Comments': ('MonthlyInvoice', 'HistofInvc_current'),      # UNION of both comment columns
+    'vw_Payroll_Payroll_Weeks': ('MonthlyInvoice',),                      # distinct Weekdone
+    'Accounting.vw_Payroll_Aggregate': ('MonthlyInvoice',),               # grouped by Weekof, route
+}
+
+# Views read by the models (payroll.PayrollTasks, payroll.PSelect) with no definition in views.sql.
+UNMAPPED_VIEWS = ('vw_Payroll_Tasks', 'vw_Payroll_pselect')
+
+# Tables holding the columns those views expose, from the model fields: task and week columns of
+# MonthlyInvoice and Site.SiteComm (tasks); pselect, Employee name and tbl_Route description (pselect).
+# A write to any of them bumps ANY_TABLE; listing a table that is not a source only costs cache hits.
+UNMAPPED_SOURCES = ('MonthlyInvoice', 'Site', 'pselect', 'Employee', 'tbl_Route')
+
+
+def _key(table):
+    return f'{PREFIX}:{table}'
+
+
+def expand(tables):
+    """Base tables behind `tables`, with views replaced by their sources (order kept, no repeats)."""
+    found = []
+    for t in tables:
+        if t in UNMAPPED_VIEWS:
+            t = ANY_TABLE
+        for base in expand(VIEW_SOURCES[t]) if t in VIEW_SOURCES else (t,):
+            if base not in found:
+                found.append(base)
+    return tuple(found)
+
+
+def current(tables):
+    """Generation tokens for `tables`, in order; tables never seen get one now."""
+    keys = [_key(t) for t in tables]
+    found = cache.get_many(keys)
+    for k in keys:
+        if k not in found:
+            cache.add(k, time.time_ns(), None)
+            found[k] = cache.get(k, 0)
+    return [found[k] for k in keys]
+
+
+def bump(*tables):
+    token = time.time_ns()
+    if any(t in UNMAPPED_SOURCES for t in tables):
+        tables += (ANY_TABLE,)
+    cache.set_many({_key(t): token for t in tables}, None)
+
+
+def bump_on_commit(model):
+    """Bump `model`'s table when the current transaction commits (immediately outside one)."""
+    table = model._meta.db_table
+    transaction.on_commit(lambda: bump(table), using=router.db_for_write(model))
+
+
+@receiver(post_save, dispatch_uid='utils.versions.saved')
+@receiver(post_delete, dispatch_uid='utils.versions.deleted')
+def _table_written(sender, **kwargs):
+    if isinstance(sender._default_manager, VersionedManager):
+        bump_on_commit(sender)
+
+
+class VersionedQuerySet(models.QuerySet):
+    """
+    QuerySet whose bulk writes, which send no per-row signals, bump the table
+    generation, and whose reads can opt in to the shared cache with `cached()`.
+    """
+
+    _cache_ttl = None
+    _cache_depends_on = ()
+
+    def cached(self, ttl=CACHE_TTL, depends_on=()):
+        """
+        Serve this queryset's results (and `count()`) from the shared cache for
+        `ttl` seconds, stale-while-revalidate up to CACHE_HARD_TTL.  Writes to
+        any table in the query's FROM/JOINs retire the entry; list tables only
+        read in subqueries in `depends_on`.
+        """
+        clone = self._chain()
+        clone._cache_ttl = ttl
+        clone._cache_depends_on = tuple(depends_on)
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._cache_ttl = self._cache_ttl
+        clone._cache_depends_on = self._cache_depends_on
+        return clone
+
+    def _cache_key(self, kind):
+        """`orm_<table>_<generation>_<digest of kind, SQL and params>`, or None if there is nothing to run."""
+        query = self.query.clone()
+        try:
+            sql, params = query.get_compiler(using=self.db).as_sql()
+        except EmptyResultSet:
+            return None
+        tables = [a.table_name for a in query.alias_map.values() if getattr(a, 'table_name', None)]
+        tables = expand(tuple(tables) + self._cache_depends_on)
+        tokens = ','.join(str(v) for v in current(tables))
+        generation = hashlib.sha1(tokens.encode('ascii')).hexdigest()[:12]
+        digest = hashlib.sha1(repr((kind, self.db, sql, params, self._iterable_class.__name__)).encode('utf-8'))
+        return f'orm_{self.model._meta.db_table}_{generation}_{digest.hexdigest()}'
+
+    def _from_cache(self, kind, loader):
+        key = self._cache_key(kind)
+        if key is None:
+            return loader()
+        return swr.get_or_fill(key, loader, self._cache_ttl, max(CACHE_HARD_TTL, self._cache_ttl))
+
+    def _fetch_all(self):
+        if self._cache_ttl is None or self._result_cache is not None:
+            return super()._fetch_all()
+        self._result_cache = self._from_cache('rows', lambda: list(self._iterable_class(self)))
+        if self._prefetch_related_lookups and not self._prefetch_done:
+            self._prefetch_related_objects()
+
+    def count(self):
+        if self._cache_ttl is None or self._result_cache is not None:
+            return super().count()
+        return self._from_cache('count', lambda: self.query.get_count(using=self.db))
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        bump_on_commit(self.model)
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        result = super().delete()
+        bump_on_commit(self.model)
+        return result
+
+    delete.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        bump_on_commit(self.model)
+        return created
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        rows = super().bulk_update(objs, fields, batch_size=batch_size)
+        bump_on_commit(self.model)
+        return rows
+
+
+class VersionedManager(models.Manager.from_queryset(VersionedQuerySet)):
+    pass